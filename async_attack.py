@@ -0,0 +1,151 @@
+# async_attack.py
+import asyncio
+import contextlib
+from typing import List, Dict, Tuple, Optional
+from config import Config
+from prompt_attack import SimplePromptAttack, AttackResult
+from detector_server import encode_message, read_message
+
+class AsyncModelAdapter:
+    """远程检测器的异步适配器：分批请求、信号量限制并发、超时重试"""
+
+    def __init__(self, host: str = None, port: int = None, threshold: float = None,
+                 batch_size: int = None, max_concurrency: int = None,
+                 timeout: float = None, max_retries: int = None):
+        self.host = host or Config.REMOTE_HOST
+        self.port = port or Config.REMOTE_PORT
+        self.threshold = threshold if threshold is not None else Config.MODEL_THRESHOLD
+        self.batch_size = batch_size or Config.REMOTE_BATCH_SIZE
+        self.max_concurrency = max_concurrency or Config.REMOTE_MAX_CONCURRENCY
+        self.timeout = timeout or Config.REMOTE_TIMEOUT
+        self.max_retries = max_retries if max_retries is not None else Config.REMOTE_MAX_RETRIES
+        self.retry_backoff = 0.05  # 首次重试等待（秒），之后指数增长
+
+        self.request_count = 0
+        self.retry_count = 0
+        self._next_id = 0
+
+    async def score_async(self, texts: List[str], allow_failures: bool = False) -> List[Optional[float]]:
+        """异步获取欺诈得分
+
+        allow_failures为True时，重试耗尽的批次中的文本得分为None，其余批次照常返回；
+        否则任一批次失败即抛出异常。
+        """
+        # 信号量必须在当前事件循环内创建
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        batch_scores = await asyncio.gather(*(self._request_with_retry(batch, semaphore) for batch in batches),
+                                            return_exceptions=allow_failures)
+
+        scores = []
+        for batch, batch_score in zip(batches, batch_scores):
+            if isinstance(batch_score, BaseException):
+                if not isinstance(batch_score, Exception):
+                    raise batch_score
+                print(f"预测失败（{len(batch)}条文本）: {batch_score}")
+                batch_score = [None] * len(batch)
+            scores.extend(batch_score)
+        return scores
+
+    async def predict_async(self, texts: List[str], allow_failures: bool = False) -> List[Optional[int]]:
+        """异步预测文本标签（allow_failures的含义同score_async，失败的文本为None）"""
+        scores = await self.score_async(texts, allow_failures)
+        return [None if score is None else 1 if score > self.threshold else 0 for score in scores]
+
+    async def predict_proba_async(self, texts: List[str]) -> List[Tuple[float, float]]:
+        """异步预测概率"""
+        scores = await self.score_async(texts)
+        return [(1 - score, score) for score in scores]
+
+    def predict(self, texts: List[str]) -> List[int]:
+        """同步接口，可直接作为SimplePromptAttack的model使用"""
+        return asyncio.run(self.predict_async(texts))
+
+    def predict_proba(self, texts: List[str]) -> List[Tuple[float, float]]:
+        """同步预测概率"""
+        return asyncio.run(self.predict_proba_async(texts))
+
+    async def _request_with_retry(self, batch: List[str], semaphore: asyncio.Semaphore) -> List[float]:
+        """发送一批文本，失败或超时后按指数退避重试"""
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt > 0:
+                self.retry_count += 1
+                await asyncio.sleep(self.retry_backoff * (2 ** (attempt - 1)))
+            async with semaphore:
+                try:
+                    return await asyncio.wait_for(self._request(batch), timeout=self.timeout)
+                except (asyncio.TimeoutError, OSError, RuntimeError, ValueError) as e:
+                    last_error = e
+        raise RuntimeError(f"远程检测器请求失败（已重试{self.max_retries}次）: {last_error!r}")
+
+    async def _request(self, batch: List[str]) -> List[float]:
+        """发送单个请求"""
+        self.request_count += 1
+        self._next_id += 1
+        request_id = self._next_id
+
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            writer.write(encode_message({"id": request_id, "texts": batch}))
+            await writer.drain()
+            response = await read_message(reader)
+        finally:
+            writer.close()
+            # 响应已读到时，关闭阶段的连接错误不影响结果
+            with contextlib.suppress(OSError):
+                await writer.wait_closed()
+
+        if response is None:
+            raise RuntimeError("连接已关闭")
+        if "error" in response:
+            raise RuntimeError(response["error"])
+        if len(response["scores"]) != len(batch):
+            raise ValueError("响应长度与请求不一致")
+        return response["scores"]
+
+class AsyncPromptAttack(SimplePromptAttack):
+    """批量攻击的异步版本：本地生成扰动，远程批量打分"""
+
+    def __init__(self, model: AsyncModelAdapter, data_loader):
+        super().__init__(model, data_loader)
+
+    async def run_batch_attack_async(self, texts: List[str], labels: List[int],
+                                     perturbation_types: List[str] = None) -> Dict[str, List[AttackResult]]:
+        """异步批量运行攻击，结果格式与run_batch_attack一致"""
+        if perturbation_types is None:
+            perturbation_types = []
+            for level_types in Config.PERTURBATION_TYPES.values():
+                perturbation_types.extend(level_types)
+
+        print(f"开始异步批量攻击，共{len(texts)}个样本，{len(perturbation_types)}种扰动类型")
+
+        # 1. 本地生成全部对抗文本（不查询模型）
+        adversarial_texts = {ptype: [self.perturb(text, label, ptype) for text, label in zip(texts, labels)]
+                             for ptype in perturbation_types}
+
+        # 2. 原始文本只打分一次，全部文本合并后分批并发发送
+        query_texts = list(texts)
+        for ptype in perturbation_types:
+            query_texts.extend(adversarial_texts[ptype])
+
+        # 只有重试耗尽的批次失败，其余批次的预测照常使用
+        predictions = await self.model.predict_async(query_texts, allow_failures=True)
+        self.query_count += len(query_texts)
+
+        # 3. 组装结果：原始或对抗文本预测失败的样本不计入结果（不能当作攻击成功）
+        results = {ptype: [] for ptype in perturbation_types}
+        skipped = 0
+        for type_index, ptype in enumerate(perturbation_types):
+            offset = len(texts) * (type_index + 1)
+            for i, text in enumerate(texts):
+                original_pred, adversarial_pred = predictions[i], predictions[offset + i]
+                if original_pred is None or adversarial_pred is None:
+                    skipped += 1
+                    continue
+                results[ptype].append(self.build_result(text, adversarial_texts[ptype][i], ptype,
+                                                        original_pred, adversarial_pred))
+        if skipped:
+            print(f"警告: {skipped} 个样本因预测失败未计入结果")
+
+        return results
@@ -0,0 +1,135 @@
+# attack_scheduler.py
+import math
+import random
+from typing import List, Dict
+from config import Config
+from instrumentation import timed
+from prompt_attack import SimplePromptAttack, AttackResult
+from sharding import sample_seed
+
+class UCBAttackScheduler:
+    """自适应扰动类型调度器（UCB1多臂老虎机）
+
+    在线学习各扰动类型的成功率，对每个样本按UCB得分从高到低尝试，
+    一旦攻击成功即停止该样本（首次成功即退出），每个样本最多尝试budget次。
+    给出样本编号时每次尝试按sample_seed(编号, 扰动类型)播种，与run_optimized的穷举循环
+    对同一样本、同一扰动类型得到相同的结果，两者的覆盖率可以直接比较。
+    """
+
+    def __init__(self, attack: SimplePromptAttack, perturbation_types: List[str] = None,
+                 budget: int = None, exploration: float = None):
+        self.attack = attack
+        if perturbation_types is None:
+            perturbation_types = []
+            for level_types in Config.PERTURBATION_TYPES.values():
+                perturbation_types.extend(level_types)
+        self.perturbation_types = perturbation_types
+        self.budget = budget or Config.SCHEDULER_BUDGET
+        self.exploration = exploration if exploration is not None else Config.SCHEDULER_EXPLORATION
+
+        self.pulls = {ptype: 0 for ptype in perturbation_types}
+        self.successes = {ptype: 0 for ptype in perturbation_types}
+        self.total_pulls = 0
+
+    def ucb_score(self, ptype: str) -> float:
+        """UCB1得分：成功率均值 + 探索奖励；从未尝试过的类型优先"""
+        pulls = self.pulls[ptype]
+        if pulls == 0:
+            return float('inf')
+        mean = self.successes[ptype] / pulls
+        return mean + self.exploration * math.sqrt(2 * math.log(max(self.total_pulls, 1)) / pulls)
+
+    def order(self) -> List[str]:
+        """当前的尝试顺序"""
+        return sorted(self.perturbation_types, key=lambda ptype: -self.ucb_score(ptype))
+
+    def update(self, ptype: str, success: bool):
+        """记录一次尝试结果"""
+        self.pulls[ptype] += 1
+        self.total_pulls += 1
+        if success:
+            self.successes[ptype] += 1
+
+    def _attempt(self, text: str, label: int, ptype: str, sample_id: str = None) -> AttackResult:
+        if sample_id is not None:
+            random.seed(sample_seed(sample_id, ptype))
+        return self.attack.generate_adversarial_sample(text, label, ptype)
+
+    def _clear_ranker_cache(self):
+        # 词重要性排序按文本缓存，每轮从空缓存开始，查询数才可比
+        if self.attack.importance_ranker is not None:
+            self.attack.importance_ranker.clear_cache()
+
+    def attack_sample(self, text: str, label: int, sample_id: str = None) -> List[AttackResult]:
+        """对单个样本按调度顺序尝试，成功即停止"""
+        tried = []
+        for ptype in self.order()[:self.budget]:
+            result = self._attempt(text, label, ptype, sample_id)
+            self.update(ptype, result.success)
+            tried.append(result)
+            if result.success:
+                break
+        return tried
+
+    @timed("attack.exhaustive_batch")
+    def exhaustive(self, texts: List[str], labels: List[int], ids: List[str] = None) -> Dict:
+        """实际运行穷举攻击（每个样本尝试全部扰动类型），按同一query_count口径统计查询数与覆盖率
+
+        不更新调度器的成功率统计。调用方已经跑过穷举攻击时应直接把其统计传给run，不必再跑一遍。
+        """
+        self._clear_ranker_cache()
+        ids = ids if ids is not None else [None] * len(texts)
+        queries_before = self.attack.query_count
+        covered = 0
+        for text, label, sample_id in zip(texts, labels, ids):
+            results = [self._attempt(text, label, ptype, sample_id) for ptype in self.perturbation_types]
+            if any(result.success for result in results):
+                covered += 1
+        return {
+            "coverage": covered / len(texts) if texts else 0.0,
+            "covered_samples": covered,
+            "queries_used": self.attack.query_count - queries_before
+        }
+
+    @timed("attack.scheduled_batch")
+    def run(self, texts: List[str], labels: List[int], ids: List[str] = None, exhaustive: Dict = None) -> Dict:
+        """对一批样本运行自适应攻击，并与穷举所有扰动类型的开销和覆盖率对比
+
+        exhaustive为调用方已测得的穷举统计 {"covered_samples", "queries_used"}
+        （queries_used为None表示未知，例如结果来自缓存）；为None时调用exhaustive()实际测量。
+        """
+        self._clear_ranker_cache()
+        ids = ids if ids is not None else [None] * len(texts)
+        queries_before = self.attack.query_count
+        results = []
+        covered = 0
+        attempts = 0
+        for text, label, sample_id in zip(texts, labels, ids):
+            tried = self.attack_sample(text, label, sample_id)
+            attempts += len(tried)
+            if tried and tried[-1].success:
+                covered += 1
+            results.append(tried)
+
+        queries_used = self.attack.query_count - queries_before
+        if exhaustive is None:
+            exhaustive = self.exhaustive(texts, labels, ids)
+        exhaustive_covered = exhaustive["covered_samples"]
+        exhaustive_queries = exhaustive["queries_used"]
+
+        return {
+            "results": results,
+            "coverage": covered / len(texts) if texts else 0.0,
+            "covered_samples": covered,
+            "attempts": attempts,
+            "queries_used": queries_used,
+            "exhaustive_queries": exhaustive_queries,
+            "exhaustive_coverage": exhaustive_covered / len(texts) if texts else 0.0,
+            "exhaustive_covered_samples": exhaustive_covered,
+            # 调度器覆盖的样本数占穷举可覆盖样本数的比例
+            "relative_coverage": covered / exhaustive_covered if exhaustive_covered else None,
+            "queries_saved": exhaustive_queries - queries_used if exhaustive_queries is not None else None,
+            "success_rates": {ptype: self.successes[ptype] / self.pulls[ptype] if self.pulls[ptype] else 0.0
+                              for ptype in self.perturbation_types},
+            "pulls": dict(self.pulls)
+        }
@@ -0,0 +1,162 @@
+# augmentation.py
+import random
+from typing import List, Dict, Tuple
+from config import Config
+from feature_matrix import FeatureMatrix
+from prompt_attack import SimplePromptAttack
+from trainable_model import TrainableFraudDetector, sigmoid
+
+class FeatureRowCache:
+    """按文本缓存特征矩阵行，跨轮次复用，同一文本只提取一次特征"""
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.rows = {}
+
+    def matrix(self, texts: List[str]) -> FeatureMatrix:
+        """返回texts对应的特征矩阵，只为未缓存的文本提取特征"""
+        missing = [text for text in dict.fromkeys(texts) if text not in self.rows]
+        if missing:
+            fresh = FeatureMatrix.build(missing, self.columns)
+            for i, text in enumerate(missing):
+                self.rows[text] = fresh.row(i)
+
+        matrix = FeatureMatrix(self.columns)
+        for text in texts:
+            matrix.append_row(self.rows[text])
+        return matrix
+
+class AdversarialAugmenter:
+    """对抗增强训练：攻击 → 收集成功的对抗样本（保留原标签） → 重新训练，循环多轮"""
+
+    def __init__(self, model: TrainableFraudDetector, data_loader, perturbation_types: List[str] = None):
+        self.model = model
+        self.data_loader = data_loader
+        if perturbation_types is None:
+            perturbation_types = []
+            for level_types in Config.PERTURBATION_TYPES.values():
+                perturbation_types.extend(level_types)
+        self.perturbation_types = perturbation_types
+        self.attack = SimplePromptAttack(model, data_loader)
+
+        self.cache = FeatureRowCache(model.feature_columns())
+        self.train_texts = []
+        self.train_labels = []
+        self._seen = set()  # 训练集中已有的文本，用于去重
+        self.adversarial_texts = []  # 历轮收集的对抗样本
+        self.adversarial_labels = []
+        self._scores = None  # 上一轮评估样本的得分缓存 ((模型版本, 样本), 得分)
+        self._model_version = 0
+
+    def add_training_samples(self, texts: List[str], labels: List[int]) -> int:
+        """加入训练样本（按文本去重），返回实际新增数"""
+        added = 0
+        for text, label in zip(texts, labels):
+            if text in self._seen:
+                continue
+            self._seen.add(text)
+            self.train_texts.append(text)
+            self.train_labels.append(label)
+            added += 1
+        return added
+
+    def train(self, epochs: int = None, batch_size: int = None) -> List[float]:
+        """在当前训练集上继续训练（热启动，特征来自缓存）"""
+        epochs = epochs or Config.AUGMENT_EPOCHS_PER_ROUND
+        batch_size = batch_size or Config.TRAIN_BATCH_SIZE
+        matrix = self.cache.matrix(self.train_texts)
+        order = list(range(len(self.train_texts)))
+        history = []
+        for _ in range(epochs):
+            random.shuffle(order)
+            losses = []
+            for start in range(0, len(order), batch_size):
+                batch = order[start:start + batch_size]
+                losses.append(self.model.partial_fit_matrix(matrix.take(batch),
+                                                            [self.train_labels[k] for k in batch]))
+            history.append(sum(losses) / len(losses) if losses else 0.0)
+        self._model_version += 1
+        return history
+
+    def _predict(self, texts: List[str]) -> List[int]:
+        """用缓存的特征行批量预测"""
+        matrix = self.cache.matrix(texts)
+        return [1 if sigmoid(z) > self.model.threshold else 0
+                for z in matrix.dot(self.model.weights, self.model.bias)]
+
+    def _original_predictions(self, texts: List[str]) -> List[int]:
+        """评估样本的原始预测；模型未更新且样本相同时直接复用上一轮的得分"""
+        key = (self._model_version, tuple(texts))
+        if self._scores is not None and self._scores[0] == key:
+            return self._scores[1]
+        predictions = self._predict(texts)
+        self._scores = (key, predictions)
+        return predictions
+
+    def attack_round(self, texts: List[str], labels: List[int]) -> Tuple[Dict[str, Dict], List[str], List[int]]:
+        """运行一轮攻击，返回各扰动类型统计以及成功的对抗样本"""
+        original_preds = self._original_predictions(texts)
+        stats = {}
+        successful_texts, successful_labels = [], []
+        for ptype in self.perturbation_types:
+            adversarial = [self.attack.perturb(text, label, ptype) for text, label in zip(texts, labels)]
+            adversarial_preds = self._predict(adversarial)
+            success_count = 0
+            for text, adv_text, label, orig_pred, adv_pred in zip(texts, adversarial, labels,
+                                                                  original_preds, adversarial_preds):
+                result = self.attack.build_result(text, adv_text, ptype, orig_pred, adv_pred)
+                if result.success:
+                    success_count += 1
+                    successful_texts.append(adv_text)
+                    successful_labels.append(label)  # 对抗样本保留原始标签
+            stats[ptype] = {
+                "success_count": success_count,
+                "attack_success_rate": success_count / len(texts) if texts else 0.0
+            }
+        return stats, successful_texts, successful_labels
+
+    def _accuracy(self, texts: List[str], labels: List[int]) -> float:
+        if not texts:
+            return 0.0
+        predictions = self._predict(texts)
+        return sum(1 for pred, true in zip(predictions, labels) if pred == true) / len(labels)
+
+    def run(self, train_texts: List[str], train_labels: List[int],
+            eval_texts: List[str] = None, eval_labels: List[int] = None,
+            rounds: int = None, epochs_per_round: int = None) -> List[Dict]:
+        """运行多轮 攻击→重训练，返回每轮的鲁棒性报告"""
+        rounds = rounds or Config.AUGMENT_ROUNDS
+        eval_texts = eval_texts if eval_texts is not None else train_texts
+        eval_labels = eval_labels if eval_labels is not None else train_labels
+
+        self.add_training_samples(train_texts, train_labels)
+        self.train(epochs_per_round)
+
+        reports = []
+        for round_index in range(1, rounds + 1):
+            stats, adv_texts, adv_labels = self.attack_round(eval_texts, eval_labels)
+            total_success = sum(item["success_count"] for item in stats.values())
+            total_attacks = len(eval_texts) * len(self.perturbation_types)
+
+            added = self.add_training_samples(adv_texts, adv_labels)
+            self.adversarial_texts.extend(adv_texts)
+            self.adversarial_labels.extend(adv_labels)
+            if added:
+                self.train(epochs_per_round)
+
+            report = {
+                "round": round_index,
+                "attack_success_rate": total_success / total_attacks if total_attacks else 0.0,
+                "robustness": 1 - total_success / total_attacks if total_attacks else 1.0,
+                "per_type": stats,
+                "new_samples": added,
+                "train_size": len(self.train_texts),
+                "clean_accuracy": self._accuracy(eval_texts, eval_labels),
+                "adversarial_accuracy": self._accuracy(self.adversarial_texts, self.adversarial_labels)
+            }
+            reports.append(report)
+            print(f"第{round_index}轮: 攻击成功率={report['attack_success_rate']:.4f}, "
+                  f"新增样本={added}, 训练集={report['train_size']}, "
+                  f"干净准确率={report['clean_accuracy']:.4f}, "
+                  f"对抗样本准确率={report['adversarial_accuracy']:.4f}")
+        return reports
@@ -0,0 +1,99 @@
+# benchmark_canonicalize.py
+import time
+import random
+import argparse
+from typing import List, Dict
+from config import Config
+from data_loader import FraudDialogDataLoader
+from simple_model import SimpleFraudDetector
+from prompt_attack import SimplePromptAttack
+from text_features import clear_cache
+
+def _homoglyph(text: str, table: Dict[int, str]) -> str:
+    """形近字扰动：用扰动生成器的形近字映射替换汉字"""
+    return text.translate(table)
+
+def _predict(model: SimpleFraudDetector, texts: List[str]) -> List[int]:
+    """不含随机扰动的预测，便于比较规范化前后的准确率"""
+    return [1 if model.expected_score(model.base_score(text)) > model.threshold else 0 for text in texts]
+
+def _accuracy(predictions: List[int], labels: List[int]) -> float:
+    return sum(1 for pred, true in zip(predictions, labels) if pred == true) / len(labels) if labels else 0.0
+
+def _throughput(model: SimpleFraudDetector, texts: List[str], repeat: int) -> float:
+    """批量打分吞吐（texts/s）；每轮清空特征缓存，避免缓存命中掩盖特征提取开销"""
+    elapsed = 0.0
+    for _ in range(repeat):
+        clear_cache()
+        start = time.perf_counter()
+        model.score_batch(texts)
+        elapsed += time.perf_counter() - start
+    return len(texts) * repeat / elapsed if elapsed > 0 else 0.0
+
+def run_benchmark(data_path: str = None, sample_size: int = 1000, repeat: int = 5,
+                  threshold: float = None) -> Dict:
+    """对比规范化前后的打分吞吐，以及各扰动类型下的准确率"""
+    random.seed(Config.SEED)
+    data_loader = FraudDialogDataLoader(data_path=data_path) if data_path else FraudDialogDataLoader()
+    data = data_loader.load_data(sample_size=sample_size)
+    texts = [item['text'] for item in data]
+    labels = [item['label'] for item in data]
+
+    threshold = threshold if threshold is not None else Config.MODEL_THRESHOLD
+    plain = SimpleFraudDetector(threshold=threshold, canonicalize=False)
+    hardened = SimpleFraudDetector(threshold=threshold, canonicalize=True)
+
+    # 1. 吞吐开销
+    plain_rate = _throughput(plain, texts, repeat)
+    hardened_rate = _throughput(hardened, texts, repeat)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            hardened.canonicalizer(text)
+    canonical_elapsed = time.perf_counter() - start
+    report = {
+        "samples": len(texts),
+        "plain_texts_per_sec": plain_rate,
+        "hardened_texts_per_sec": hardened_rate,
+        "overhead": plain_rate / hardened_rate - 1 if hardened_rate > 0 else 0.0,
+        "canonicalize_texts_per_sec": len(texts) * repeat / canonical_elapsed if canonical_elapsed > 0 else 0.0,
+        "accuracy": {}
+    }
+    print(f"样本数: {len(texts)}")
+    print(f"打分吞吐: 原始={plain_rate:.0f} texts/s, 规范化={hardened_rate:.0f} texts/s, "
+          f"开销={report['overhead'] * 100:.1f}%")
+    print(f"规范化本身: {report['canonicalize_texts_per_sec']:.0f} texts/s")
+
+    # 2. 各扰动类型下的准确率
+    attack = SimplePromptAttack(plain, data_loader)
+    homoglyphs = {ord(char): replacement
+                  for char, replacement in attack.perturbation_generator.char_replacements.items()
+                  if not char.isascii()}
+    perturbation_types = []
+    for level_types in Config.PERTURBATION_TYPES.values():
+        perturbation_types.extend(level_types)
+
+    variants = {"clean": texts}
+    for ptype in perturbation_types:
+        variants[ptype] = [attack.perturb(text, label, ptype) for text, label in zip(texts, labels)]
+    variants["homoglyph"] = [_homoglyph(text, homoglyphs) for text in texts]
+
+    print(f"\n{'扰动类型':<12} {'原始准确率':<12} {'规范化准确率':<12} {'恢复':<10}")
+    print("-" * 50)
+    for name, variant_texts in variants.items():
+        plain_acc = _accuracy(_predict(plain, variant_texts), labels)
+        hardened_acc = _accuracy(_predict(hardened, variant_texts), labels)
+        report["accuracy"][name] = {"plain": plain_acc, "hardened": hardened_acc,
+                                    "recovered": hardened_acc - plain_acc}
+        print(f"{name:<12} {plain_acc:<12.4f} {hardened_acc:<12.4f} {hardened_acc - plain_acc:<+10.4f}")
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="输入规范化的吞吐开销与准确率恢复基准")
+    parser.add_argument("--data", default=None, help="数据文件路径（默认使用加载器的默认路径）")
+    parser.add_argument("--samples", type=int, default=1000, help="样本数")
+    parser.add_argument("--repeat", type=int, default=5, help="吞吐测试的重复次数")
+    parser.add_argument("--threshold", type=float, default=None, help="检测器阈值（默认Config.MODEL_THRESHOLD）")
+    args = parser.parse_args()
+
+    run_benchmark(args.data, args.samples, args.repeat, args.threshold)
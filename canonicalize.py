@@ -0,0 +1,93 @@
+# canonicalize.py
+import re
+from typing import Iterable, Dict
+
+# 零宽字符：直接删除
+ZERO_WIDTH_CHARS = "\u200b\u200c\u200d\u2060\ufeff"
+
+# 罕见的形近字：正常文本中几乎不会出现，全文直接还原
+RARE_CONFUSABLES = {"歀": "款"}
+
+# 常用字的形近替换（扰动生成器的char_replacements）：只在拼出关键词时还原，避免误改正常用字
+KEYWORD_CONFUSABLES = {
+    "占": "点", "出": "击", "连": "链", "按": "接", "蜜": "密",
+    "马": "码", "卢": "户", "褪": "退", "帐": "账"
+}
+
+# 不带分隔符、只做形近字替换的变体，只对不短于此长度的关键词还原（两字的变体多是正常用词）
+MIN_HOMOGLYPH_WORD = 3
+
+# 插在汉字之间的空白与分隔符
+SEPARATOR = r"[\s\-_.·*|/\\~]"
+CJK = "[\u4e00-\u9fff]"
+_SEPARATOR_RE = re.compile(SEPARATOR)
+
+def _build_table() -> Dict[int, str]:
+    """预先计算的str.translate映射表：删除零宽字符、全角字母数字与全角空格转半角、罕见形近字还原"""
+    table = {ord(char): None for char in ZERO_WIDTH_CHARS}
+    for start, end in ((0xFF10, 0xFF19), (0xFF21, 0xFF3A), (0xFF41, 0xFF5A)):
+        for code in range(start, end + 1):
+            table[code] = chr(code - 0xFEE0)
+    table[0x3000] = " "
+    for variant, canonical in RARE_CONFUSABLES.items():
+        table[ord(variant)] = canonical
+    return table
+
+_TABLE = _build_table()
+_TABLE_CHARS = re.compile("[" + "".join(map(chr, _TABLE)) + "]")
+
+class Canonicalizer:
+    """输入规范化：在打分前还原字符级扰动
+
+    先用预先计算的translate表做逐字符映射，再用一个编译好的正则单遍扫描：
+      - 关键词的变体（字间插入分隔符、用形近字替换）还原为关键词本身；
+        形近字在常用字中很常见（"连接""点出"），两字词的变体必须带插入的分隔符才还原，
+        只有三字以上的关键词才按纯形近字替换还原
+      - 其余汉字之间的空白和分隔符直接删除
+    不含分隔符、形近字和需映射字符的文本（绝大多数请求）经一次预检后原样返回。
+    """
+
+    def __init__(self, keywords: Iterable[str] = (), patterns: Iterable[str] = ()):
+        variants = {}
+        for confusable, canonical in KEYWORD_CONFUSABLES.items():
+            variants.setdefault(canonical, [canonical]).append(confusable)
+        self._keyword_table = str.maketrans(KEYWORD_CONFUSABLES)
+
+        # 模式按'.*'拆成字面片段，与关键词一同还原
+        literals = set(keywords)
+        for pattern in patterns:
+            literals.update(part for part in pattern.split('.*') if part and re.escape(part) == part)
+        # 只有含形近字的关键词需要单独匹配，其余关键词字间的分隔符由通用规则删除
+        literals = sorted((word for word in literals if len(word) > 1 and any(char in variants for char in word)),
+                          key=lambda word: (-len(word), word))
+
+        alternatives = []
+        first_chars = set()
+        for word in literals:
+            classes = ["[" + "".join(variants.get(char, [char])) + "]" for char in word]
+            alternatives.append((SEPARATOR + ("*" if len(word) >= MIN_HOMOGLYPH_WORD else "+")).join(classes))
+            first_chars.update(variants.get(word[0], [word[0]]))
+
+        # 先用前瞻按首字符快速排除，避免在每个位置逐个尝试所有关键词
+        separator = "(?<=" + CJK + ")" + SEPARATOR + "+(?=" + CJK + ")"
+        if alternatives:
+            self._pattern = re.compile("(?=[" + "".join(sorted(first_chars)) + "]|" + SEPARATOR + ")"
+                                       "(?:(?P<keyword>" + "|".join(alternatives) + ")|" + separator + ")")
+        else:
+            self._pattern = re.compile(separator)
+        # 快速预检
+        confusables = "".join(sorted(KEYWORD_CONFUSABLES))
+        self._trigger = re.compile("[" + confusables + "]|" + _TABLE_CHARS.pattern + "|" + SEPARATOR)
+
+    def _replace(self, match) -> str:
+        if match.lastgroup == "keyword":
+            return _SEPARATOR_RE.sub("", match.group()).translate(self._keyword_table)
+        return ""
+
+    def __call__(self, text: str) -> str:
+        """返回规范化后的文本"""
+        if self._trigger.search(text) is None:
+            return text
+        if _TABLE_CHARS.search(text) is not None:
+            text = text.translate(_TABLE)
+        return self._pattern.sub(self._replace, text)
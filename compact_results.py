@@ -0,0 +1,170 @@
+# compact_results.py
+from enum import IntEnum
+from typing import List, Dict, Tuple, Iterator, Union
+from config import Config
+from prompt_attack import AttackResult
+
+class PerturbationCode(IntEnum):
+    """扰动类型的小整数编码"""
+    TYPO = 0
+    EXTRA_CHAR = 1
+    SYNONYM = 2
+    REMOVE_WORD = 3
+    REPHRASE = 4
+    ADD_PREFIX = 5
+
+class TextTable:
+    """共享文本表：相同文本只保存一份，按整数id引用"""
+
+    __slots__ = ('_texts', '_ids')
+
+    def __init__(self):
+        self._texts = []
+        self._ids = {}
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def intern(self, text: str) -> int:
+        """返回文本id，首次出现时加入表中"""
+        text_id = self._ids.get(text)
+        if text_id is None:
+            text_id = len(self._texts)
+            self._texts.append(text)
+            self._ids[text] = text_id
+        return text_id
+
+    def get(self, text_id: int) -> str:
+        return self._texts[text_id]
+
+def encode_diff(original: str, adversarial: str) -> Tuple[int, int, str]:
+    """将对抗文本编码为相对原文的差异：(公共前缀长度, 公共后缀长度, 中间替换串)"""
+    limit = min(len(original), len(adversarial))
+    prefix = 0
+    while prefix < limit and original[prefix] == adversarial[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and original[-1 - suffix] == adversarial[-1 - suffix]:
+        suffix += 1
+    return prefix, suffix, adversarial[prefix:len(adversarial) - suffix]
+
+def apply_diff(original: str, diff: Tuple[int, int, str]) -> str:
+    """由原文和差异还原对抗文本"""
+    prefix, suffix, middle = diff
+    return original[:prefix] + middle + original[len(original) - suffix:]
+
+class CompactAttackResult:
+    """紧凑的攻击结果记录：原文按id引用，扰动类型为整数编码"""
+
+    __slots__ = ('original_id', 'adversarial', 'type_code', 'original_prediction',
+                 'adversarial_prediction', 'similarity_score', 'success')
+
+    def __init__(self, original_id: int, adversarial: Union[str, Tuple[int, int, str]], type_code: int,
+                 original_prediction: int, adversarial_prediction: int,
+                 similarity_score: float, success: bool):
+        self.original_id = original_id
+        self.adversarial = adversarial  # 完整对抗文本，或相对原文的差异
+        self.type_code = type_code
+        self.original_prediction = original_prediction
+        self.adversarial_prediction = adversarial_prediction
+        self.similarity_score = similarity_score
+        self.success = success
+
+class CompactResultStore:
+    """紧凑的攻击结果存储，可按需还原为AttackResult"""
+
+    def __init__(self, store_diffs: bool = False):
+        self.texts = TextTable()
+        self.records = []
+        self.store_diffs = store_diffs  # 是否将对抗文本存为差异
+        # 类型编码表：前几位与PerturbationCode一致，其他类型按出现顺序追加
+        self.type_names = [code.name.lower() for code in PerturbationCode]
+        self._type_codes = {name: code for code, name in enumerate(self.type_names)}
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __getitem__(self, index: int) -> AttackResult:
+        return self.to_attack_result(self.records[index])
+
+    def __iter__(self) -> Iterator[AttackResult]:
+        for record in self.records:
+            yield self.to_attack_result(record)
+
+    def type_code(self, perturbation_type: str) -> int:
+        """获取扰动类型编码"""
+        code = self._type_codes.get(perturbation_type)
+        if code is None:
+            code = len(self.type_names)
+            self.type_names.append(perturbation_type)
+            self._type_codes[perturbation_type] = code
+        return code
+
+    def add(self, result: AttackResult) -> CompactAttackResult:
+        """添加一条攻击结果"""
+        original_id = self.texts.intern(result.original_text)
+        adversarial = result.adversarial_text
+        if self.store_diffs:
+            diff = encode_diff(result.original_text, adversarial)
+            # 只有差异更短时才存差异
+            if len(diff[2]) < len(adversarial):
+                adversarial = diff
+
+        record = CompactAttackResult(
+            original_id=original_id,
+            adversarial=adversarial,
+            type_code=self.type_code(result.perturbation_type),
+            original_prediction=result.original_prediction,
+            adversarial_prediction=result.adversarial_prediction,
+            similarity_score=result.similarity_score,
+            success=result.success
+        )
+        self.records.append(record)
+        return record
+
+    def to_attack_result(self, record: CompactAttackResult) -> AttackResult:
+        """还原为AttackResult"""
+        original_text = self.texts.get(record.original_id)
+        adversarial = record.adversarial
+        adversarial_text = adversarial if isinstance(adversarial, str) else apply_diff(original_text, adversarial)
+
+        return AttackResult(
+            original_text=original_text,
+            adversarial_text=adversarial_text,
+            perturbation_type=self.type_names[record.type_code],
+            original_prediction=record.original_prediction,
+            adversarial_prediction=record.adversarial_prediction,
+            similarity_score=record.similarity_score,
+            success=record.success
+        )
+
+    def to_results(self) -> Dict[str, List[AttackResult]]:
+        """还原为run_batch_attack的结果格式，可直接交给analyze_results"""
+        results = {}
+        for record in self.records:
+            results.setdefault(self.type_names[record.type_code], []).append(self.to_attack_result(record))
+        return results
+
+    @classmethod
+    def from_results(cls, results: Dict[str, List[AttackResult]], store_diffs: bool = False) -> 'CompactResultStore':
+        """从run_batch_attack的结果构建"""
+        store = cls(store_diffs=store_diffs)
+        for result_list in results.values():
+            for result in result_list:
+                store.add(result)
+        return store
+
+    @classmethod
+    def collect(cls, attack, texts: List[str], labels: List[int],
+                perturbation_types: List[str] = None, store_diffs: bool = False) -> 'CompactResultStore':
+        """边攻击边写入紧凑存储，不保留完整的AttackResult列表"""
+        if perturbation_types is None:
+            perturbation_types = []
+            for level_types in Config.PERTURBATION_TYPES.values():
+                perturbation_types.extend(level_types)
+
+        store = cls(store_diffs=store_diffs)
+        for text, label in zip(texts, labels):
+            for ptype in perturbation_types:
+                store.add(attack.generate_adversarial_sample(text, label, ptype))
+        return store
@@ -0,0 +1,106 @@
+# composite_attack.py
+import random
+from collections import deque
+from itertools import islice
+from typing import List, Dict, Tuple, Iterator, Optional
+from config import Config
+from instrumentation import timed
+from prompt_attack import SimplePromptAttack, AttackResult
+from sharding import sample_seed
+
+class CompositeAttack:
+    """组合扰动：把多种扰动串联成链（如 typo + synonym + add_prefix）
+
+    按广度优先逐个惰性生成扰动链，调用方找到改变预测的链后停止迭代，之后的链不再生成；
+    相同的中间文本去重后不再打分和展开，
+    与原文相似度已低于Config.MIN_SIMILARITY的分支直接剪枝（继续叠加扰动通常只会进一步偏离原文）。
+    """
+
+    def __init__(self, attack: SimplePromptAttack, perturbation_types: List[str] = None,
+                 max_depth: int = None):
+        self.attack = attack
+        if perturbation_types is None:
+            perturbation_types = []
+            for level_types in Config.PERTURBATION_TYPES.values():
+                perturbation_types.extend(level_types)
+        self.perturbation_types = perturbation_types
+        self.max_depth = max_depth or Config.COMPOSITE_MAX_DEPTH
+
+        # 统计
+        self.generated = 0
+        self.duplicates = 0
+        self.pruned = 0
+
+    def iter_candidates(self, text: str, label: int) -> Iterator[Tuple[Tuple[str, ...], str, float]]:
+        """按链长从短到长逐个生成 (扰动链, 对抗文本, 相似度)，只在被迭代到时才扰动"""
+        seen = {text}
+        queue = deque([((), text)])
+        while queue:
+            chain, current = queue.popleft()
+            for ptype in self.perturbation_types:
+                # 同一扰动不连续使用两次
+                if chain and chain[-1] == ptype:
+                    continue
+                candidate = self.attack.perturb(current, label, ptype)
+                self.generated += 1
+
+                if candidate in seen:
+                    self.duplicates += 1
+                    continue
+                seen.add(candidate)
+
+                similarity = self.attack.data_loader.calculate_similarity(text, candidate)
+                if similarity < Config.MIN_SIMILARITY:
+                    self.pruned += 1
+                    continue
+                if len(chain) + 1 < self.max_depth:
+                    queue.append((chain + (ptype,), candidate))
+                yield chain + (ptype,), candidate, similarity
+
+    @timed("attack.composite_sample")
+    def attack_sample(self, text: str, label: int) -> Optional[AttackResult]:
+        """对单个样本按链长从短到长尝试扰动链，每次批量打分一小批，找到改变预测的链即返回"""
+        original_pred = self.attack.model.predict([text])[0]
+        self.attack.query_count += 1
+        best = None
+        candidates = self.iter_candidates(text, label)
+        batch_size = len(self.perturbation_types)
+        while True:
+            batch = list(islice(candidates, batch_size))
+            if not batch:
+                return best
+            predictions = self.attack.model.predict([candidate for _, candidate, _ in batch])
+            self.attack.query_count += len(batch)
+            for (chain, candidate, _), adv_pred in zip(batch, predictions):
+                result = self.attack.build_result(text, candidate, "+".join(chain), original_pred, adv_pred)
+                if result.success:
+                    return result
+                if best is None or result.similarity_score > best.similarity_score:
+                    best = result
+
+    def run(self, texts: List[str], labels: List[int], ids: List[str] = None) -> Dict:
+        """批量运行组合扰动攻击；给出样本编号时每个样本按sample_seed(编号, "composite")播种"""
+        ids = ids if ids is not None else [None] * len(texts)
+        queries_before = self.attack.query_count
+        results = []
+        for text, label, sample_id in zip(texts, labels, ids):
+            if sample_id is not None:
+                random.seed(sample_seed(sample_id, "composite"))
+            result = self.attack_sample(text, label)
+            if result is not None:
+                results.append(result)
+        successes = [r for r in results if r.success]
+
+        chain_counts = {}
+        for r in successes:
+            chain_counts[r.perturbation_type] = chain_counts.get(r.perturbation_type, 0) + 1
+
+        return {
+            "results": results,
+            "success_rate": len(successes) / len(texts) if texts else 0.0,
+            "successful_chains": chain_counts,
+            "queries_used": self.attack.query_count - queries_before,
+            "generated": self.generated,
+            "duplicates": self.duplicates,
+            "pruned": self.pruned
+        }
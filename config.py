@@ -7,6 +7,7 @@ class Config:
     SEED = 42
     DEBUG = True
     SAMPLE_SIZE = 50  # 从大数据集中抽取的样本数
+    SAMPLE_FRAUD_RATIO = 0.5  # 分层抽样时欺诈样本的目标比例
     
     # 数据设置
     DATA_PATH = "./data/fraud_dialog_dataset.csv"
@@ -38,12 +39,92 @@ class Config:
         "sentence": ["rephrase", "add_prefix"]
     }
     
+    # 词重要性排序（留一法批量打分）：固定扰动未成功时按重要性依次多扰动一个词，首次成功即停止
+    # 默认关闭：300条样本上成功数不变，排序使总查询数从3600增至约9400（每次成功约24→62次）
+    USE_WORD_IMPORTANCE = False
+    IMPORTANCE_TOP_K = 3  # 优先扰动的词数
+    
+    # 自适应攻击调度（UCB多臂老虎机，首次成功即停止）
+    USE_ATTACK_SCHEDULER = False
+    SCHEDULER_BUDGET = 6  # 每个样本最多尝试的扰动类型数
+    SCHEDULER_EXPLORATION = 1.0  # UCB探索系数
+    
+    # 组合扰动链（typo + synonym + ... 串联，单一扰动失败的样本可能被组合扰动翻转）
+    USE_COMPOSITE_ATTACK = False
+    COMPOSITE_MAX_DEPTH = 3  # 扰动链最大长度
+    
+    # 通用触发词搜索（对整个语料翻转预测的前缀/后缀）
+    USE_TRIGGER_SEARCH = False
+    TRIGGER_MAX_WORDS = 3  # 触发词最多由几个片段拼接
+    TRIGGER_BEAM_WIDTH = 5  # 每轮保留的候选数
+    TRIGGER_TOP_K = 10  # 报告的触发词数
+    
+    # 输入规范化（打分前还原插入的分隔符和形近字）
+    USE_CANONICALIZATION = False
+    
     # 保真度阈值（简化）
     MAX_WORD_CHANGES = 15  # 最多允许修改的词数
     MIN_SIMILARITY = 0.3  # 降低相似度要求从0.5到0.3，允许更大改动
     
     # 模型阈值调整
     MODEL_THRESHOLD = 0.4  # 可以调整模型阈值，更容易改变预测
+    VULNERABLE_BAND = 0.1  # 得分距阈值小于该值的样本视为易受攻击样本
+    
+    # 流式评估
+    EVAL_BATCH_SIZE = 1024  # 每块文本数
+    
+    # 可训练检测器设置（小批量逻辑回归）
+    TRAIN_LEARNING_RATE = 0.5
+    TRAIN_L2 = 1e-4  # L2正则系数
+    TRAIN_EPOCHS = 3
+    TRAIN_BATCH_SIZE = 256
+    TRAINABLE_MODEL_PATH = "./results/trainable_detector.bin"
+    
+    # 对抗增强训练设置
+    AUGMENT_ROUNDS = 3  # 攻击→重训练的轮数
+    AUGMENT_EPOCHS_PER_ROUND = 2  # 每轮重训练的epoch数
+    
+    # 字符n-gram哈希检测器设置
+    HASHED_NUM_FEATURES = 2 ** 18  # 权重数组大小（2的幂），内存 = 大小 × 4字节
+    HASHED_NGRAM_RANGE = (1, 3)  # 字符n-gram长度范围
+    HASHED_MODEL_PATH = "./results/hashed_detector.bin"
+    
+    # 远程检测器设置（异步适配器）
+    REMOTE_HOST = "127.0.0.1"
+    REMOTE_PORT = 8765
+    REMOTE_BATCH_SIZE = 32  # 每个请求包含的文本数
+    REMOTE_MAX_CONCURRENCY = 8  # 同时在途的最大请求数
+    REMOTE_TIMEOUT = 5.0  # 单个请求超时（秒）
+    REMOTE_MAX_RETRIES = 3  # 失败后最多重试次数
+    
+    # 微批打分服务设置
+    SERVICE_MAX_BATCH_SIZE = 64  # 每批最多文本数
+    SERVICE_MAX_WAIT_MS = 5.0  # 首个文本入队后最长等待时间（毫秒）
+    
+    # 文本特征缓存（每条文本的关键词/模式命中只计算一次）
+    FEATURE_CACHE_SIZE = 65536
+    
+    # 性能分析（分阶段计时）
+    ENABLE_INSTRUMENTATION = False  # 是否收集各阶段耗时统计（在导入各模块前设置，关闭时@timed不包装函数）
+    INSTRUMENTATION_TRACE_MEMORY = True  # 是否用tracemalloc记录峰值内存
+    
+    # 跨运行的攻击结果缓存（SQLite，按内容寻址）
+    USE_RESULT_CACHE = False
+    RESULT_CACHE_PATH = "./results/result_cache.sqlite"
+    RESULT_CACHE_MAX_ENTRIES = 1000000  # 超出后按最近使用时间淘汰
+    
+    # 攻击进度指标（滑动窗口吞吐、成功率与预计剩余时间）
+    ENABLE_PROGRESS_METRICS = False
+    PROGRESS_INTERVAL = 5.0  # 输出间隔（秒）
+    PROGRESS_WINDOW = 60.0  # 吞吐统计的滑动窗口（秒）
+    PROGRESS_METRICS_PATH = "./results/attack_progress.prom"  # Prometheus文本格式指标文件
+    
+    # 外部词表（lexicon_store.py build 生成的二进制文件），叠加在内置的同义词/替换词典之上
+    LEXICON_PATH = None
+    
+    # 多机分片运行：形如 "0/4" 表示共4片中的第0片，None表示单机处理全部数据
+    SHARD = None
+    SHARD_RESULTS_DIR = "./results/shards"  # 各分片的结果文件，供merge_shards.py合并
     
     # 实验输出
     OUTPUT_DIR = "./results"
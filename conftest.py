@@ -0,0 +1,12 @@
+# conftest.py
+# 测试共用的随机文本生成
+import random
+
+FILLER = ["的", "了", "请", "您", "，", "。", " ", "\n", "!", "！", "abc", "123"]
+
+def random_text(detector, rng: random.Random, min_pieces: int = 0, max_pieces: int = 30) -> str:
+    """由检测器的关键词、模式片段和填充字符随机拼成的文本，长短文本都有"""
+    pieces = detector.fraud_keywords + detector.normal_keywords + FILLER
+    for pattern in detector.fraud_patterns:
+        pieces.extend(pattern.split('.*'))
+    return "".join(rng.choice(pieces) for _ in range(rng.randint(min_pieces, max_pieces)))
@@ -2,8 +2,14 @@
 import re
 import random
 import csv
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Iterator
 from config import Config
+from instrumentation import timed
+from text_features import annotate
+from labeled_dataset import LabeledDataset, allocate, reservoir_sample
+from sharding import ShardSpec
+from shared_corpus import CorpusBuilder
+from lexicon_store import layered, max_key_length
 
 class FraudDialogDataLoader:
     """加载和预处理欺诈对话数据集 - 无外部依赖版本"""
@@ -14,8 +20,12 @@ class FraudDialogDataLoader:
         self.extended_data = []  # 新增：扩展数据
         self.label_map = {"正常": 0, "非欺诈": 0, "欺诈": 1, "诈骗": 1}
         
-        # 内置同义词词典（简化版）
-        self.synonyms = {
+        # 标签提取用的关键词
+        self.fraud_keywords = ["诈骗", "欺诈", "中奖", "点击链接", "密码", "验证码", "账户安全", "退款", "银行卡"]
+        self.normal_keywords = ["客服", "咨询", "快递", "发货", "订单", "查询", "感谢", "帮助"]
+        
+        # 内置同义词词典（简化版），配置了外部词表时叠加其synonyms表
+        self.synonyms = layered({
             "点击": ["打开", "访问", "进入", "点开"],
             "链接": ["网址", "连接", "URL", "网站"],
             "密码": ["密钥", "口令", "登录码"],
@@ -30,8 +40,10 @@ class FraudDialogDataLoader:
             "请": ["麻烦您", "请您", "恳请"],
             "您好": ["你好", "您好啊", "你好呀"],
             "谢谢": ["感谢", "多谢", "谢啦"]
-        }
+        }, "synonyms")
+        self.max_word_length = max(4, max_key_length(self.synonyms))
     
+    @timed("load.parse_dialog")
     def parse_dialog(self, text: str) -> str:
         """解析对话格式，转换为单行文本"""
         # 移除标记和多余空格
@@ -43,15 +55,10 @@ class FraudDialogDataLoader:
     
     def extract_label(self, text: str) -> int:
         """从文本中提取标签"""
-        text_lower = text.lower()
-        
-        # 欺诈关键词
-        fraud_keywords = ["诈骗", "欺诈", "中奖", "点击链接", "密码", "验证码", "账户安全", "退款", "银行卡"]
-        # 正常关键词
-        normal_keywords = ["客服", "咨询", "快递", "发货", "订单", "查询", "感谢", "帮助"]
+        features = annotate(text.lower())
         
-        fraud_count = sum(1 for keyword in fraud_keywords if keyword in text_lower)
-        normal_count = sum(1 for keyword in normal_keywords if keyword in text_lower)
+        fraud_count = features.count(self.fraud_keywords)
+        normal_count = features.count(self.normal_keywords)
         
         # 简单规则：如果包含欺诈关键词且无明显正常关键词，则标记为欺诈
         if fraud_count > 0 and (fraud_count > normal_count or normal_count == 0):
@@ -64,9 +71,9 @@ class FraudDialogDataLoader:
         words = []
         i = 0
         while i < len(text):
-            # 尝试匹配2-4个字符的常见词
+            # 尝试匹配2-4个字符（外部词表中有更长的词时到其最大长度）的常见词
             found = False
-            for length in range(4, 1, -1):
+            for length in range(self.max_word_length, 1, -1):
                 if i + length <= len(text):
                     word = text[i:i+length]
                     if word in self.synonyms:
@@ -80,6 +87,7 @@ class FraudDialogDataLoader:
         
         return words
     
+    @timed("similarity")
     def calculate_similarity(self, text1: str, text2: str) -> float:
         """计算文本相似度（不使用BERTScore）"""
         # 简单的Jaccard相似度
@@ -94,51 +102,84 @@ class FraudDialogDataLoader:
         
         return intersection / union if union > 0 else 0.0
     
-    def load_data(self, sample_size: int = None) -> List[Dict]:
-        """加载数据并转换为标准格式"""
-        data = []
+    def iter_records(self, data_path: str = None) -> Iterator[Dict]:
+        """逐条流式读取数据，不把整个文件读入内存"""
+        path = data_path or self.data_path
         
+        # 尝试加载CSV文件
+        if path.endswith('.csv'):
+            with open(path, 'r', encoding='utf-8') as f:
+                reader = csv.DictReader(f)
+                for row in reader:
+                    if 'text' in row and 'label' in row:
+                        text = self.parse_dialog(row['text'])
+                        label = int(row['label']) if row['label'].isdigit() else self.extract_label(row['text'])
+                        record = {'text': text, 'label': label}
+                        if row.get('id'):
+                            record['id'] = row['id']  # 分片按记录编号分配
+                        yield record
+                    else:
+                        # 如果没有标准列，尝试从内容中提取
+                        for key, value in row.items():
+                            if value and len(value) > 10:  # 假设文本较长
+                                text = self.parse_dialog(value)
+                                label = self.extract_label(value)
+                                yield {'text': text, 'label': label}
+                                break
+        else:
+            # 尝试加载文本文件，按行读取
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip() and len(line.strip()) > 10:
+                        text = self.parse_dialog(line)
+                        label = self.extract_label(line)
+                        yield {'text': text, 'label': label}
+    
+    def iter_batches(self, batch_size: int, data_path: str = None) -> Iterator[Tuple[List[str], List[int]]]:
+        """按批流式读取 (texts, labels)"""
+        texts, labels = [], []
+        for record in self.iter_records(data_path):
+            texts.append(record['text'])
+            labels.append(record['label'])
+            if len(texts) >= batch_size:
+                yield texts, labels
+                texts, labels = [], []
+        if texts:
+            yield texts, labels
+    
+    @timed("load.load_data")
+    def load_data(self, sample_size: int = None, shard: ShardSpec = None) -> List[Dict]:
+        """加载数据并转换为标准格式
+        
+        抽样按数据本身的标签分布分层进行（LabeledDataset.stratified_sample），各标签的比例与全集一致。
+        指定shard时只返回属于该分片的记录：先在全部数据上按固定种子抽样再分片，
+        因此各分片的并集与单机加载的样本相同。
+        """
         try:
-            # 尝试加载CSV文件
-            if self.data_path.endswith('.csv'):
-                with open(self.data_path, 'r', encoding='utf-8') as f:
-                    reader = csv.DictReader(f)
-                    for row in reader:
-                        if 'text' in row and 'label' in row:
-                            text = self.parse_dialog(row['text'])
-                            label = int(row['label']) if row['label'].isdigit() else self.extract_label(row['text'])
-                            data.append({'text': text, 'label': label})
-                        else:
-                            # 如果没有标准列，尝试从内容中提取
-                            for key, value in row.items():
-                                if value and len(value) > 10:  # 假设文本较长
-                                    text = self.parse_dialog(value)
-                                    label = self.extract_label(value)
-                                    data.append({'text': text, 'label': label})
-                                    break
-            else:
-                # 尝试加载文本文件
-                with open(self.data_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    
-                    # 按行分割
-                    lines = content.split('\n')
-                    for line in lines:
-                        if line.strip() and len(line.strip()) > 10:
-                            text = self.parse_dialog(line)
-                            label = self.extract_label(line)
-                            data.append({'text': text, 'label': label})
+            records = self.iter_records()
+            if shard is not None and not sample_size:
+                records = shard.filter(records)  # 不抽样时边读边过滤，只保留本分片
+            data = list(records)
         except Exception as e:
             print(f"加载数据失败: {e}")
             # 创建示例数据
             data = self.create_example_data()
         
-        # 随机抽样（如果数据量大）
+        # 分层抽样（如果数据量大）
         if sample_size and len(data) > sample_size:
-            random.seed(Config.SEED)
-            data = random.sample(data, sample_size)
+            rng = random.Random(Config.SEED)
+            chosen = LabeledDataset.from_records(data).stratified_sample(sample_size, rng=rng)
+            rng.shuffle(chosen)
+            data = [data[index] for index in chosen]
         
+        if shard is not None:
+            data = list(shard.filter(data))
+            print(f"分片 {shard}: ", end="")
         self.data = data
+        self._print_distribution(data)
+        return data
+    
+    def _print_distribution(self, data: List[Dict]):
         print(f"加载了 {len(data)} 条数据")
         
         # 统计标签分布
@@ -146,7 +187,34 @@ class FraudDialogDataLoader:
         normal_count = len(data) - fraud_count
         print(f"欺诈对话: {fraud_count} 条")
         print(f"正常对话: {normal_count} 条")
+    
+    def load_dataset(self, data_path: str = None) -> LabeledDataset:
+        """加载为按标签索引的数据集"""
+        return LabeledDataset.from_records(self.iter_records(data_path))
+    
+    def build_corpus(self, data_path: str = None, shard: ShardSpec = None) -> CorpusBuilder:
+        """流式读取为紧凑语料，再用SharedCorpus.create/save放入共享内存或文件供多进程使用"""
+        records = self.iter_records(data_path)
+        if shard is not None:
+            records = shard.filter(records)
+        return CorpusBuilder().extend(records)
+    
+    @timed("load.load_stratified")
+    def load_stratified(self, sample_size: int, fraud_ratio: float = None) -> List[Dict]:
+        """单遍分层蓄水池抽样：按目标欺诈比例抽取sample_size条，不把整个文件读入内存"""
+        fraud_ratio = fraud_ratio if fraud_ratio is not None else Config.SAMPLE_FRAUD_RATIO
+        per_label = allocate(sample_size, {1: fraud_ratio, 0: 1 - fraud_ratio})
+        rng = random.Random(Config.SEED)
+        try:
+            dataset = reservoir_sample(self.iter_records(), per_label, rng)
+        except Exception as e:
+            print(f"加载数据失败: {e}")
+            dataset = reservoir_sample(self.create_example_data(), per_label, rng)
         
+        data = dataset.records(range(len(dataset)))
+        rng.shuffle(data)
+        self.data = data
+        self._print_distribution(data)
         return data
     
     def create_example_data(self) -> List[Dict]:
@@ -190,24 +258,31 @@ class FraudDialogDataLoader:
         
         return texts, labels
     
-    def load_extended_dataset(self, num_samples: int = 100) -> List[Dict]:
-        """加载扩展数据集（原始数据 + 合成数据）"""
+    def load_extended_dataset(self, num_samples: int = 100, fraud_ratio: float = None) -> List[Dict]:
+        """加载扩展数据集（原始数据 + 合成数据）
+        
+        按目标欺诈比例（默认Config.SAMPLE_FRAUD_RATIO）从原始数据分层抽样，
+        某个标签的原始数据不足时只为该标签生成合成数据补足。
+        """
         print(f"加载扩展数据集，目标样本数: {num_samples}")
+        fraud_ratio = fraud_ratio if fraud_ratio is not None else Config.SAMPLE_FRAUD_RATIO
+        ratios = {1: fraud_ratio, 0: 1 - fraud_ratio}
         
         # 1. 加载原始数据
         original_data = self.load_data()
         print(f"原始数据: {len(original_data)} 条")
         
-        # 2. 生成合成数据（如果原始数据不足）
-        if len(original_data) < num_samples:
-            additional_needed = num_samples - len(original_data)
-            synthetic_data = self.generate_synthetic_data(additional_needed)
+        # 2. 按比例抽取原始数据，不足的标签用合成数据补足
+        dataset = LabeledDataset.from_records(original_data)
+        chosen = dataset.stratified_sample(num_samples, ratios, allow_shortfall=True)
+        extended_data = [original_data[index] for index in chosen]
+        missing = dataset.shortfall(num_samples, ratios)
+        if sum(missing.values()) > 0:
+            synthetic_data = self.generate_synthetic_data(sum(missing.values()), num_fraud=missing.get(1, 0))
             print(f"生成合成数据: {len(synthetic_data)} 条")
             
             # 合并数据
-            extended_data = original_data + synthetic_data
-        else:
-            extended_data = original_data[:num_samples]
+            extended_data = extended_data + synthetic_data
         
         self.extended_data = extended_data
         
@@ -222,8 +297,8 @@ class FraudDialogDataLoader:
         
         return extended_data
     
-    def generate_synthetic_data(self, num_samples: int) -> List[Dict]:
-        """生成合成数据"""
+    def generate_synthetic_data(self, num_samples: int, num_fraud: int = None) -> List[Dict]:
+        """生成合成数据；num_fraud为其中的欺诈样本数，默认按Config.SAMPLE_FRAUD_RATIO分配"""
         synthetic_data = []
         
         # 欺诈对话模板
@@ -259,7 +334,8 @@ class FraudDialogDataLoader:
         }
         
         # 生成欺诈样本
-        num_fraud = int(num_samples * 0.5)  # 50%欺诈样本
+        if num_fraud is None:
+            num_fraud = allocate(num_samples, {1: Config.SAMPLE_FRAUD_RATIO, 0: 1 - Config.SAMPLE_FRAUD_RATIO})[1]
         for i in range(num_fraud):
             template = random.choice(fraud_templates)
             text = template
@@ -0,0 +1,96 @@
+# detector_server.py
+import json
+import random
+import asyncio
+import argparse
+from typing import Dict, Optional
+from config import Config
+from simple_model import SimpleFraudDetector
+
+# 通信协议：每行一个JSON消息
+#   请求: {"id": 1, "texts": ["...", "..."]}
+#   响应: {"id": 1, "scores": [0.12, 0.87], "predictions": [0, 1]}
+#   出错: {"id": 1, "error": "..."}
+
+def encode_message(message: Dict) -> bytes:
+    """编码一条协议消息"""
+    return (json.dumps(message, ensure_ascii=False) + "\n").encode('utf-8')
+
+async def read_message(reader: asyncio.StreamReader) -> Optional[Dict]:
+    """读取一条协议消息，连接关闭时返回None"""
+    line = await reader.readline()
+    if not line:
+        return None
+    return json.loads(line.decode('utf-8'))
+
+class DetectorStubServer:
+    """本地检测器桩服务：包装SimpleFraudDetector并注入可配置的延迟，用于测试远程适配器"""
+
+    def __init__(self, detector: SimpleFraudDetector = None, latency: float = 0.05,
+                 failure_rate: float = 0.0):
+        self.detector = detector or SimpleFraudDetector(threshold=Config.MODEL_THRESHOLD)
+        self.latency = latency  # 每个请求的模拟延迟（秒）
+        self.failure_rate = failure_rate  # 随机返回错误的概率，用于测试重试
+        self.request_count = 0
+        self._server = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        """启动服务，返回实际监听端口（port=0时由系统分配）"""
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        """关闭服务"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def serve_forever(self, host: str = "127.0.0.1", port: int = 0):
+        """启动并一直运行"""
+        port = await self.start(host, port)
+        print(f"检测器桩服务已启动: {host}:{port} (延迟 {self.latency*1000:.0f}ms)")
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """处理一个连接上的全部请求"""
+        try:
+            while True:
+                request = await read_message(reader)
+                if request is None:
+                    break
+                writer.write(encode_message(await self._handle_request(request)))
+                await writer.drain()
+        except (ConnectionError, json.JSONDecodeError):
+            pass
+        finally:
+            writer.close()
+
+    async def _handle_request(self, request: Dict) -> Dict:
+        """处理单个打分请求"""
+        self.request_count += 1
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+
+        if self.failure_rate > 0 and random.random() < self.failure_rate:
+            return {"id": request.get("id"), "error": "injected failure"}
+
+        texts = request.get("texts", [])
+        scores = [fraud for _, fraud in self.detector.predict_proba(texts)]
+        predictions = [1 if score > self.detector.threshold else 0 for score in scores]
+        return {"id": request.get("id"), "scores": scores, "predictions": predictions}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地检测器桩服务")
+    parser.add_argument("--host", default=Config.REMOTE_HOST)
+    parser.add_argument("--port", type=int, default=Config.REMOTE_PORT)
+    parser.add_argument("--latency", type=float, default=0.05, help="每个请求的延迟（秒）")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="随机失败概率")
+    args = parser.parse_args()
+
+    server = DetectorStubServer(latency=args.latency, failure_rate=args.failure_rate)
+    try:
+        asyncio.run(server.serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        print("服务已停止")
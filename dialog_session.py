@@ -0,0 +1,139 @@
+# dialog_session.py
+import re
+from typing import List
+from instrumentation import timed
+from feature_matrix import COLUMN_KEYWORD, COLUMN_PATTERN, COLUMN_LONG_TEXT, COLUMN_EXCLAMATION
+
+class _StagedPattern:
+    """形如 '点击.*链接' 的模式：按'.*'拆成字面片段，依次在文本中寻找
+
+    贪心地取每个片段最早的出现位置，跨轮次保留 (当前片段序号, 下一片段最早起点)。
+    '.'不匹配换行，遇到换行时从第一个片段重新开始。
+    """
+
+    __slots__ = ('parts', 'stage', 'min_start', 'matched')
+
+    def __init__(self, parts: List[str]):
+        self.parts = parts
+        self.stage = 0
+        self.min_start = 0  # 绝对位置
+        self.matched = False
+
+    def feed(self, window: str, window_start: int):
+        """window为上一轮末尾的缓冲加上本轮新增文本，window_start为其在全文中的绝对位置"""
+        offset = max(self.min_start - window_start, 0)
+        while not self.matched:
+            newline = window.find('\n', offset)
+            line_end = newline if newline >= 0 else len(window)
+            found = window.find(self.parts[self.stage], offset, line_end)
+            if found >= 0:
+                offset = found + len(self.parts[self.stage])
+                self.stage += 1
+                self.min_start = window_start + offset
+                if self.stage == len(self.parts):
+                    self.matched = True
+                continue
+            if newline < 0:
+                return
+            # 跨行的部分匹配作废
+            self.stage = 0
+            offset = newline + 1
+            self.min_start = window_start + offset
+
+class DialogSession:
+    """多轮对话的在线检测会话：逐轮输入，每轮后给出更新的欺诈得分
+
+    轮次之间用separator连接，结果与对最终全文 separator.join(turns) 调用
+    detector.base_score 的结果逐位相同（不含随机扰动）。
+    关键词只需在本轮新增文本和上一轮末尾的缓冲区（最长关键词/片段长度-1个字符）中查找；
+    '.*'连接的字面模式分段推进匹配状态；长度与感叹号特征累积更新。
+    因此每轮的开销只与本轮长度有关，与对话总长度无关。
+    其他形式的正则模式无法分段匹配，会对全文重新搜索。
+    """
+
+    def __init__(self, detector, separator: str = " "):
+        if getattr(detector, "canonicalizer", None) is not None:
+            raise ValueError("在线会话不支持带输入规范化的检测器（规范化会跨轮次合并文本）")
+        self.detector = detector
+        self.separator = separator
+        self.columns = detector.feature_columns()
+        self.weights = detector.weight_vector()
+
+        self._keywords = [(j, key) for j, (kind, key) in enumerate(self.columns) if kind == COLUMN_KEYWORD]
+        self._staged = {}
+        self._regex = {}
+        tail = max([len(key) for _, key in self._keywords] + [1]) - 1
+        for j, (kind, key) in enumerate(self.columns):
+            if kind != COLUMN_PATTERN:
+                continue
+            parts = key.split('.*')
+            if all(part and re.escape(part) == part for part in parts):
+                tail = max(tail, max(len(part) for part in parts) - 1)
+                self._staged[j] = parts
+            else:
+                self._regex[j] = re.compile(key)
+        self._tail_size = tail
+        self.reset()
+
+    def reset(self):
+        """开始新的对话"""
+        self.turns = 0
+        self.length = 0
+        self.has_exclamation = False
+        self._tail = ""
+        self._hits = set()
+        self._patterns = {j: _StagedPattern(parts) for j, parts in self._staged.items()}
+        self._full_text = [] if self._regex else None  # 只有非字面模式需要保留全文
+
+    @timed("session.add_turn")
+    def add_turn(self, turn: str) -> float:
+        """输入一轮文本，返回更新后的欺诈得分"""
+        added = turn if self.turns == 0 else self.separator + turn
+        window = self._tail + added
+        window_start = self.length - len(self._tail)
+
+        for j, keyword in self._keywords:
+            if j not in self._hits and keyword in window:
+                self._hits.add(j)
+        for j, pattern in self._patterns.items():
+            if not pattern.matched:
+                pattern.feed(window, window_start)
+                if pattern.matched:
+                    self._hits.add(j)
+        if self._full_text is not None:
+            self._full_text.append(added)
+            text = "".join(self._full_text)
+            for j, compiled in self._regex.items():
+                if j not in self._hits and compiled.search(text) is not None:
+                    self._hits.add(j)
+
+        self.turns += 1
+        self.length += len(added)
+        self.has_exclamation = self.has_exclamation or '!' in added or '！' in added
+        self._tail = window[-self._tail_size:] if self._tail_size else ""
+        return self.score()
+
+    def base_score(self) -> float:
+        """不含随机扰动、未归一化的线性得分（与detector.base_score的加法顺序相同）"""
+        score = self.detector.bias
+        for j, ((kind, key), weight) in enumerate(zip(self.columns, self.weights)):
+            if kind == COLUMN_LONG_TEXT:
+                hit = self.length > key
+            elif kind == COLUMN_EXCLAMATION:
+                hit = self.has_exclamation
+            else:
+                hit = j in self._hits
+            if hit:
+                score += weight
+        return score
+
+    def score(self) -> float:
+        """归一化的欺诈得分"""
+        return self.detector.expected_score(self.base_score())
+
+    def predict(self) -> int:
+        return 1 if self.score() > self.detector.threshold else 0
+
+    def matched_features(self) -> List[str]:
+        """当前命中的关键词和模式"""
+        return [self.columns[j][1] for j in sorted(self._hits)]
@@ -0,0 +1,119 @@
+# feature_matrix.py
+# 语料级特征矩阵与线性打分
+#
+# SimpleFraudDetector的得分是二值特征的线性函数：
+#
+#     score = clip(bias + Σ_j w_j · x_j + noise, 0, 1)
+#
+# 其中x_j依次为：每个欺诈关键词、每个欺诈模式、每个正常关键词是否命中，
+# 文本是否超过长度阈值，以及是否含感叹号。
+#
+# FeatureMatrix按行保存每条文本命中的特征列（CSR稀疏格式，只存非零列号），
+# 整个语料的打分就是一次矩阵-向量乘法 dot(weights, bias)。
+# 每行按列号升序从bias开始累加权重，与SimpleFraudDetector.base_score逐条计算的
+# 加法顺序完全相同，因此两者的结果逐位相等。噪声项在矩阵乘法之后按行顺序逐条抽取，
+# 与逐条调用_calculate_fraud_score时的随机数消耗顺序一致。
+#
+# 项目不依赖NumPy，矩阵用标准库array存储。
+from array import array
+from typing import List, Tuple, Any, Iterable
+from text_features import annotate, AnnotatedText
+
+# 特征列类型
+COLUMN_KEYWORD = "keyword"
+COLUMN_PATTERN = "pattern"
+COLUMN_LONG_TEXT = "long_text"  # 参数为长度阈值
+COLUMN_EXCLAMATION = "exclamation"
+
+Column = Tuple[str, Any]
+
+def feature_value(features: AnnotatedText, column: Column) -> bool:
+    """计算单个二值特征"""
+    kind, key = column
+    if kind == COLUMN_KEYWORD:
+        return features.has(key)
+    if kind == COLUMN_PATTERN:
+        return features.matches(key)
+    if kind == COLUMN_LONG_TEXT:
+        return features.length > key
+    if kind == COLUMN_EXCLAMATION:
+        return features.has_exclamation
+    raise ValueError(f"未知的特征列类型: {kind}")
+
+class FeatureMatrix:
+    """二值特征的CSR稀疏矩阵（行=文本，列=特征）"""
+
+    def __init__(self, columns: List[Column]):
+        self.columns = list(columns)
+        self.indptr = array('l', [0])  # 第i行的非零列号位于 indices[indptr[i]:indptr[i+1]]
+        self.indices = array('l')
+
+    @classmethod
+    def build(cls, texts: Iterable[str], columns: List[Column]) -> 'FeatureMatrix':
+        """由文本构建特征矩阵"""
+        matrix = cls(columns)
+        for text in texts:
+            matrix.append(text)
+        return matrix
+
+    def __len__(self) -> int:
+        return len(self.indptr) - 1
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return len(self), len(self.columns)
+
+    def append(self, text: str):
+        """追加一行"""
+        features = annotate(text)
+        for j, column in enumerate(self.columns):
+            if feature_value(features, column):
+                self.indices.append(j)
+        self.indptr.append(len(self.indices))
+
+    def append_row(self, indices: Iterable[int]):
+        """直接追加一行已计算好的非零列号（升序），不重新提取特征"""
+        self.indices.extend(indices)
+        self.indptr.append(len(self.indices))
+
+    def take(self, rows: Iterable[int]) -> 'FeatureMatrix':
+        """按行号取子矩阵（复制列号，不重新提取特征）"""
+        sub = FeatureMatrix(self.columns)
+        for i in rows:
+            sub.append_row(self.row(i))
+        return sub
+
+    def row(self, i: int) -> array:
+        """第i行命中的特征列号（升序）"""
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def to_dense(self) -> List[List[int]]:
+        """转换为稠密的0/1矩阵"""
+        dense = []
+        for i in range(len(self)):
+            values = [0] * len(self.columns)
+            for j in self.row(i):
+                values[j] = 1
+            dense.append(values)
+        return dense
+
+    def dot(self, weights: List[float], bias: float = 0.0) -> List[float]:
+        """矩阵-向量乘法：返回每行的 bias + Σ w_j·x_j"""
+        if len(weights) != len(self.columns):
+            raise ValueError(f"权重维度{len(weights)}与特征列数{len(self.columns)}不一致")
+        indices = self.indices
+        indptr = self.indptr
+        scores = []
+        for i in range(len(self)):
+            score = bias
+            for k in range(indptr[i], indptr[i + 1]):
+                score += weights[indices[k]]
+            scores.append(score)
+        return scores
+
+    def column_counts(self) -> List[int]:
+        """每列命中的文本数"""
+        counts = [0] * len(self.columns)
+        for j in self.indices:
+            counts[j] += 1
+        return counts
@@ -0,0 +1,143 @@
+# hashed_model.py
+import sys
+import json
+import os
+import zlib
+import math
+import struct
+from array import array
+from typing import List, Dict, Tuple
+from config import Config
+from instrumentation import timed
+from trainable_model import sigmoid, OnlineDetectorMixin
+
+# 权重文件格式：魔数 + 头部长度(uint32) + JSON头部 + float32权重数组（均为小端序）
+HASHED_WEIGHTS_MAGIC = b"HND1"
+
+class HashedNgramDetector(OnlineDetectorMixin):
+    """字符n-gram哈希检测器：n-gram经哈希映射到定长权重数组，不维护词表
+
+    内存固定为 num_features × 4 字节，与词汇量无关；
+    哈希使用crc32（跨进程稳定），并用符号哈希减小冲突带来的偏差。
+    """
+
+    def __init__(self, num_features: int = None, ngram_range: Tuple[int, int] = None,
+                 threshold: float = 0.5, learning_rate: float = None, l2: float = None):
+        self.num_features = num_features or Config.HASHED_NUM_FEATURES
+        if self.num_features & (self.num_features - 1):
+            raise ValueError(f"num_features必须是2的幂: {self.num_features}")
+        self.ngram_range = tuple(ngram_range or Config.HASHED_NGRAM_RANGE)
+        self.threshold = threshold
+        self.learning_rate = learning_rate if learning_rate is not None else Config.TRAIN_LEARNING_RATE
+        self.l2 = l2 if l2 is not None else Config.TRAIN_L2
+        self.weights = array('f', bytes(4 * self.num_features))
+        self.bias = 0.0
+        self.samples_seen = 0
+
+    def _bucket(self, gram: str) -> Tuple[int, float]:
+        """n-gram对应的 (桶下标, 符号)"""
+        h = zlib.crc32(gram.encode('utf-8'))
+        return h & (self.num_features - 1), 1.0 if h & 0x80000000 else -1.0
+
+    def hash_features(self, text: str, buckets: Dict[str, Tuple[int, float]] = None) -> Dict[int, float]:
+        """文本的哈希特征：{桶下标: 带符号计数}；buckets为同一批文本共享的n-gram哈希结果"""
+        if buckets is None:
+            buckets = {}
+        features = {}
+        min_n, max_n = self.ngram_range
+        for n in range(min_n, max_n + 1):
+            for i in range(len(text) - n + 1):
+                gram = text[i:i + n]
+                bucket = buckets.get(gram)
+                if bucket is None:
+                    bucket = buckets[gram] = self._bucket(gram)
+                index, sign = bucket
+                features[index] = features.get(index, 0.0) + sign
+        # 按长度归一化，长短文本得分可比
+        norm = math.sqrt(sum(value * value for value in features.values())) or 1.0
+        return {index: value / norm for index, value in features.items()}
+
+    def hash_rows(self, texts: List[str]) -> List[Dict[int, float]]:
+        """一批文本的哈希特征；批内重复出现的n-gram只哈希一次（缓存随批次释放，模型内存仍与词汇量无关）"""
+        buckets = {}
+        return [self.hash_features(text, buckets) for text in texts]
+
+    def _logits(self, feature_rows: List[Dict[int, float]]) -> List[float]:
+        weights = self.weights
+        bias = self.bias
+        return [bias + sum(weights[index] * value for index, value in row.items()) for row in feature_rows]
+
+    @timed("score.hashed_batch")
+    def score_batch(self, texts: List[str]) -> List[float]:
+        """批量计算欺诈概率"""
+        return [sigmoid(z) for z in self._logits(self.hash_rows(texts))]
+
+    @timed("train.hashed_partial_fit")
+    def partial_fit(self, texts: List[str], labels: List[int]) -> float:
+        """在一个小批量上做一步梯度下降，返回该批的平均对数损失"""
+        n = len(texts)
+        if n == 0:
+            return 0.0
+        rows = self.hash_rows(texts)
+        logits = self._logits(rows)
+
+        # 稀疏梯度：只更新本批出现过的桶
+        gradient = {}
+        bias_gradient = 0.0
+        loss = 0.0
+        for row, z, label in zip(rows, logits, labels):
+            p = sigmoid(z)
+            error = p - label
+            bias_gradient += error
+            for index, value in row.items():
+                gradient[index] = gradient.get(index, 0.0) + error * value
+            loss -= math.log(max(p if label == 1 else 1 - p, 1e-12))
+
+        lr = self.learning_rate
+        for index, grad in gradient.items():
+            self.weights[index] -= lr * (grad / n + self.l2 * self.weights[index])
+        self.bias -= lr * bias_gradient / n
+        self.samples_seen += n
+        return loss / n
+
+    def save(self, path: str = None):
+        """保存权重"""
+        path = path or Config.HASHED_MODEL_PATH
+        header = json.dumps({
+            "num_features": self.num_features,
+            "ngram_range": list(self.ngram_range),
+            "bias": self.bias,
+            "threshold": self.threshold,
+            "samples_seen": self.samples_seen
+        }).encode('utf-8')
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(HASHED_WEIGHTS_MAGIC)
+            f.write(struct.pack('<I', len(header)))
+            f.write(header)
+            weights = array('f', self.weights)
+            if sys.byteorder == 'big':
+                weights.byteswap()
+            weights.tofile(f)
+
+    @classmethod
+    def load(cls, path: str = None) -> 'HashedNgramDetector':
+        """加载save保存的权重"""
+        path = path or Config.HASHED_MODEL_PATH
+        with open(path, 'rb') as f:
+            if f.read(4) != HASHED_WEIGHTS_MAGIC:
+                raise ValueError(f"不是有效的权重文件: {path}")
+            header_len, = struct.unpack('<I', f.read(4))
+            header = json.loads(f.read(header_len).decode('utf-8'))
+            model = cls(num_features=header["num_features"], ngram_range=tuple(header["ngram_range"]),
+                        threshold=header["threshold"])
+            weights = array('f')
+            weights.fromfile(f, model.num_features)
+            if sys.byteorder == 'big':
+                weights.byteswap()
+        model.weights = weights
+        model.bias = header["bias"]
+        model.samples_seen = header.get("samples_seen", 0)
+        return model
@@ -0,0 +1,129 @@
+# instrumentation.py
+import time
+import json
+import bisect
+import functools
+import tracemalloc
+from typing import Dict
+from config import Config
+
+# 延迟直方图桶上界（毫秒），最后一个桶收纳更慢的调用
+HISTOGRAM_BOUNDS_MS = [0.01, 0.1, 1, 10, 100, 1000]
+
+class StageStats:
+    """单个阶段的计时统计"""
+
+    __slots__ = ('count', 'total', 'max', 'histogram')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.histogram = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+
+    def record(self, elapsed: float):
+        self.count += 1
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+        self.histogram[bisect.bisect_left(HISTOGRAM_BOUNDS_MS, elapsed * 1000)] += 1
+
+    def to_dict(self) -> Dict:
+        labels = [f"<={bound}ms" for bound in HISTOGRAM_BOUNDS_MS] + [f">{HISTOGRAM_BOUNDS_MS[-1]}ms"]
+        return {
+            "count": self.count,
+            "total_sec": self.total,
+            "avg_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "max_ms": self.max * 1000,
+            "histogram": dict(zip(labels, self.histogram))
+        }
+
+class Instrumentation:
+    """轻量级分阶段计时：调用次数、总耗时、延迟直方图与峰值内存"""
+
+    def __init__(self, enabled: bool = False, trace_memory: bool = True):
+        self.enabled = enabled
+        self.trace_memory = trace_memory
+        self.stages = {}
+        self._peak = 0
+        self._started_tracemalloc = False
+
+    def reset(self):
+        """清空已收集的统计"""
+        self.stages = {}
+
+    def start(self):
+        """开始一次运行（开启时同时启动tracemalloc）"""
+        self.reset()
+        if self.enabled and self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+    def stop(self) -> int:
+        """结束一次运行，返回峰值内存（字节）"""
+        peak = self.peak_memory()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+        self._peak = peak
+        return peak
+
+    def peak_memory(self) -> int:
+        """当前记录的峰值内存（字节），未追踪时为0"""
+        if tracemalloc.is_tracing():
+            return tracemalloc.get_traced_memory()[1]
+        return self._peak
+
+    def record(self, name: str, elapsed: float):
+        """记录一次调用耗时"""
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = StageStats()
+        stats.record(elapsed)
+
+    def to_dict(self) -> Dict:
+        return {
+            "stages": {name: stats.to_dict() for name, stats in self.stages.items()},
+            "peak_memory_bytes": self.peak_memory()
+        }
+
+    def summary_table(self) -> str:
+        """格式化的统计汇总表"""
+        lines = [f"{'阶段':<28} {'调用次数':>10} {'总耗时(s)':>12} {'平均(ms)':>10} {'最大(ms)':>10}",
+                 "-" * 80]
+        for name, stats in sorted(self.stages.items(), key=lambda item: -item[1].total):
+            data = stats.to_dict()
+            lines.append(f"{name:<28} {data['count']:>10} {data['total_sec']:>12.4f} "
+                         f"{data['avg_ms']:>10.4f} {data['max_ms']:>10.4f}")
+        lines.append(f"峰值内存: {self.peak_memory() / 1024 / 1024:.2f} MB")
+        return "\n".join(lines)
+
+    def dump_json(self, path: str):
+        """保存统计为JSON"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+# 全局实例，由Config控制是否开启
+profiler = Instrumentation(enabled=Config.ENABLE_INSTRUMENTATION,
+                           trace_memory=Config.INSTRUMENTATION_TRACE_MEMORY)
+
+def timed(name: str):
+    """方法计时装饰器
+
+    导入时Config.ENABLE_INSTRUMENTATION为False则直接返回原函数，没有任何额外开销；
+    开启时运行中仍可通过profiler.enabled暂停计时。
+    """
+    def decorator(func):
+        if not Config.ENABLE_INSTRUMENTATION:
+            return func
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.record(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
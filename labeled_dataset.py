@@ -0,0 +1,165 @@
+# labeled_dataset.py
+import random
+from array import array
+from typing import List, Dict, Tuple, Iterable, Iterator
+from config import Config
+
+def allocate(total: int, ratios: Dict[int, float]) -> Dict[int, int]:
+    """按比例把total分配给各标签（最大余数法，保证总数恰好为total）"""
+    weight_sum = sum(ratios.values())
+    if weight_sum <= 0:
+        raise ValueError(f"标签比例之和必须为正: {ratios}")
+    exact = {label: total * weight / weight_sum for label, weight in ratios.items()}
+    counts = {label: int(value) for label, value in exact.items()}
+    remainder = total - sum(counts.values())
+    for label in sorted(exact, key=lambda label: counts[label] - exact[label])[:remainder]:
+        counts[label] += 1
+    return counts
+
+class LabeledDataset:
+    """按标签索引的内存数据集
+
+    文本按加入顺序编号，每个标签维护一个编号数组，
+    因此按标签抽样时每抽一条都是O(1)，不需要扫描或过滤整个数据集。
+    """
+
+    def __init__(self):
+        self.texts = []
+        self.labels = array('b')
+        self._ids = {}  # 标签 -> 编号数组
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict]) -> 'LabeledDataset':
+        dataset = cls()
+        for record in records:
+            dataset.add(record['text'], record['label'])
+        return dataset
+
+    @classmethod
+    def from_texts(cls, texts: Iterable[str], labels: Iterable[int]) -> 'LabeledDataset':
+        dataset = cls()
+        for text, label in zip(texts, labels):
+            dataset.add(text, label)
+        return dataset
+
+    def add(self, text: str, label: int) -> int:
+        """加入一条样本，返回编号"""
+        index = len(self.texts)
+        self.texts.append(text)
+        self.labels.append(label)
+        ids = self._ids.get(label)
+        if ids is None:
+            ids = self._ids[label] = array('l')
+        ids.append(index)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def __getitem__(self, index: int) -> Dict:
+        return {'text': self.texts[index], 'label': self.labels[index]}
+
+    def ids(self, label: int) -> array:
+        """某个标签的全部编号"""
+        return self._ids.get(label, array('l'))
+
+    def label_counts(self) -> Dict[int, int]:
+        return {label: len(ids) for label, ids in sorted(self._ids.items())}
+
+    def records(self, ids: Iterable[int]) -> List[Dict]:
+        return [self[index] for index in ids]
+
+    def _ratios(self, ratios: Dict[int, float] = None) -> Dict[int, float]:
+        """未指定比例时沿用数据集本身的标签分布"""
+        return dict(ratios) if ratios is not None else {label: len(ids) for label, ids in self._ids.items()}
+
+    def shortfall(self, size: int, ratios: Dict[int, float] = None) -> Dict[int, int]:
+        """按目标比例抽取size条时，各标签缺少的样本数（不缺的标签为0）"""
+        return {label: max(count - len(self.ids(label)), 0)
+                for label, count in allocate(size, self._ratios(ratios)).items()}
+
+    def stratified_sample(self, size: int, ratios: Dict[int, float] = None,
+                          rng: random.Random = None, allow_shortfall: bool = False) -> List[int]:
+        """按目标标签比例无放回抽样，返回编号（按标签分组、组内随机）
+
+        某个标签的样本不足时抛出ValueError；allow_shortfall为True时取该标签的全部样本，
+        返回的编号少于size，缺口可用shortfall()得到。
+        """
+        rng = rng or random.Random(Config.SEED)
+        missing = {label: count for label, count in self.shortfall(size, ratios).items() if count}
+        if missing and not allow_shortfall:
+            raise ValueError(f"样本不足: 按比例抽取{size}条时各标签缺少 {missing}")
+        chosen = []
+        for label, count in allocate(size, self._ratios(ratios)).items():
+            ids = self.ids(label)
+            count = min(count, len(ids))
+            chosen.extend(ids[k] for k in rng.sample(range(len(ids)), count))
+        return chosen
+
+    def balanced_batches(self, batch_size: int, ratios: Dict[int, float] = None, rng: random.Random = None,
+                         oversample: bool = True) -> Iterator[Tuple[List[str], List[int]]]:
+        """按目标比例组成的小批量 (texts, labels)，批内顺序打乱；未指定比例时各标签等量
+
+        每个标签各自打乱后按配额依次取用。oversample为True时，一轮持续到样本最多（相对配额）的标签取完，
+        其余标签取完后重新打乱循环使用；为False时任一标签取完即结束。
+        """
+        rng = rng or random.Random(Config.SEED)
+        ratios = ratios if ratios is not None else {label: 1 for label in self._ids}
+        quotas = {label: quota for label, quota in allocate(batch_size, ratios).items()
+                  if quota > 0 and len(self.ids(label)) > 0}
+        if not quotas:
+            return
+        orders = {}
+        positions = {}
+        exhausted = set()
+        for label in quotas:
+            orders[label] = list(self.ids(label))
+            rng.shuffle(orders[label])
+            positions[label] = 0
+
+        while True:
+            batch = []
+            for label, quota in quotas.items():
+                order = orders[label]
+                for _ in range(quota):
+                    if positions[label] >= len(order):
+                        exhausted.add(label)
+                        if not oversample:
+                            return
+                        rng.shuffle(order)
+                        positions[label] = 0
+                    batch.append(order[positions[label]])
+                    positions[label] += 1
+            rng.shuffle(batch)
+            yield [self.texts[index] for index in batch], [self.labels[index] for index in batch]
+            # 每个标签都至少完整用过一遍后结束本轮
+            if all(label in exhausted or positions[label] >= len(orders[label]) for label in quotas):
+                return
+
+def reservoir_sample(records: Iterable[Dict], per_label: Dict[int, int],
+                     rng: random.Random = None) -> LabeledDataset:
+    """分层蓄水池抽样：单遍扫描数据流，每个标签各保留均匀随机的per_label[label]条
+
+    内存只与抽样数成正比，与数据流长度无关；不在per_label中的标签被跳过。
+    """
+    rng = rng or random.Random(Config.SEED)
+    reservoirs = {label: [] for label in per_label}
+    seen = {label: 0 for label in per_label}
+    for record in records:
+        label = record['label']
+        reservoir = reservoirs.get(label)
+        if reservoir is None:
+            continue
+        seen[label] += 1
+        if len(reservoir) < per_label[label]:
+            reservoir.append(record)
+        else:
+            j = rng.randrange(seen[label])
+            if j < per_label[label]:
+                reservoir[j] = record
+
+    dataset = LabeledDataset()
+    for label, reservoir in reservoirs.items():
+        for record in reservoir:
+            dataset.add(record['text'], label)
+    return dataset
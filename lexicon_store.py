@@ -0,0 +1,293 @@
+# lexicon_store.py
+import os
+import sys
+import mmap
+import json
+import bisect
+import struct
+from array import array
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Optional, Tuple
+from config import Config
+from text_features import annotate
+
+# 头部：魔数、版本、条目数、元数据JSON的字节数
+_HEADER = struct.Struct('<4sIQQ')
+_MAGIC = b'FDLX'
+_VERSION = 1
+_TABLE_SEPARATOR = b'\x00'  # 表名与键之间，所有表的键放在同一个有序空间里
+_VALUE_SEPARATOR = '\x1f'
+# UTF-8中不会出现0xFF，前缀p的所有键都落在 [p, p+0xFF) 之内
+_PREFIX_END = b'\xff'
+
+def build_lexicon(text_path: str, output_path: str) -> int:
+    """把文本词表编译为有序的二进制词表，返回条目数
+
+    文本格式每行一条：表名<TAB>键<TAB>值1|值2|...，#开头的行为注释；
+    同一个表中重复的键合并其值（保持首次出现的顺序）。
+    没有值、含空值或含分隔符的条目会被拒绝（ValueError，带行号）。
+    """
+    entries = {}
+    with open(text_path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.rstrip('\n')
+            if not line.strip() or line.startswith('#'):
+                continue
+            parts = line.split('\t')
+            if len(parts) != 3 or not parts[0] or not parts[1]:
+                raise ValueError(f"{text_path}:{line_number}: 格式应为 表名<TAB>键<TAB>值1|值2: {line!r}")
+            table, key, values = parts
+            if '\x00' in table or _VALUE_SEPARATOR in table or '\x00' in key or _VALUE_SEPARATOR in key:
+                raise ValueError(f"{text_path}:{line_number}: 表名和键不能包含控制分隔符: {line!r}")
+            values = values.split('|')
+            if not all(values):
+                raise ValueError(f"{text_path}:{line_number}: 条目必须至少有一个值，且值不能为空: {line!r}")
+            if any(_VALUE_SEPARATOR in value for value in values):
+                raise ValueError(f"{text_path}:{line_number}: 值不能包含分隔符\\x1f: {line!r}")
+            merged = entries.setdefault((table, key), {})
+            for value in values:
+                merged.setdefault(value, None)
+
+    # 按UTF-8字节排序，与码点顺序一致，前缀相同的键相邻
+    encoded = sorted((table.encode('utf-8') + _TABLE_SEPARATOR + key.encode('utf-8'),
+                      _VALUE_SEPARATOR.join(values).encode('utf-8'), table, key)
+                     for (table, key), values in entries.items())
+    tables = {}
+    for _, _, table, key in encoded:
+        info = tables.setdefault(table, {"entries": 0, "max_key_length": 0})
+        info["entries"] += 1
+        info["max_key_length"] = max(info["max_key_length"], len(key))
+
+    key_offsets = array('Q', [0])
+    value_offsets = array('Q', [0])
+    for full_key, value, _, _ in encoded:
+        key_offsets.append(key_offsets[-1] + len(full_key))
+        value_offsets.append(value_offsets[-1] + len(value))
+    meta = json.dumps({"tables": tables}, ensure_ascii=False).encode('utf-8')
+    meta += b' ' * (-(_HEADER.size + len(meta)) % 8)  # 偏移数组按8字节对齐
+
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(output_path, 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, len(encoded), len(meta)))
+        f.write(meta)
+        f.write(key_offsets.tobytes())
+        f.write(value_offsets.tobytes())
+        for full_key, _, _, _ in encoded:
+            f.write(full_key)
+        for _, value, _, _ in encoded:
+            f.write(value)
+    return len(encoded)
+
+class _SortedKeys:
+    """把二进制键区包装成bisect可用的只读序列，比较时只复制被访问的那个键"""
+
+    __slots__ = ('offsets', 'mapped', 'base')
+
+    def __init__(self, offsets, mapped, base: int):
+        self.offsets = offsets
+        self.mapped = mapped
+        self.base = base  # 键区在文件中的起始位置
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> bytes:
+        return self.mapped[self.base + self.offsets[index]:self.base + self.offsets[index + 1]]
+
+class LexiconStore:
+    """内存映射的只读词表（build_lexicon生成）
+
+    打开时只映射文件并读取头部，不构造与词表大小成正比的dict；
+    查询为对有序键的二分查找，前缀查询为一段连续区间。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        magic, version, count, meta_size = _HEADER.unpack_from(view)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"不是有效的词表文件: {path}")
+        position = _HEADER.size
+        self.tables = json.loads(bytes(view[position:position + meta_size]))["tables"]
+        position += meta_size
+        key_offsets = view[position:position + 8 * (count + 1)].cast('Q')
+        position += 8 * (count + 1)
+        self._value_offsets = view[position:position + 8 * (count + 1)].cast('Q')
+        position += 8 * (count + 1)
+        self._keys = _SortedKeys(key_offsets, self._mmap, position)
+        position += key_offsets[count]
+        self._values = view[position:position + self._value_offsets[count]]
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _range(self, prefix: bytes) -> Tuple[int, int]:
+        return (bisect.bisect_left(self._keys, prefix),
+                bisect.bisect_left(self._keys, prefix + _PREFIX_END))
+
+    def _find(self, full_key: bytes, lo: int = 0, hi: int = None) -> int:
+        hi = len(self._keys) if hi is None else hi
+        index = bisect.bisect_left(self._keys, full_key, lo, hi)
+        return index if index < hi and self._keys[index] == full_key else -1
+
+    def _values_at(self, index: int) -> List[str]:
+        raw = str(self._values[self._value_offsets[index]:self._value_offsets[index + 1]], 'utf-8')
+        return raw.split(_VALUE_SEPARATOR) if raw else []
+
+    def table(self, name: str) -> 'LexiconTable':
+        return LexiconTable(self, name)
+
+class LexiconTable(Mapping):
+    """词表中的一个表：只读映射 键 -> 值列表，按键的码点顺序迭代"""
+
+    def __init__(self, store: LexiconStore, name: str):
+        self.store = store
+        self.name = name
+        self._prefix = name.encode('utf-8') + _TABLE_SEPARATOR
+        self._start, self._stop = store._range(self._prefix)
+        self.max_key_length = store.tables.get(name, {}).get("max_key_length", 0)
+
+    def _full_key(self, key: str) -> bytes:
+        return self._prefix + key.encode('utf-8')
+
+    def __getitem__(self, key: str) -> List[str]:
+        index = self.store._find(self._full_key(key), self._start, self._stop)
+        if index < 0:
+            raise KeyError(key)
+        return self.store._values_at(index)
+
+    def __contains__(self, key) -> bool:
+        return isinstance(key, str) and self.store._find(self._full_key(key), self._start, self._stop) >= 0
+
+    def __len__(self) -> int:
+        return self._stop - self._start
+
+    def __iter__(self) -> Iterator[str]:
+        skip = len(self._prefix)
+        for index in range(self._start, self._stop):
+            yield self.store._keys[index][skip:].decode('utf-8')
+
+    def prefix(self, prefix: str) -> Iterator[Tuple[str, List[str]]]:
+        """以prefix开头的全部 (键, 值列表)，按键排序"""
+        start, stop = self.store._range(self._full_key(prefix))
+        skip = len(self._prefix)
+        for index in range(start, stop):
+            yield self.store._keys[index][skip:].decode('utf-8'), self.store._values_at(index)
+
+    def has_prefix(self, prefix: str) -> bool:
+        start, stop = self.store._range(self._full_key(prefix))
+        return start < stop
+
+    def find_in(self, text: str) -> List[str]:
+        """文本中出现的全部键（去重，按键排序）
+
+        从每个位置向后逐字扩展，某个前缀已没有任何键以它开头时立即停止，
+        开销与文本长度成正比，与词表大小只有对数关系。
+        """
+        keys = self.store._keys
+        found = set()
+        for start in range(len(text)):
+            lo = self._start
+            for end in range(start + 1, min(start + self.max_key_length, len(text)) + 1):
+                candidate = self._full_key(text[start:end])
+                # 不小于candidate的第一个键：等于它则命中，不以它开头则没有更长的键
+                lo = bisect.bisect_left(keys, candidate, lo, self._stop)
+                if lo >= self._stop:
+                    break
+                key = keys[lo]
+                if key == candidate:
+                    found.add(text[start:end])
+                elif not key.startswith(candidate):
+                    break
+        return sorted(found)
+
+class LayeredLexicon(Mapping):
+    """内置词典叠加外部词表：先按原顺序迭代内置词，再迭代外部词表中独有的词
+
+    同一个键的值为内置值在前、外部词表新增的值在后。joiner不为None时值为拼接后的字符串
+    （如char_replacements的候选字符）。外部词表中没有值的键视为不存在
+    （build_lexicon不会生成这样的条目，这里防御旧文件），包含判断、迭代与取值保持一致。
+    """
+
+    def __init__(self, builtin: Dict, table: LexiconTable, joiner: Optional[str] = None):
+        self.builtin = builtin
+        self.table = table
+        self.joiner = joiner
+        self.max_key_length = max([table.max_key_length] + [len(key) for key in builtin])
+
+    def __getitem__(self, key: str):
+        extra = self.table.get(key, [])
+        if key not in self.builtin:
+            if not extra:
+                raise KeyError(key)
+            return self.joiner.join(extra) if self.joiner is not None else extra
+        values = self.builtin[key]
+        if self.joiner is not None:
+            return values + "".join(value for value in extra if value not in values)
+        return list(values) + [value for value in extra if value not in values]
+
+    def _extra_only(self, key: str) -> bool:
+        """外部词表中独有且有值的键"""
+        return key not in self.builtin and bool(self.table.get(key))
+
+    def __contains__(self, key) -> bool:
+        return key in self.builtin or (isinstance(key, str) and bool(self.table.get(key)))
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self.builtin
+        for key in self.table:
+            if self._extra_only(key):
+                yield key
+
+    def __len__(self) -> int:
+        # 需要跳过无值的键，只能逐条计数（开销与词表大小成正比）
+        return sum(1 for _ in self)
+
+    def keys_in(self, text: str) -> List[str]:
+        features = annotate(text)
+        present = [key for key in self.builtin if features.has(key)]
+        return present + [key for key in self.table.find_in(text) if self._extra_only(key)]
+
+_stores = {}
+
+def load_lexicon(path: str = None) -> Optional[LexiconStore]:
+    """打开Config.LEXICON_PATH指定的词表（每个进程只映射一次），未配置时返回None"""
+    path = path or Config.LEXICON_PATH
+    if not path:
+        return None
+    store = _stores.get(path)
+    if store is None:
+        store = _stores[path] = LexiconStore(path)
+    return store
+
+def layered(builtin: Dict, table: str, joiner: Optional[str] = None) -> Mapping:
+    """配置了外部词表时返回叠加视图，否则原样返回内置词典"""
+    store = load_lexicon()
+    return LayeredLexicon(builtin, store.table(table), joiner) if store is not None else builtin
+
+def keys_in(lexicon: Mapping, text: str) -> List[str]:
+    """词典中出现在文本里的键，按词典的迭代顺序"""
+    if isinstance(lexicon, LayeredLexicon):
+        return lexicon.keys_in(text)
+    features = annotate(text)
+    return [key for key in lexicon if features.has(key)]
+
+def max_key_length(lexicon: Mapping) -> int:
+    if isinstance(lexicon, LayeredLexicon):
+        return lexicon.max_key_length
+    return max((len(key) for key in lexicon), default=0)
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "build":
+        count = build_lexicon(sys.argv[2], sys.argv[3])
+        print(f"已生成词表 {sys.argv[3]}: {count} 条")
+    elif len(sys.argv) == 5 and sys.argv[1] == "prefix":
+        for key, values in LexiconStore(sys.argv[2]).table(sys.argv[3]).prefix(sys.argv[4]):
+            print(f"{key}\t{'|'.join(values)}")
+    else:
+        print("用法: python lexicon_store.py build 词表.txt 词表.bin")
+        print("      python lexicon_store.py prefix 词表.bin 表名 前缀")
@@ -0,0 +1,92 @@
+# load_generator.py
+import time
+import random
+import asyncio
+import argparse
+from typing import List, Dict
+from config import Config
+from data_loader import FraudDialogDataLoader
+from detector_server import encode_message, read_message
+from scoring_service import MicroBatchScoringService, percentile
+
+async def _client(host: str, port: int, texts: List[str], num_requests: int,
+                  texts_per_request: int, latencies: List[float]):
+    """单个客户端：在一个连接上顺序发送请求"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for request_id in range(num_requests):
+            batch = random.sample(texts, min(texts_per_request, len(texts)))
+            start = time.perf_counter()
+            writer.write(encode_message({"id": request_id, "texts": batch}))
+            await writer.drain()
+            response = await read_message(reader)
+            latencies.append(time.perf_counter() - start)
+            if response is None or "error" in response:
+                raise RuntimeError(f"请求失败: {response}")
+    finally:
+        writer.close()
+
+async def _fetch_stats(host: str, port: int) -> Dict:
+    """查询服务端统计"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(encode_message({"op": "stats"}))
+        await writer.drain()
+        response = await read_message(reader)
+    finally:
+        writer.close()
+    return response.get("stats", {}) if response else {}
+
+async def run_load(host: str, port: int, clients: int = 32, requests_per_client: int = 100,
+                   texts_per_request: int = 1, spawn: bool = False) -> Dict:
+    """运行负载测试，返回客户端与服务端统计"""
+    service = None
+    if spawn:
+        # 在本进程内启动服务，便于本地一键压测
+        service = MicroBatchScoringService()
+        port = await service.start(host, 0)
+
+    try:
+        texts = [item['text'] for item in FraudDialogDataLoader().create_example_data()]
+        latencies = []
+
+        print(f"开始压测: {clients}个并发客户端，每个{requests_per_client}个请求，每请求{texts_per_request}条文本")
+        start = time.perf_counter()
+        await asyncio.gather(*(_client(host, port, texts, requests_per_client, texts_per_request, latencies)
+                               for _ in range(clients)))
+        elapsed = time.perf_counter() - start
+
+        report = {
+            "client_requests": len(latencies),
+            "client_p50_ms": percentile(latencies, 50) * 1000,
+            "client_p99_ms": percentile(latencies, 99) * 1000,
+            "client_requests_per_sec": len(latencies) / elapsed if elapsed > 0 else 0.0,
+            "server": await _fetch_stats(host, port)
+        }
+    finally:
+        # 客户端出错时也要关闭本进程启动的服务
+        if service is not None:
+            await service.close()
+
+    print(f"客户端: 请求数={report['client_requests']}, "
+          f"p50={report['client_p50_ms']:.2f}ms, p99={report['client_p99_ms']:.2f}ms, "
+          f"吞吐={report['client_requests_per_sec']:.1f} req/s")
+    server = report["server"]
+    if server:
+        print(f"服务端: 批次数={server['batches']}, 平均批大小={server['avg_batch_size']:.1f}, "
+              f"p50={server['p50_ms']:.2f}ms, p99={server['p99_ms']:.2f}ms, "
+              f"吞吐={server['texts_per_sec']:.1f} texts/s")
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="微批打分服务压测脚本")
+    parser.add_argument("--host", default=Config.REMOTE_HOST)
+    parser.add_argument("--port", type=int, default=Config.REMOTE_PORT)
+    parser.add_argument("--clients", type=int, default=32, help="并发客户端数")
+    parser.add_argument("--requests", type=int, default=100, help="每个客户端的请求数")
+    parser.add_argument("--texts-per-request", type=int, default=1)
+    parser.add_argument("--spawn", action="store_true", help="在本进程内启动服务后压测")
+    args = parser.parse_args()
+
+    asyncio.run(run_load(args.host, args.port, args.clients, args.requests,
+                         args.texts_per_request, args.spawn))
@@ -0,0 +1,46 @@
+# merge_shards.py
+import os
+import glob
+import json
+import argparse
+from config import Config
+from sharding import merge_shard_results
+from run_optimized import type_result, print_summary, write_report
+
+def load_shard_files(test_data_limit, directory: str = None):
+    """读取某个样本上限下的全部分片结果文件"""
+    directory = directory or Config.SHARD_RESULTS_DIR
+    pattern = os.path.join(directory, f"results_{test_data_limit}samples_shard*of*.json")
+    payloads = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path, 'r', encoding='utf-8') as f:
+            payloads.append(json.load(f))
+    return payloads
+
+def merge_shards(test_data_limit=100, directory: str = None, output_file: str = None):
+    """合并分片结果，输出与单机运行相同格式的报告"""
+    merged = merge_shard_results(load_shard_files(test_data_limit, directory))
+    results = {ptype: type_result(counts["success_count"], counts["change_count"], counts["total_tested"])
+               for ptype, counts in merged["results"].items()}
+    total = merged["total_samples"]
+    baseline_acc = merged["correct"] / total if total else 0.0
+
+    print(f"=== 合并 {merged['shards']} 个分片 (测试样本数: {test_data_limit}) ===")
+    print(f"使用 {total} 个样本")
+    print(f"\n基线准确率: {baseline_acc:.4f} ({merged['correct']}/{total})")
+    print(f"易受攻击样本（得分接近阈值）: {merged['vulnerable_samples']} 个")
+    best_type, best_rate = print_summary(results)
+
+    output_file = output_file or f"optimized_results_{test_data_limit}samples.txt"
+    write_report(output_file, test_data_limit, total, baseline_acc, merged["vulnerable_samples"],
+                 results, best_type, best_rate)
+    print(f"\n合并结果已保存到: {output_file}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="合并各分片的攻击结果")
+    parser.add_argument("--limit", type=int, default=100, help="各分片运行时的test_data_limit")
+    parser.add_argument("--dir", default=None, help="分片结果目录（默认Config.SHARD_RESULTS_DIR）")
+    parser.add_argument("--output", default=None, help="报告文件路径")
+    args = parser.parse_args()
+    merge_shards(args.limit, args.dir, args.output)
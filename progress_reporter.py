@@ -0,0 +1,186 @@
+# progress_reporter.py
+import os
+import time
+from collections import deque
+from typing import Dict, List, Optional
+from config import Config
+
+class _TypeProgress:
+    """单个扰动类型的累计计数与滑动窗口快照"""
+
+    __slots__ = ('samples', 'queries', 'successes', 'total', 'history')
+
+    def __init__(self, total: Optional[int]):
+        self.samples = 0
+        self.queries = 0
+        self.successes = 0
+        self.total = total
+        self.history = deque()  # (时间, 累计样本数, 累计查询数)
+
+    def snapshot(self, now: float, window: float):
+        """记录当前累计值，丢弃窗口之外的旧快照（至少保留一个作为起点）"""
+        self.history.append((now, self.samples, self.queries))
+        while len(self.history) > 2 and now - self.history[1][0] >= window:
+            self.history.popleft()
+
+    def rates(self):
+        """窗口内的 (样本/秒, 查询/秒)"""
+        if len(self.history) < 2:
+            return 0.0, 0.0
+        start_time, start_samples, start_queries = self.history[0]
+        end_time, end_samples, end_queries = self.history[-1]
+        elapsed = end_time - start_time
+        if elapsed <= 0:
+            return 0.0, 0.0
+        return (end_samples - start_samples) / elapsed, (end_queries - start_queries) / elapsed
+
+class ProgressReporter:
+    """长时间攻击运行的进度指标
+
+    热循环中的record()只做计数累加和一次时钟读取；每隔interval秒才按滑动窗口计算
+    各扰动类型的 样本/秒、查询/秒、累计成功率与预计剩余时间，打印一行进度，
+    并以Prometheus文本格式原子地重写指标文件，供本地采集器读取。
+    """
+
+    def __init__(self, totals: Dict[str, int] = None, interval: float = None, window: float = None,
+                 metrics_path: str = None):
+        self.totals = dict(totals or {})
+        self.interval = interval if interval is not None else Config.PROGRESS_INTERVAL
+        self.window = window if window is not None else Config.PROGRESS_WINDOW
+        self.metrics_path = metrics_path if metrics_path is not None else Config.PROGRESS_METRICS_PATH
+
+        self.types = {}
+        self.started = time.monotonic()
+        self._next_flush = self.started + self.interval
+        for ptype in self.totals:
+            self._type(ptype)
+
+    def _type(self, ptype: str) -> _TypeProgress:
+        progress = self.types.get(ptype)
+        if progress is None:
+            progress = self.types[ptype] = _TypeProgress(self.totals.get(ptype))
+            progress.snapshot(time.monotonic(), self.window)
+        return progress
+
+    def record(self, ptype: str, success: bool, queries: int = 0):
+        """记录一个样本的攻击结果"""
+        progress = self.types.get(ptype) or self._type(ptype)
+        progress.samples += 1
+        progress.queries += queries
+        if success:
+            progress.successes += 1
+        now = time.monotonic()
+        if now >= self._next_flush:
+            self.flush(now)
+
+    def flush(self, now: float = None):
+        """计算窗口指标，打印进度并写出指标文件"""
+        now = now if now is not None else time.monotonic()
+        self._next_flush = now + self.interval
+        for progress in self.types.values():
+            progress.snapshot(now, self.window)
+        metrics = self.metrics()
+        print(self.format_line(metrics))
+        if self.metrics_path:
+            self.write_prometheus(metrics)
+        return metrics
+
+    def metrics(self) -> Dict:
+        """当前指标：各扰动类型及总体"""
+        per_type = {}
+        total_rate = 0.0
+        total_remaining = 0
+        known_remaining = True
+        for ptype, progress in self.types.items():
+            samples_per_sec, queries_per_sec = progress.rates()
+            remaining = max(progress.total - progress.samples, 0) if progress.total is not None else None
+            per_type[ptype] = {
+                "samples": progress.samples,
+                "queries": progress.queries,
+                "successes": progress.successes,
+                "samples_per_sec": samples_per_sec,
+                "queries_per_sec": queries_per_sec,
+                "success_rate": progress.successes / progress.samples if progress.samples else 0.0,
+                "eta_sec": remaining / samples_per_sec if remaining is not None and samples_per_sec > 0 else None
+            }
+            total_rate += samples_per_sec
+            if remaining is None:
+                known_remaining = False
+            else:
+                total_remaining += remaining
+
+        samples = sum(item["samples"] for item in per_type.values())
+        successes = sum(item["successes"] for item in per_type.values())
+        return {
+            "elapsed_sec": time.monotonic() - self.started,
+            "samples": samples,
+            "total": sum(self.totals.values()) if self.totals and known_remaining else None,
+            "samples_per_sec": total_rate,
+            "queries_per_sec": sum(item["queries_per_sec"] for item in per_type.values()),
+            "success_rate": successes / samples if samples else 0.0,
+            # 各类型可能依次运行，总体剩余时间按当前总吞吐估计
+            "eta_sec": total_remaining / total_rate if known_remaining and total_rate > 0 else None,
+            "types": per_type
+        }
+
+    @staticmethod
+    def _format_eta(seconds: Optional[float]) -> str:
+        if seconds is None:
+            return "未知"
+        seconds = int(seconds)
+        return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+    def format_line(self, metrics: Dict) -> str:
+        """单行进度"""
+        done = f"{metrics['samples']}/{metrics['total']}" if metrics['total'] is not None else f"{metrics['samples']}"
+        return (f"[进度] 样本 {done}, {metrics['samples_per_sec']:.1f} 样本/s, "
+                f"{metrics['queries_per_sec']:.1f} 查询/s, 成功率 {metrics['success_rate']:.4f}, "
+                f"预计剩余 {self._format_eta(metrics['eta_sec'])}")
+
+    def prometheus_text(self, metrics: Dict) -> str:
+        """Prometheus文本格式"""
+        families = [
+            ("attack_samples_total", "counter", "已攻击的样本数", "samples"),
+            ("attack_queries_total", "counter", "模型查询次数", "queries"),
+            ("attack_successes_total", "counter", "攻击成功的样本数", "successes"),
+            ("attack_samples_per_second", "gauge", "滑动窗口内的样本吞吐", "samples_per_sec"),
+            ("attack_queries_per_second", "gauge", "滑动窗口内的查询吞吐", "queries_per_sec"),
+            ("attack_success_rate", "gauge", "累计攻击成功率", "success_rate"),
+            ("attack_eta_seconds", "gauge", "预计剩余时间（秒）", "eta_sec"),
+        ]
+        lines = []
+        for name, kind, help_text, key in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for ptype, values in metrics["types"].items():
+                if values[key] is not None:
+                    lines.append(f'{name}{{ptype="{ptype}"}} {values[key]}')
+        lines.append("# HELP attack_overall_eta_seconds 总体预计剩余时间（秒）")
+        lines.append("# TYPE attack_overall_eta_seconds gauge")
+        if metrics["eta_sec"] is not None:
+            lines.append(f"attack_overall_eta_seconds {metrics['eta_sec']}")
+        lines.append("# HELP attack_elapsed_seconds 已运行时间（秒）")
+        lines.append("# TYPE attack_elapsed_seconds gauge")
+        lines.append(f"attack_elapsed_seconds {metrics['elapsed_sec']}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, metrics: Dict = None):
+        """写出指标文件：先写临时文件再替换，采集器不会读到半个文件"""
+        metrics = metrics if metrics is not None else self.metrics()
+        directory = os.path.dirname(self.metrics_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = self.metrics_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text(metrics))
+        os.replace(temp_path, self.metrics_path)
+
+    def close(self) -> Dict:
+        """运行结束时输出最终指标"""
+        return self.flush()
+
+def attack_progress(perturbation_types: List[str], samples_per_type: int) -> Optional[ProgressReporter]:
+    """按Config创建进度报告器，未开启时返回None"""
+    if not Config.ENABLE_PROGRESS_METRICS:
+        return None
+    return ProgressReporter({ptype: samples_per_type for ptype in perturbation_types})
@@ -6,6 +6,12 @@ from typing import List, Dict, Tuple, Any, Optional
 from dataclasses import dataclass
 from config import Config
 from data_loader import FraudDialogDataLoader
+from instrumentation import timed
+from text_features import annotate
+from word_importance import WordImportanceRanker
+from feature_matrix import COLUMN_KEYWORD, COLUMN_PATTERN
+from progress_reporter import ProgressReporter, attack_progress
+from lexicon_store import layered, keys_in
 
 @dataclass
 class AttackResult:
@@ -23,6 +29,7 @@ class PerturbationGenerator:
     
     def __init__(self, data_loader: FraudDialogDataLoader):
         self.data_loader = data_loader
+        self.split_keywords = []  # 打断单字词时优先落在其内部的关键词（由攻击器按模型特征设置）
         
         # 字符替换映射（模拟拼写错误）
         self.char_replacements = {
@@ -70,22 +77,51 @@ class PerturbationGenerator:
             "咨询": ["询问", "了解情况", "核实信息"],
             "帮助": ["协助处理", "帮忙解决", "支持操作"]
         }
+        
+        # 判断文本是否像欺诈文本的关键词（改写和添加上下文时使用）
+        self.rephrase_fraud_keywords = ["点击", "密码", "银行", "账户", "中奖", "退款"]
+        self.context_fraud_keywords = ["点击", "密码", "银行", "账户"]
+        
+        # 配置了外部词表时叠加其同名表（外部词表的词按前缀查找）
+        self.char_replacements = layered(self.char_replacements, "char_replacements", joiner="")
+        self.fraud_to_normal = layered(self.fraud_to_normal, "fraud_to_normal")
+        self.normal_to_fraud = layered(self.normal_to_fraud, "normal_to_fraud")
     
-    def character_perturbation(self, text: str, ptype: str) -> str:
-        """字符级扰动"""
+    @timed("perturb.character")
+    def character_perturbation(self, text: str, ptype: str, priority_tokens: List[str] = ()) -> str:
+        """字符级扰动（priority_tokens为需要优先扰动的词，见SimplePromptAttack.generate_adversarial_sample）"""
         if ptype == "typo":
-            return self._add_typos_enhanced(text)
+            return self._add_typos_enhanced(text, priority_tokens)
         elif ptype == "extra_char":
             return self._add_extra_chars_enhanced(text)
         else:
             return text
 
-    def _add_typos_enhanced(self, text: str) -> str:
+    def _split_point(self, text: str, idx: int, token: str) -> int:
+        """在词内部插入空格的位置；单字词落在某个关键词中时，空格插在该关键词内部"""
+        if len(token) > 1:
+            return idx + 1
+        for keyword in self.split_keywords:
+            start = text.find(keyword, max(idx - len(keyword) + 1, 0), idx + len(keyword))
+            if 0 <= start <= idx:
+                return idx + 1 if idx + 1 < start + len(keyword) else idx
+        return idx + 1 if idx + 1 < len(text) else idx
+
+    def _add_typos_enhanced(self, text: str, priority_tokens: List[str] = ()) -> str:
         """增强版拼写错误 - 针对模型关键词"""
         # 针对模型中的核心 pattern 进行拆解
         targets = ["点击", "链接", "密码", "银行", "账户", "中奖", "验证码"]
         result = text
         
+        # 先在指定的重要词内部插入空格
+        for token in priority_tokens:
+            idx = result.find(token)
+            if idx < 0:
+                continue
+            split_at = self._split_point(result, idx, token)
+            if split_at > 0:
+                result = result[:split_at] + " " + result[split_at:]
+        
         # 优先处理欺诈关键词
         for word in targets:
             if word in result:
@@ -127,38 +163,37 @@ class PerturbationGenerator:
         ]
         return text + random.choice(extra_options)
     
-    def word_perturbation(self, text: str, ptype: str) -> str:
-        """词级扰动"""
+    @timed("perturb.word")
+    def word_perturbation(self, text: str, ptype: str, priority_tokens: List[str] = ()) -> str:
+        """词级扰动（priority_tokens含义同character_perturbation）"""
         if ptype == "synonym":
             return self._replace_synonyms_enhanced(text)
         elif ptype == "remove_word":
-            return self._remove_words_strategic(text)
+            return self._remove_words_strategic(text, priority_tokens)
         else:
             return text
 
     def _replace_synonyms_enhanced(self, text: str) -> str:
         """增强版同义词替换 - 针对欺诈检测优化"""
-        # 判断文本类型（粗略判断）
-        fraud_keywords_in_text = sum(1 for kw in self.fraud_to_normal.keys() if kw in text)
-        normal_keywords_in_text = sum(1 for kw in self.normal_to_fraud.keys() if kw in text)
+        # 判断文本类型（粗略判断）：文本中出现的词典词，按词典顺序
+        fraud_words_in_text = keys_in(self.fraud_to_normal, text)
+        normal_words_in_text = keys_in(self.normal_to_fraud, text)
         
-        is_fraud_like = fraud_keywords_in_text > normal_keywords_in_text
+        is_fraud_like = len(fraud_words_in_text) > len(normal_words_in_text)
         
         result = text
         
-        # 应用替换
+        # 应用替换（每次只替换一个词）
         if is_fraud_like:
             # 欺诈样本：把欺诈词换成正常词
-            for fraud_word, normal_words in self.fraud_to_normal.items():
-                if fraud_word in result:
-                    result = result.replace(fraud_word, random.choice(normal_words), 1)
-                    break  # 每次只替换一个词
+            if fraud_words_in_text:
+                fraud_word = fraud_words_in_text[0]
+                result = result.replace(fraud_word, random.choice(self.fraud_to_normal[fraud_word]), 1)
         else:
             # 正常样本：添加一点可疑词
-            for normal_word, fraud_words in self.normal_to_fraud.items():
-                if normal_word in result:
-                    result = result.replace(normal_word, random.choice(fraud_words), 1)
-                    break
+            if normal_words_in_text:
+                normal_word = normal_words_in_text[0]
+                result = result.replace(normal_word, random.choice(self.normal_to_fraud[normal_word]), 1)
         
         # 如果还是没有变化，加个后缀
         if result == text:
@@ -166,8 +201,8 @@ class PerturbationGenerator:
         
         return result
 
-    def _remove_words_strategic(self, text: str) -> str:
-        """策略性删除词语"""
+    def _remove_words_strategic(self, text: str, priority_tokens: List[str] = ()) -> str:
+        """策略性删除词语（指定priority_tokens时删除这些词，否则删除第一个命中的常见关键词）"""
         # 删除一些可能的关键词来改变分类
         words_to_remove = [
             "点击", "立即", "必须", "紧急", "重要",
@@ -175,10 +210,14 @@ class PerturbationGenerator:
         ]
         
         result = text
-        for word in words_to_remove:
-            if word in result:
-                result = result.replace(word, "")
-                break
+        if priority_tokens:
+            for word in priority_tokens:
+                result = result.replace(word, "", 1)
+        else:
+            for word in words_to_remove:
+                if word in result:
+                    result = result.replace(word, "")
+                    break
         
         # 清理多余空格
         result = ' '.join(result.split())
@@ -189,6 +228,7 @@ class PerturbationGenerator:
         
         return result if result else text + "。"
     
+    @timed("perturb.sentence")
     def sentence_perturbation(self, text: str, ptype: str) -> str:
         """句子级扰动"""
         if ptype == "rephrase":
@@ -220,8 +260,7 @@ class PerturbationGenerator:
         ]
         
         # 判断是否是欺诈类文本
-        fraud_keywords = ["点击", "密码", "银行", "账户", "中奖", "退款"]
-        is_fraud_like = any(keyword in text for keyword in fraud_keywords)
+        is_fraud_like = annotate(text).any_of(self.rephrase_fraud_keywords)
         
         result = text
         if is_fraud_like:
@@ -253,9 +292,7 @@ class PerturbationGenerator:
     def _add_context(self, text: str) -> str:
         """添加上下文"""
         # 根据内容类型添加不同的上下文
-        fraud_keywords = ["点击", "密码", "银行", "账户"]
-        
-        if any(keyword in text for keyword in fraud_keywords):
+        if annotate(text).any_of(self.context_fraud_keywords):
             # 欺诈类文本：添加正常业务的上下文
             contexts = [
                 "根据系统提示，", 
@@ -277,10 +314,53 @@ class PerturbationGenerator:
 class SimplePromptAttack:
     """简化的PromptAttack - 无外部依赖"""
     
-    def __init__(self, model, data_loader):
+    # 短文本的长度填充（正常向内容）
+    LENGTH_FILLER = " 为了提升您的服务体验，我们会不断优化物流配送效率，如有订单查询需求请联系客服。"
+    # 欺诈样本末尾追加的正常关键词
+    NORMAL_PADDING = "。关于物流快递发货订单查询客服咨询感谢帮助服务"
+    # 欺诈关键词的无害替换（synonym攻击）
+    SYNONYM_REPLACEMENTS = {
+        "点击": ["查看", "访问", "浏览"],
+        "链接": ["网站", "页面", "地址"],
+        "密码": ["信息", "资料", "凭证"],
+        "验证码": ["验证信息", "确认码", "安全码"],
+        "银行卡": ["账户", "卡号", "支付方式"],
+        "中奖": ["获赠", "收到", "获得"]
+    }
+    # 针对性攻击的欺诈关键词替换
+    TARGETED_REPLACEMENTS = {
+        "点击链接": ["访问网站", "查看页面", "浏览网址"],
+        "密码": ["登录信息", "安全凭证", "访问码"],
+        "验证码": ["验证信息", "确认码", "安全验证"],
+        "银行卡": ["支付账户", "金融账户", "资金账号"],
+        "中奖": ["获赠", "收到", "获得礼品"],
+        "退款": ["返款", "退费", "款项退回"],
+        "公安局": ["相关部门", "管理机构", "官方部门"]
+    }
+    
+    def __init__(self, model, data_loader, use_word_importance: bool = None):
         self.model = model
         self.data_loader = data_loader
         self.perturbation_generator = PerturbationGenerator(data_loader)
+        self.query_count = 0  # 攻击过程中的模型查询次数（含词重要性排序的打分）
+        # 配置了外部词表时叠加其fraud_to_normal表
+        self.synonym_replacements = layered(self.SYNONYM_REPLACEMENTS, "fraud_to_normal")
+        self.targeted_replacements = layered(self.TARGETED_REPLACEMENTS, "fraud_to_normal")
+        
+        # 词重要性排序：扰动优先作用于真正影响得分的词
+        if use_word_importance is None:
+            use_word_importance = Config.USE_WORD_IMPORTANCE
+        self.importance_ranker = (WordImportanceRanker(model, data_loader, attack=self)
+                                 if use_word_importance else None)
+        if hasattr(model, "feature_columns"):
+            literals = set()
+            for kind, key in model.feature_columns():
+                if kind == COLUMN_KEYWORD:
+                    literals.add(key)
+                elif kind == COLUMN_PATTERN:
+                    literals.update(part for part in key.split('.*') if re.escape(part) == part)
+            self.perturbation_generator.split_keywords = sorted((word for word in literals if len(word) > 1),
+                                                                key=lambda word: (-len(word), word))
     
     def construct_attack_prompt(self, text: str, label: str, perturbation_type: str) -> str:
         """构建攻击提示"""
@@ -312,14 +392,7 @@ class SimplePromptAttack:
             for fraud_word in fraud_keywords:
                 if fraud_word in result:
                     # 替换为无害词汇
-                    replacements = {
-                        "点击": ["查看", "访问", "浏览"],
-                        "链接": ["网站", "页面", "地址"],
-                        "密码": ["信息", "资料", "凭证"],
-                        "验证码": ["验证信息", "确认码", "安全码"],
-                        "银行卡": ["账户", "卡号", "支付方式"],
-                        "中奖": ["获赠", "收到", "获得"]
-                    }
+                    replacements = self.synonym_replacements
                     if fraud_word in replacements:
                         result = result.replace(fraud_word, random.choice(replacements[fraud_word]))
                         break
@@ -376,21 +449,69 @@ class SimplePromptAttack:
         
         return result
     
+    @timed("attack.generate_sample")
     def generate_adversarial_sample(self, text: str, label: int, perturbation_type: str) -> AttackResult:
         """生成对抗样本 - 优化版"""
+        # 获取模型预测
+        try:
+            adversarial_text, original_pred, adversarial_pred = self.query_sample(text, label, perturbation_type)
+        except Exception as e:
+            print(f"预测失败: {e}")
+            adversarial_text = self.perturb(text, label, perturbation_type)
+            original_pred = label
+            adversarial_pred = 1 - label
+        
+        return self.build_result(text, adversarial_text, perturbation_type, original_pred, adversarial_pred)
+    
+    def query_sample(self, text: str, label: int, perturbation_type: str) -> Tuple[str, int, int]:
+        """生成对抗文本并查询模型，返回 (对抗文本, 原始预测, 对抗预测)；预测失败时抛出异常
+
+        启用词重要性排序时，固定扰动未能攻击成功的样本再按重要性依次多扰动一个词，
+        每个新候选查询一次，首次成功即停止；排序本身只在这时才计算。
+        """
+        adversarial_text = self.perturb(text, label, perturbation_type)
+        self.query_count += 2
+        original_pred = self.model.predict([text])[0]
+        adversarial_pred = self.model.predict([adversarial_text])[0]
+        
+        if self.importance_ranker is None or not self._uses_priority_tokens(label, perturbation_type):
+            return adversarial_text, original_pred, adversarial_pred
+        tokens = []
+        while not self.build_result(text, adversarial_text, perturbation_type,
+                                    original_pred, adversarial_pred).success:
+            ranked = self.importance_ranker.top_tokens(text)
+            if len(tokens) == len(ranked):
+                break
+            tokens.append(ranked[len(tokens)])
+            candidate = self.perturb(text, label, perturbation_type, tokens)
+            if candidate != adversarial_text:
+                self.query_count += 1
+                adversarial_text, adversarial_pred = candidate, self.model.predict([candidate])[0]
+        return adversarial_text, original_pred, adversarial_pred
+    
+    @staticmethod
+    def _uses_priority_tokens(label: int, perturbation_type: str) -> bool:
+        """perturb在这一分支上是否使用priority_tokens（欺诈样本的typo、正常样本的remove_word）"""
+        return perturbation_type == ("typo" if label == 1 else "remove_word")
+    
+    @timed("attack.perturb")
+    def perturb(self, text: str, label: int, perturbation_type: str, priority_tokens: List[str] = ()) -> str:
+        """生成对抗文本（不查询模型）；priority_tokens为需要优先扰动的词"""
         # 根据样本类型选择不同的攻击策略
         if label == 1:  # 欺诈样本
             # 优先使用针对欺诈样本的攻击策略
             if perturbation_type in ["synonym", "rephrase"]:
                 adversarial_text = self._attack_fraud_to_normal(text, perturbation_type)
             else:
-                adversarial_text = self.perturbation_generator.character_perturbation(text, perturbation_type)
+                adversarial_text = self.perturbation_generator.character_perturbation(text, perturbation_type,
+                                                                                     priority_tokens)
         else:  # 正常样本
             # 优先使用针对正常样本的攻击策略
             if perturbation_type in ["typo", "add_prefix"]:
                 adversarial_text = self._attack_normal_to_fraud(text, perturbation_type)
             else:
-                adversarial_text = self.perturbation_generator.word_perturbation(text, perturbation_type)
+                adversarial_text = self.perturbation_generator.word_perturbation(text, perturbation_type,
+                                                                                priority_tokens)
         
         # 确保有变化
         if adversarial_text == text:
@@ -398,21 +519,16 @@ class SimplePromptAttack:
         
         # 强制长度攻击：如果文本短于50字，填充正常向的内容
         if len(adversarial_text) <= 50:
-            filler = " 为了提升您的服务体验，我们会不断优化物流配送效率，如有订单查询需求请联系客服。"
-            adversarial_text += filler
+            adversarial_text += self.LENGTH_FILLER
         
+        return adversarial_text
+    
+    def build_result(self, text: str, adversarial_text: str, perturbation_type: str,
+                     original_pred: int, adversarial_pred: int) -> AttackResult:
+        """根据模型预测组装攻击结果"""
         # 计算相似度
         similarity = self.data_loader.calculate_similarity(text, adversarial_text)
         
-        # 获取模型预测
-        try:
-            original_pred = self.model.predict([text])[0]
-            adversarial_pred = self.model.predict([adversarial_text])[0]
-        except Exception as e:
-            print(f"预测失败: {e}")
-            original_pred = label
-            adversarial_pred = 1 - label
-        
         # 关键修改：只要预测改变就算成功，且相似度达标
         success = False
         if similarity >= Config.MIN_SIMILARITY:
@@ -431,9 +547,11 @@ class SimplePromptAttack:
             success=success
         )
     
+    @timed("attack.run_batch")
     def run_batch_attack(self, texts: List[str], labels: List[int], 
-                        perturbation_types: List[str] = None) -> Dict[str, List[AttackResult]]:
-        """批量运行攻击"""
+                        perturbation_types: List[str] = None,
+                        progress: ProgressReporter = None) -> Dict[str, List[AttackResult]]:
+        """批量运行攻击（progress为空时按Config决定是否输出进度指标）"""
         if perturbation_types is None:
             # 使用所有扰动类型
             perturbation_types = []
@@ -441,6 +559,8 @@ class SimplePromptAttack:
                 perturbation_types.extend(level_types)
         
         results = {ptype: [] for ptype in perturbation_types}
+        if progress is None:
+            progress = attack_progress(perturbation_types, len(texts))
         
         print(f"开始批量攻击，共{len(texts)}个样本，{len(perturbation_types)}种扰动类型")
         
@@ -449,9 +569,14 @@ class SimplePromptAttack:
                 print(f"处理进度: {i}/{len(texts)}")
             
             for ptype in perturbation_types:
+                queries_before = self.query_count
                 result = self.generate_adversarial_sample(text, label, ptype)
                 results[ptype].append(result)
+                if progress is not None:
+                    progress.record(ptype, result.success, self.query_count - queries_before)
         
+        if progress is not None:
+            progress.close()
         return results
     
     def analyze_results(self, results: Dict[str, List[AttackResult]]) -> Dict[str, Dict]:
@@ -494,25 +619,20 @@ class SimplePromptAttack:
         """攻击欺诈样本：欺诈 -> 正常"""
         result = text
         
-        # 1. 替换欺诈关键词
-        fraud_replacements = {
-            "点击链接": ["访问网站", "查看页面", "浏览网址"],
-            "密码": ["登录信息", "安全凭证", "访问码"],
-            "验证码": ["验证信息", "确认码", "安全验证"],
-            "银行卡": ["支付账户", "金融账户", "资金账号"],
-            "中奖": ["获赠", "收到", "获得礼品"],
-            "退款": ["返款", "退费", "款项退回"],
-            "公安局": ["相关部门", "管理机构", "官方部门"]
-        }
+        # 1. 替换欺诈关键词（只考虑文本中出现的词）
+        fraud_replacements = self.targeted_replacements
+        candidates = [(word, fraud_replacements[word]) for word in keys_in(fraud_replacements, text)]
+        if self.importance_ranker is not None:
+            # 按重要性排序，优先替换影响最大的关键词
+            candidates.sort(key=lambda item: -self.importance_ranker.importance_of(text, item[0]))
         
-        for fraud_word, replacements in fraud_replacements.items():
+        for fraud_word, replacements in candidates:
             if fraud_word in result:
                 result = result.replace(fraud_word, random.choice(replacements))
                 break
         
         # 2. 添加大量正常关键词
-        normal_padding = "。关于物流快递发货订单查询客服咨询感谢帮助服务"
-        result = result + normal_padding[:random.randint(10, 20)]
+        result = result + self.NORMAL_PADDING[:random.randint(10, 20)]
         
         # 3. 如果还没变化，强制改写
         if result == text:
@@ -0,0 +1,244 @@
+# result_cache.py
+import os
+import sys
+import time
+import random
+import sqlite3
+import hashlib
+from array import array
+from typing import List, Dict, Tuple
+from config import Config
+from instrumentation import timed
+from prompt_attack import SimplePromptAttack, AttackResult
+from sharding import sample_seed
+
+# 基线打分（原文的预测与得分）在缓存中使用的扰动类型名
+BASELINE = "__baseline__"
+
+# 表结构版本：与文件中记录的版本不同时重建表
+SCHEMA_VERSION = 2
+
+# 影响攻击结果的模块：源码变化后旧缓存自动失效
+CODE_MODULES = ("prompt_attack", "data_loader", "simple_model", "text_features",
+                "feature_matrix", "canonicalize", "word_importance", "lexicon_store")
+
+# 影响扰动生成的配置项
+ATTACK_CONFIG_FIELDS = ("USE_WORD_IMPORTANCE", "IMPORTANCE_TOP_K", "LEXICON_PATH")
+
+def code_version(extra_modules: Tuple[str, ...] = ()) -> str:
+    """相关模块源码的哈希"""
+    digest = hashlib.sha256()
+    for name in CODE_MODULES + tuple(extra_modules):
+        module = sys.modules.get(name)
+        path = getattr(module, "__file__", None)
+        if path and os.path.exists(path):
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+def attack_fingerprint(attack: SimplePromptAttack) -> str:
+    """扰动配置的哈希：相关Config项、是否启用词重要性排序，以及外部词表文件的内容"""
+    digest = hashlib.sha256()
+    for name in ATTACK_CONFIG_FIELDS:
+        digest.update(f"{name}={getattr(Config, name)!r}\x1f".encode('utf-8'))
+    digest.update(repr(attack.importance_ranker is not None).encode('utf-8'))
+    if Config.LEXICON_PATH and os.path.exists(Config.LEXICON_PATH):
+        with open(Config.LEXICON_PATH, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+def detector_fingerprint(model) -> str:
+    """检测器配置与权重的哈希：阈值、噪声、特征列、权重等任一变化都会得到不同的指纹"""
+    digest = hashlib.sha256(type(model).__name__.encode('utf-8'))
+    for name in ("threshold", "noise", "bias", "num_features", "ngram_range"):
+        digest.update(repr(getattr(model, name, None)).encode('utf-8'))
+    digest.update(repr(getattr(model, "canonicalizer", None) is not None).encode('utf-8'))
+    if hasattr(model, "feature_columns"):
+        digest.update(repr(model.feature_columns()).encode('utf-8'))
+        digest.update(repr(model.weight_vector()).encode('utf-8'))
+    weights = getattr(model, "weights", None)
+    if isinstance(weights, array):
+        digest.update(weights.tobytes())
+    return digest.hexdigest()
+
+class ResultCache:
+    """跨运行的攻击结果缓存（SQLite，按内容寻址）
+
+    键为 sha256(样本编号, 文本, 标签, 扰动类型, 种子, 检测器指纹, 扰动配置, 代码版本)，
+    值为对抗文本、原始/对抗预测、相似度；基线打分（预测与得分）以扰动类型BASELINE存在同一张表中。
+    未命中的样本与run_optimized不用缓存时相同：按sample_seed(样本编号, 扰动类型)播种后
+    调用相同的打分流程，因此开启缓存与否结果一致，且与样本顺序和其他样本无关，
+    重复运行或语料小幅变化时只需计算新增部分。超过容量时按最近使用时间淘汰。
+    """
+
+    # SQLite单条语句的参数个数上限较低，批量查询时分块
+    QUERY_CHUNK = 500
+
+    def __init__(self, attack: SimplePromptAttack, path: str = None, max_entries: int = None,
+                 seed: int = None):
+        self.attack = attack
+        self.path = path or Config.RESULT_CACHE_PATH
+        self.max_entries = max_entries or Config.RESULT_CACHE_MAX_ENTRIES
+        self.seed = seed if seed is not None else Config.SEED
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(self.path)
+        if self.connection.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self.connection.execute("DROP TABLE IF EXISTS results")
+            self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                adversarial_text TEXT NOT NULL,
+                score REAL,
+                original_prediction INTEGER NOT NULL,
+                adversarial_prediction INTEGER NOT NULL,
+                similarity REAL NOT NULL,
+                last_used REAL NOT NULL
+            )""")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+        self.connection.commit()
+        self._size = self.connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        self._attack_fingerprint = attack_fingerprint(attack)
+
+        # 统计
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def _key(self, sample_id: str, text: str, label: int, perturbation_type: str, context: str) -> str:
+        digest = hashlib.sha256(context.encode('utf-8'))
+        for part in (sample_id, text, str(label), perturbation_type):
+            digest.update(b"\x1f" + part.encode('utf-8'))
+        return digest.hexdigest()
+
+    def _lookup(self, keys: List[str]) -> Dict[str, tuple]:
+        """批量查询，返回 键 -> 行"""
+        rows = {}
+        unique = list(dict.fromkeys(keys))
+        for start in range(0, len(unique), self.QUERY_CHUNK):
+            chunk = unique[start:start + self.QUERY_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            for row in self.connection.execute(
+                    f"SELECT key, adversarial_text, score, original_prediction, adversarial_prediction, "
+                    f"similarity FROM results WHERE key IN ({placeholders})", chunk):
+                rows[row[0]] = row[1:]
+        return rows
+
+    def _compute(self, sample_id: str, text: str, label: int, perturbation_type: str) -> Tuple[tuple, bool]:
+        """按样本播种后计算一行，返回 (行, 是否可缓存)
+
+        与run_optimized不用缓存时的流程相同：基线依次调用predict与_calculate_fraud_score，
+        攻击与generate_adversarial_sample相同（调用query_sample）。
+        预测失败时同样回退为 原标签→相反标签，这样的结果不写入缓存，下次运行重新计算。
+        """
+        model = self.attack.model
+        if perturbation_type == BASELINE:
+            random.seed(sample_seed(sample_id, seed=self.seed))
+            prediction = model.predict([text])[0]
+            score = model._calculate_fraud_score(text)
+            return (text, score, prediction, prediction, 1.0), True
+
+        random.seed(sample_seed(sample_id, perturbation_type, self.seed))
+        cacheable = True
+        try:
+            adversarial_text, original_pred, adversarial_pred = self.attack.query_sample(text, label,
+                                                                                         perturbation_type)
+        except Exception as e:
+            print(f"预测失败: {e}")
+            adversarial_text = self.attack.perturb(text, label, perturbation_type)
+            original_pred, adversarial_pred = label, 1 - label
+            cacheable = False
+        result = self.attack.build_result(text, adversarial_text, perturbation_type, original_pred, adversarial_pred)
+        return (adversarial_text, None, original_pred, adversarial_pred, result.similarity_score), cacheable
+
+    def _rows(self, texts: List[str], labels: List[int], perturbation_type: str,
+              ids: List[str] = None) -> List[tuple]:
+        """命中的直接读取，未命中的计算后写入缓存；返回与输入一一对应的行
+
+        ids为样本编号（用于播种，默认用文本本身，与sharding.record_id一致）。
+        计算时会重设随机数种子，结束后恢复全局随机数状态，不影响调用方的随机序列。
+        """
+        ids = ids if ids is not None else texts
+        context = (f"{self.seed}\x1f{detector_fingerprint(self.attack.model)}\x1f"
+                   f"{self._attack_fingerprint}\x1f{code_version()}")
+        keys = [self._key(sample_id, text, label, perturbation_type, context)
+                for sample_id, text, label in zip(ids, texts, labels)]
+        rows = self._lookup(keys)
+        hit_keys = set(rows)
+
+        now = time.time()
+        state = random.getstate()
+        fresh = []
+        computed = set()
+        try:
+            for key, sample_id, text, label in zip(keys, ids, texts, labels):
+                if key not in rows:
+                    rows[key], cacheable = self._compute(sample_id, text, label, perturbation_type)
+                    computed.add(key)
+                    if cacheable:
+                        fresh.append((key,) + rows[key] + (now,))
+        finally:
+            random.setstate(state)
+
+        self.misses += len(computed)
+        self.hits += len(keys) - len(computed)
+        with self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)", fresh)
+            self.connection.executemany("UPDATE results SET last_used = ? WHERE key = ?",
+                                        [(now, key) for key in hit_keys])
+        self._size += len(fresh)
+        if self._size > self.max_entries:
+            self.evict()
+        return [rows[key] for key in keys]
+
+    @timed("cache.attack_batch")
+    def attack_batch(self, texts: List[str], labels: List[int], perturbation_type: str,
+                     ids: List[str] = None) -> List[AttackResult]:
+        """批量攻击，结果与AttackResult格式相同"""
+        results = []
+        for text, row in zip(texts, self._rows(texts, labels, perturbation_type, ids)):
+            adversarial_text, _, original_pred, adversarial_pred, similarity = row
+            results.append(AttackResult(
+                original_text=text,
+                adversarial_text=adversarial_text,
+                perturbation_type=perturbation_type,
+                original_prediction=original_pred,
+                adversarial_prediction=adversarial_pred,
+                similarity_score=similarity,
+                # 与build_result的判定相同，相似度阈值按当前配置计算
+                success=similarity >= Config.MIN_SIMILARITY and original_pred != adversarial_pred
+            ))
+        return results
+
+    def baseline(self, texts: List[str], labels: List[int], ids: List[str] = None) -> List[Tuple[int, float]]:
+        """基线测试的 (预测, 得分) 列表"""
+        return [(row[2], row[1]) for row in self._rows(texts, labels, BASELINE, ids)]
+
+    def evict(self):
+        """按最近使用时间淘汰到容量的90%，避免每次插入都触发淘汰"""
+        target = int(self.max_entries * 0.9)
+        excess = self._size - target
+        if excess <= 0:
+            return
+        with self.connection:
+            self.connection.execute(
+                "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY last_used LIMIT ?)", (excess,))
+        self._size = self.connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        self.evicted += excess
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": self._size,
+            "evicted": self.evicted
+        }
+
+    def close(self):
+        self.connection.close()
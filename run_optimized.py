@@ -5,51 +5,121 @@ sys.path.append('.')
 from simple_model import SimpleFraudDetector
 from data_loader import FraudDialogDataLoader
 from prompt_attack import SimplePromptAttack, AttackResult
+from score_index import ScoreIndex
+from instrumentation import profiler
+from attack_scheduler import UCBAttackScheduler
+from composite_attack import CompositeAttack
+from universal_trigger import UniversalTriggerSearch, format_trigger_report
+from progress_reporter import attack_progress
+from result_cache import ResultCache
+from sharding import ShardSpec, record_id, sample_seed, save_shard_results
+from config import Config
 import random
 
-def run_optimized_experiment(test_data_limit=100):
+def type_result(success_count, change_count, total_tested):
+    """单个扰动类型的统计"""
+    return {
+        'success_rate': success_count / total_tested if total_tested > 0 else 0,
+        'change_rate': change_count / total_tested if total_tested > 0 else 0,
+        'success_count': success_count,
+        'change_count': change_count,
+        'total_tested': total_tested
+    }
+
+def print_summary(results):
+    """打印汇总表，返回 (最佳扰动类型, 最佳成功率)"""
+    print("\n" + "="*80)
+    print("实验结果汇总")
+    print("="*80)
+    print(f"{'扰动类型':<12} {'攻击成功率':<12} {'预测改变率':<12} {'成功数/总数':<15}")
+    print("-"*80)
+    
+    best_type = None
+    best_rate = 0
+    
+    for ptype, result in results.items():
+        print(f"{ptype:<12} {result['success_rate']:<12.4f} {result['change_rate']:<12.4f} "
+              f"{result['success_count']}/{result['total_tested']:<15}")
+        
+        if result['success_rate'] > best_rate:
+            best_rate = result['success_rate']
+            best_type = ptype
+    return best_type, best_rate
+
+def write_report(output_file, test_data_limit, total_samples, baseline_acc, vulnerable_samples,
+                 results, best_type, best_rate):
+    """保存实验报告（单机运行与merge_shards.py合并分片结果共用）"""
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write(f"优化版PromptAttack实验报告 (测试样本数: {test_data_limit})\n")
+        f.write("="*60 + "\n")
+        f.write(f"总样本数: {total_samples}\n")
+        f.write(f"基线准确率: {baseline_acc:.4f}\n")
+        f.write(f"易受攻击样本数: {vulnerable_samples}\n\n")
+        
+        f.write("各扰动类型结果:\n")
+        for ptype, result in results.items():
+            f.write(f"  {ptype}: 成功率={result['success_rate']:.4f}, "
+                   f"改变率={result['change_rate']:.4f}, "
+                   f"成功数={result['success_count']}/{result['total_tested']}\n")
+        
+        f.write(f"\n最佳攻击方法: {best_type} (成功率: {best_rate:.4f})\n")
+
+def run_optimized_experiment(test_data_limit=100, shard=None):
     """运行优化的实验
     Args:
         test_data_limit: 每次测试的样本数量，默认100
+        shard: 分片（ShardSpec或"i/n"字符串），默认取Config.SHARD，各分片结果由merge_shards.py合并；
+            每个样本（无论是否分片）都按编号独立播种，合并后的报告与不分片运行相同
     """
+    if isinstance(shard, str):
+        shard = ShardSpec.parse(shard)
+    shard = shard or ShardSpec.from_config()
     print(f"=== 优化版PromptAttack实验 (测试样本数: {test_data_limit}) ===")
     
     # 固定随机种子以便复现
     random.seed(42)
     
+    # 按配置开启分阶段计时
+    profiler.enabled = Config.ENABLE_INSTRUMENTATION
+    profiler.start()
+    
     # 1. 准备数据 - 修改为你的实际数据路径
     data_loader = FraudDialogDataLoader(data_path="D:/desktop/2023150060_LZY_NLP_FinalWork本地/data/训练集结果.csv")
     
     # 加载指定数量的数据
-    data = data_loader.load_data(sample_size=test_data_limit)
+    data = data_loader.load_data(sample_size=test_data_limit, shard=shard)
     
     # 检查数据格式，确保有text和label字段
-    if len(data) == 0:
+    if len(data) == 0 and shard is None:
         print("错误: 没有加载到数据，请检查数据路径和格式")
         return
     
     # 提取文本和标签
     texts = []
     labels = []
+    ids = []
     for item in data:
         # 确保每个数据项都有text和label
         if 'text' in item and 'label' in item:
             texts.append(item['text'])
             labels.append(item['label'])
+            ids.append(record_id(item))
         else:
             print(f"警告: 数据项缺少text或label字段: {item}")
     
-    # 如果没有足够的数据，使用示例数据
-    if len(texts) == 0:
+    # 如果没有足够的数据，使用示例数据（分片运行时本分片可能恰好为空）
+    if len(texts) == 0 and shard is None:
         print("使用示例数据")
         example_data = data_loader.create_example_data()
         texts = [item['text'] for item in example_data]
         labels = [item['label'] for item in example_data]
+        ids = [record_id(item) for item in example_data]
     
     # 确保不超过指定的测试限制
     if len(texts) > test_data_limit:
         texts = texts[:test_data_limit]
         labels = labels[:test_data_limit]
+        ids = ids[:test_data_limit]
     
     print(f"使用 {len(texts)} 个样本")
     print(f"欺诈样本: {sum(labels)} 个")
@@ -58,12 +128,22 @@ def run_optimized_experiment(test_data_limit=100):
     # 2. 创建并测试模型（使用更低的阈值）
     model = SimpleFraudDetector(threshold=0.3)  # 进一步降低阈值
     
+    # 3. 创建攻击器
+    attack = SimplePromptAttack(model, data_loader)
+    # 可选：跨运行的结果缓存（基线打分与攻击结果），重复运行只计算新增样本
+    result_cache = ResultCache(attack) if Config.USE_RESULT_CACHE else None
+    
     print("\n=== 模型基线测试 ===")
     correct = 0
     detailed_results = []
+    baseline_rows = result_cache.baseline(texts, labels, ids) if result_cache is not None else None
     for i, (text, label) in enumerate(zip(texts, labels)):
-        pred = model.predict([text])[0]
-        score = model._calculate_fraud_score(text)
+        if baseline_rows is not None:
+            pred, score = baseline_rows[i]
+        else:
+            random.seed(sample_seed(ids[i]))
+            pred = model.predict([text])[0]
+            score = model._calculate_fraud_score(text)
         if pred == label:
             correct += 1
         
@@ -79,22 +159,15 @@ def run_optimized_experiment(test_data_limit=100):
         if i < 5:
             print(f"样本{i+1}: {text[:40]}... 标签:{label} 得分:{score:.3f} 预测:{pred} {'✓' if pred==label else '✗'}")
     
-    baseline_acc = correct / len(texts)
+    baseline_acc = correct / len(texts) if texts else 0.0
     print(f"\n基线准确率: {baseline_acc:.4f} ({correct}/{len(texts)})")
     
-    # 分析模型易受攻击的样本
-    vulnerable_samples = []
-    for i, result in enumerate(detailed_results):
-        # 寻找得分接近阈值的样本（这些更容易被攻击）
-        score = result['score']
-        if abs(score - 0.3) < 0.1:  # 得分在阈值附近
-            vulnerable_samples.append(i)
+    # 分析模型易受攻击的样本：按得分建立有序索引，二分查找阈值附近的样本
+    score_index = ScoreIndex.from_results(detailed_results)
+    vulnerable_samples = score_index.within(model.threshold, Config.VULNERABLE_BAND)
     
     print(f"易受攻击样本（得分接近阈值）: {len(vulnerable_samples)} 个")
     
-    # 3. 创建攻击器
-    attack = SimplePromptAttack(model, data_loader)
-    
     # 4. 测试所有扰动类型
     perturbation_types = ["typo", "extra_char", "synonym", "remove_word", "rephrase", "add_prefix"]
     
@@ -103,6 +176,13 @@ def run_optimized_experiment(test_data_limit=100):
     print("="*80)
     
     results = {}
+    # 可选：长时间运行的吞吐、成功率与预计剩余时间
+    progress = attack_progress(perturbation_types, len(texts))
+    # 穷举循环的覆盖样本与查询数，供自适应调度对比（不再另跑一遍穷举）
+    covered_indices = set()
+    if attack.importance_ranker is not None:
+        attack.importance_ranker.clear_cache()
+    exhaustive_queries_before = attack.query_count
     
     for ptype in perturbation_types:
         print(f"\n>>> 测试扰动类型: {ptype}")
@@ -111,16 +191,25 @@ def run_optimized_experiment(test_data_limit=100):
         change_count = 0
         detail_log = []
         
-        # 优先测试易受攻击的样本
-        sample_indices = list(range(len(texts)))
-        if vulnerable_samples:
-            # 将易受攻击样本放在前面
-            sample_indices = vulnerable_samples + [i for i in range(len(texts)) if i not in vulnerable_samples]
+        # 优先测试易受攻击的样本（离阈值越近越靠前）
+        sample_indices = score_index.attack_order(model.threshold, Config.VULNERABLE_BAND)
+        cached_results = None
+        if result_cache is not None:
+            cached_results = result_cache.attack_batch([texts[i] for i in sample_indices],
+                                                       [labels[i] for i in sample_indices], ptype,
+                                                       [ids[i] for i in sample_indices])
         
-        for i in sample_indices:
+        for k, i in enumerate(sample_indices):
             text = texts[i]
             label = labels[i]
-            result = attack.generate_adversarial_sample(text, label, ptype)
+            queries_before = attack.query_count
+            if cached_results is not None:
+                result = cached_results[k]
+            else:
+                random.seed(sample_seed(ids[i], ptype))
+                result = attack.generate_adversarial_sample(text, label, ptype)
+            if progress is not None:
+                progress.record(ptype, result.success, attack.query_count - queries_before)
             
             if result.original_prediction != result.adversarial_prediction:
                 change_count += 1
@@ -130,44 +219,67 @@ def run_optimized_experiment(test_data_limit=100):
             
             if result.success:
                 success_count += 1
+                covered_indices.add(i)
         
         total_tested = len(texts)
-        success_rate = success_count / total_tested if total_tested > 0 else 0
-        change_rate = change_count / total_tested if total_tested > 0 else 0
+        results[ptype] = type_result(success_count, change_count, total_tested)
         
-        results[ptype] = {
-            'success_rate': success_rate,
-            'change_rate': change_rate,
-            'success_count': success_count,
-            'change_count': change_count,
-            'total_tested': total_tested
-        }
-        
-        print(f"  攻击成功率: {success_rate:.4f} ({success_count}/{total_tested})")
-        print(f"  预测改变率: {change_rate:.4f} ({change_count}/{total_tested})")
+        print(f"  攻击成功率: {results[ptype]['success_rate']:.4f} ({success_count}/{total_tested})")
+        print(f"  预测改变率: {results[ptype]['change_rate']:.4f} ({change_count}/{total_tested})")
         
         if change_count > 0:
             print("  预测改变的样本:")
             for log in detail_log:
                 print(log)
     
-    # 5. 汇总结果
-    print("\n" + "="*80)
-    print("实验结果汇总")
-    print("="*80)
-    print(f"{'扰动类型':<12} {'攻击成功率':<12} {'预测改变率':<12} {'成功数/总数':<15}")
-    print("-"*80)
+    if progress is not None:
+        progress.close()
+    exhaustive = {"covered_samples": len(covered_indices),
+                  # 缓存命中的结果不查询模型，此时穷举的查询数未知
+                  "queries_used": attack.query_count - exhaustive_queries_before if result_cache is None else None}
+    if result_cache is not None:
+        cache_stats = result_cache.stats()
+        print(f"\n结果缓存: 命中 {cache_stats['hits']}, 新计算 {cache_stats['misses']}, "
+              f"命中率 {cache_stats['hit_rate']:.4f}, 条目 {cache_stats['entries']}")
+        result_cache.close()
     
-    best_type = None
-    best_rate = 0
+    # 可选：自适应调度攻击（首次成功即停止），与上面的穷举结果对比开销
+    if Config.USE_ATTACK_SCHEDULER:
+        print("\n>>> 自适应调度攻击 (UCB)")
+        scheduler = UCBAttackScheduler(attack, perturbation_types)
+        order = score_index.attack_order(model.threshold, Config.VULNERABLE_BAND)
+        scheduled = scheduler.run([texts[i] for i in order], [labels[i] for i in order],
+                                  [ids[i] for i in order], exhaustive)
+        print(f"  覆盖率: {scheduled['coverage']:.4f} ({scheduled['covered_samples']}/{len(texts)})，"
+              f"穷举覆盖率: {scheduled['exhaustive_coverage']:.4f} ({scheduled['exhaustive_covered_samples']}/{len(texts)})")
+        if scheduled['exhaustive_queries'] is not None:
+            print(f"  模型查询: {scheduled['queries_used']} (上面的穷举攻击 {scheduled['exhaustive_queries']}，"
+                  f"节省 {scheduled['queries_saved']})")
+        else:
+            print(f"  模型查询: {scheduled['queries_used']} (穷举结果来自缓存，无法对比查询数)")
     
-    for ptype, result in results.items():
-        print(f"{ptype:<12} {result['success_rate']:<12.4f} {result['change_rate']:<12.4f} "
-              f"{result['success_count']}/{result['total_tested']:<15}")
-        
-        if result['success_rate'] > best_rate:
-            best_rate = result['success_rate']
-            best_type = ptype
+    # 可选：组合扰动链，与上面单一扰动的穷举覆盖率对比
+    if Config.USE_COMPOSITE_ATTACK:
+        print(f"\n>>> 组合扰动攻击 (最大链长 {Config.COMPOSITE_MAX_DEPTH})")
+        composite = CompositeAttack(attack, perturbation_types)
+        composite_result = composite.run(texts, labels, ids)
+        composite_successes = sum(1 for r in composite_result['results'] if r.success)
+        print(f"  成功率: {composite_result['success_rate']:.4f} ({composite_successes}/{len(texts)})，"
+              f"单一扰动覆盖: {exhaustive['covered_samples']}/{len(texts)}")
+        print(f"  模型查询: {composite_result['queries_used']}，生成 {composite_result['generated']}，"
+              f"重复 {composite_result['duplicates']}，剪枝 {composite_result['pruned']}")
+        for chain, count in sorted(composite_result['successful_chains'].items(), key=lambda item: -item[1])[:5]:
+            print(f"    {chain}: {count}")
+    
+    # 可选：通用触发词搜索（同一前缀/后缀对整个语料的翻转率）
+    if Config.USE_TRIGGER_SEARCH:
+        print("\n>>> 通用触发词搜索")
+        trigger_search = UniversalTriggerSearch(model, data_loader)
+        for position in ("prefix", "suffix"):
+            print(format_trigger_report(trigger_search.search(texts, labels, position=position)))
+    
+    # 5. 汇总结果
+    best_type, best_rate = print_summary(results)
     
     # 6. 分析结论
     print("\n" + "="*80)
@@ -207,22 +319,27 @@ def run_optimized_experiment(test_data_limit=100):
     
     # 7. 保存结果
     output_file = f"optimized_results_{test_data_limit}samples.txt"
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(f"优化版PromptAttack实验报告 (测试样本数: {test_data_limit})\n")
-        f.write("="*60 + "\n")
-        f.write(f"总样本数: {len(texts)}\n")
-        f.write(f"基线准确率: {baseline_acc:.4f}\n")
-        f.write(f"易受攻击样本数: {len(vulnerable_samples)}\n\n")
-        
-        f.write("各扰动类型结果:\n")
-        for ptype, result in results.items():
-            f.write(f"  {ptype}: 成功率={result['success_rate']:.4f}, "
-                   f"改变率={result['change_rate']:.4f}, "
-                   f"成功数={result['success_count']}/{result['total_tested']}\n")
-        
-        f.write(f"\n最佳攻击方法: {best_type} (成功率: {best_rate:.4f})\n")
+    if shard is not None:
+        output_file = f"optimized_results_{test_data_limit}samples_{shard.suffix}.txt"
+    write_report(output_file, test_data_limit, len(texts), baseline_acc, len(vulnerable_samples),
+                 results, best_type, best_rate)
     
     print(f"\n详细结果已保存到: {output_file}")
+    if shard is not None:
+        shard_file = save_shard_results(shard, test_data_limit, len(texts), correct,
+                                        len(vulnerable_samples), results)
+        print(f"分片结果已保存到: {shard_file}（全部分片完成后运行 merge_shards.py 合并）")
+    
+    # 输出分阶段耗时统计
+    if profiler.enabled:
+        profiler.stop()
+        print("\n" + "="*80)
+        print("分阶段耗时统计")
+        print("="*80)
+        print(profiler.summary_table())
+        profile_file = f"instrumentation_{test_data_limit}samples.json"
+        profiler.dump_json(profile_file)
+        print(f"耗时统计已保存到: {profile_file}")
     
     # 8. 返回关键结果
     return {
@@ -246,4 +363,7 @@ if __name__ == "__main__":
     #     print(f"\n{'='*80}")
     #     print(f"测试 {count} 个样本")
     #     print('='*80)
-    #     run_optimized_experiment(test_data_limit=count)
\ No newline at end of file
+    #     run_optimized_experiment(test_data_limit=count)
+    
+    # 使用方法4：多机分片运行（每台机器处理一片，完成后运行 merge_shards.py --limit 100 合并报告）
+    # run_optimized_experiment(test_data_limit=100, shard="0/4")
\ No newline at end of file
@@ -0,0 +1,61 @@
+# score_index.py
+import bisect
+from typing import List, Iterable, Tuple
+
+class ScoreIndex:
+    """按基线得分排序的样本索引（二分查找阈值附近样本）"""
+
+    def __init__(self, scores: Iterable[float] = ()):
+        # 两个平行数组：有序得分 与 对应的样本id
+        self._scores = []
+        self._ids = []
+        for sample_id, score in enumerate(scores):
+            self.add(sample_id, score)
+
+    @classmethod
+    def from_results(cls, detailed_results: List[dict], key: str = 'score') -> 'ScoreIndex':
+        """从基线测试的详细结果构建索引（样本id即列表下标）"""
+        index = cls()
+        pairs = sorted((item[key], i) for i, item in enumerate(detailed_results))
+        index._scores = [score for score, _ in pairs]
+        index._ids = [sample_id for _, sample_id in pairs]
+        return index
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, sample_id: int, score: float):
+        """插入一个样本，保持有序"""
+        pos = bisect.bisect_right(self._scores, score)
+        self._scores.insert(pos, score)
+        self._ids.insert(pos, sample_id)
+
+    def within(self, threshold: float, delta: float) -> List[int]:
+        """返回得分落在 (threshold-delta, threshold+delta) 内的样本id，按得分升序"""
+        lo = bisect.bisect_right(self._scores, threshold - delta)
+        hi = bisect.bisect_left(self._scores, threshold + delta)
+        return self._ids[lo:hi]
+
+    def closest(self, threshold: float, k: int) -> List[Tuple[int, float]]:
+        """返回离决策边界最近的k个样本 (id, 距离)，按距离升序"""
+        # 从插入点向两侧归并扩展，复杂度 O(log n + k)
+        right = bisect.bisect_left(self._scores, threshold)
+        left = right - 1
+        picked = []
+        while len(picked) < k and (left >= 0 or right < len(self._scores)):
+            left_dist = threshold - self._scores[left] if left >= 0 else float('inf')
+            right_dist = self._scores[right] - threshold if right < len(self._scores) else float('inf')
+            if left_dist <= right_dist:
+                picked.append((self._ids[left], left_dist))
+                left -= 1
+            else:
+                picked.append((self._ids[right], right_dist))
+                right += 1
+        return picked
+
+    def attack_order(self, threshold: float, delta: float) -> List[int]:
+        """攻击优先顺序：带内样本按离阈值距离升序在前，其余样本按id顺序在后"""
+        in_band = [sample_id for sample_id, _ in self.closest(threshold, len(self.within(threshold, delta)))]
+        in_band_set = set(in_band)
+        rest = [sample_id for sample_id in sorted(self._ids) if sample_id not in in_band_set]
+        return in_band + rest
@@ -0,0 +1,184 @@
+# scoring_service.py
+import time
+import math
+import json
+import asyncio
+import argparse
+from collections import deque
+from typing import List, Dict, Tuple
+from config import Config
+from simple_model import SimpleFraudDetector
+from detector_server import encode_message, read_message
+
+def percentile(values: List[float], q: float) -> float:
+    """计算分位数（最近秩法），q取0~100"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+class MicroBatchScoringService:
+    """微批打分服务：汇聚多个调用方的文本，按批大小或最长等待时间成批打分
+
+    协议与detector_server一致（每行一个JSON），另支持 {"op": "stats"} 查询统计信息。
+    """
+
+    def __init__(self, detector: SimpleFraudDetector = None, max_batch_size: int = None,
+                 max_wait_ms: float = None, latency_window: int = 10000):
+        self.detector = detector or SimpleFraudDetector(threshold=Config.MODEL_THRESHOLD)
+        self.max_batch_size = max_batch_size or Config.SERVICE_MAX_BATCH_SIZE
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else Config.SERVICE_MAX_WAIT_MS) / 1000
+
+        # 统计计数
+        self.latencies = deque(maxlen=latency_window)  # 最近请求的端到端延迟（秒）
+        self.request_count = 0
+        self.text_count = 0
+        self.batch_count = 0
+        self.started_at = None
+
+        self._queue = None
+        self._arrived = None
+        self._server = None
+        self._batcher = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        """启动服务与批处理任务，返回实际监听端口"""
+        self._queue = asyncio.Queue()
+        self._arrived = asyncio.Event()
+        self._batcher = asyncio.create_task(self._batch_loop())
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        self.started_at = time.perf_counter()
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        """关闭服务"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._batcher is not None:
+            self._batcher.cancel()
+            try:
+                await self._batcher
+            except asyncio.CancelledError:
+                pass
+            self._batcher = None
+
+    async def serve_forever(self, host: str = "127.0.0.1", port: int = 0):
+        """启动并一直运行"""
+        port = await self.start(host, port)
+        print(f"微批打分服务已启动: {host}:{port} "
+              f"(批大小 {self.max_batch_size}, 最长等待 {self.max_wait*1000:.1f}ms)")
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def score(self, texts: List[str]) -> List[float]:
+        """进程内提交文本并等待打分结果"""
+        loop = asyncio.get_running_loop()
+        futures = []
+        for text in texts:
+            future = loop.create_future()
+            self._queue.put_nowait((text, future))
+            futures.append(future)
+        self._arrived.set()
+        return list(await asyncio.gather(*futures))
+
+    def stats(self) -> Dict:
+        """当前统计：延迟分位数与吞吐"""
+        elapsed = time.perf_counter() - self.started_at if self.started_at else 0.0
+        latencies = list(self.latencies)
+        return {
+            "requests": self.request_count,
+            "texts": self.text_count,
+            "batches": self.batch_count,
+            "avg_batch_size": self.text_count / self.batch_count if self.batch_count else 0.0,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "texts_per_sec": self.text_count / elapsed if elapsed > 0 else 0.0,
+            "requests_per_sec": self.request_count / elapsed if elapsed > 0 else 0.0,
+            "uptime_sec": elapsed
+        }
+
+    async def _batch_loop(self):
+        """批处理循环：攒够max_batch_size或等待超过max_wait即刷新一批"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                # 先取走已到达的文本，不够一批再等待新文本或截止时间
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                self._arrived.clear()
+                try:
+                    # 等待事件而非直接等待queue.get()，超时取消时不会丢失文本
+                    await asyncio.wait_for(self._arrived.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+            self._flush(batch)
+
+    def _flush(self, batch: List[Tuple[str, asyncio.Future]]):
+        """对一批文本打分并唤醒等待方"""
+        texts = [text for text, _ in batch]
+        try:
+            scores = [fraud for _, fraud in self.detector.predict_proba(texts)]
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batch_count += 1
+        self.text_count += len(batch)
+        for (_, future), score in zip(batch, scores):
+            if not future.done():
+                future.set_result(score)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """处理一个连接上的全部请求（同一连接上的请求按顺序应答）"""
+        try:
+            while True:
+                request = await read_message(reader)
+                if request is None:
+                    break
+                writer.write(encode_message(await self._handle_request(request)))
+                await writer.drain()
+        except (ConnectionError, json.JSONDecodeError):
+            pass
+        finally:
+            writer.close()
+
+    async def _handle_request(self, request: Dict) -> Dict:
+        """处理单个请求"""
+        if request.get("op") == "stats":
+            return {"id": request.get("id"), "stats": self.stats()}
+
+        start = time.perf_counter()
+        try:
+            scores = await self.score(request.get("texts", []))
+        except Exception as e:
+            return {"id": request.get("id"), "error": str(e)}
+        self.request_count += 1
+        self.latencies.append(time.perf_counter() - start)
+
+        predictions = [1 if score > self.detector.threshold else 0 for score in scores]
+        return {"id": request.get("id"), "scores": scores, "predictions": predictions}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="微批打分服务")
+    parser.add_argument("--host", default=Config.REMOTE_HOST)
+    parser.add_argument("--port", type=int, default=Config.REMOTE_PORT)
+    parser.add_argument("--max-batch-size", type=int, default=Config.SERVICE_MAX_BATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=Config.SERVICE_MAX_WAIT_MS)
+    args = parser.parse_args()
+
+    service = MicroBatchScoringService(max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+    try:
+        asyncio.run(service.serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        print("服务已停止")
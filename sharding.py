@@ -0,0 +1,130 @@
+# sharding.py
+import os
+import json
+import zlib
+from typing import Dict, Iterable, Iterator, List, Optional
+from config import Config
+
+def record_id(record: Dict) -> str:
+    """记录的稳定编号：数据中有id列时用id，否则用文本本身"""
+    return str(record.get('id') or record['text'])
+
+def stable_hash(key: str) -> int:
+    """与进程、平台无关的哈希（内置hash()对字符串每次运行都会随机化）"""
+    return zlib.crc32(key.encode('utf-8'))
+
+def sample_seed(key: str, perturbation_type: str = "", seed: int = None) -> int:
+    """单个样本的随机数种子：分片运行时每个样本独立播种，结果与它被分到哪台机器无关"""
+    seed = seed if seed is not None else Config.SEED
+    return stable_hash(f"{seed}\x1f{perturbation_type}\x1f{key}")
+
+class ShardSpec:
+    """数据分片：第index片（从0开始），共count片
+
+    记录按 crc32(记录编号) % count 分配，同一条记录在任何机器上都落入同一分片，
+    各分片互不相交且并集为全部数据。
+    """
+
+    __slots__ = ('index', 'count')
+
+    def __init__(self, index: int, count: int):
+        if count < 1 or not 0 <= index < count:
+            raise ValueError(f"无效的分片: {index}/{count}（要求 0 <= i < n）")
+        self.index = index
+        self.count = count
+
+    @classmethod
+    def parse(cls, spec: str) -> 'ShardSpec':
+        """解析 "i/n" 格式"""
+        try:
+            index, count = (int(part) for part in spec.split('/'))
+        except ValueError:
+            raise ValueError(f"分片格式应为 i/n，例如 0/4: {spec!r}")
+        return cls(index, count)
+
+    @classmethod
+    def from_config(cls) -> Optional['ShardSpec']:
+        """按Config.SHARD创建，未设置时返回None"""
+        return cls.parse(Config.SHARD) if Config.SHARD else None
+
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count}"
+
+    def __repr__(self) -> str:
+        return f"ShardSpec({self.index}, {self.count})"
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, ShardSpec) and (self.index, self.count) == (other.index, other.count)
+
+    def __hash__(self) -> int:
+        return hash((self.index, self.count))
+
+    def contains(self, record: Dict) -> bool:
+        return stable_hash(record_id(record)) % self.count == self.index
+
+    def filter(self, records: Iterable[Dict]) -> Iterator[Dict]:
+        """只保留属于本分片的记录（流式）"""
+        return (record for record in records if self.contains(record))
+
+    @property
+    def suffix(self) -> str:
+        """用于结果文件名"""
+        return f"shard{self.index}of{self.count}"
+
+def shard_results_path(shard: ShardSpec, test_data_limit, directory: str = None) -> str:
+    directory = directory or Config.SHARD_RESULTS_DIR
+    return os.path.join(directory, f"results_{test_data_limit}samples_{shard.suffix}.json")
+
+def save_shard_results(shard: ShardSpec, test_data_limit, total_samples: int, correct: int,
+                       vulnerable_samples: int, results: Dict[str, Dict], directory: str = None) -> str:
+    """保存单个分片的计数（只存可相加的计数，比率在合并后重新计算）"""
+    path = shard_results_path(shard, test_data_limit, directory)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    payload = {
+        "shard": str(shard),
+        "test_data_limit": test_data_limit,
+        "seed": Config.SEED,
+        "total_samples": total_samples,
+        "correct": correct,
+        "vulnerable_samples": vulnerable_samples,
+        "results": {ptype: {key: result[key] for key in ("success_count", "change_count", "total_tested")}
+                    for ptype, result in results.items()}
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+    return path
+
+def merge_shard_results(payloads: List[Dict]) -> Dict:
+    """合并各分片的计数，要求分片数、样本上限、种子与扰动类型一致且恰好覆盖全部分片"""
+    if not payloads:
+        raise ValueError("没有可合并的分片结果")
+    first = payloads[0]
+    count = ShardSpec.parse(first["shard"]).count
+    seen = set()
+    merged = {"test_data_limit": first["test_data_limit"], "total_samples": 0, "correct": 0,
+              "vulnerable_samples": 0, "results": {ptype: {"success_count": 0, "change_count": 0, "total_tested": 0}
+                                                   for ptype in first["results"]}}
+    for payload in payloads:
+        shard = ShardSpec.parse(payload["shard"])
+        if shard.count != count:
+            raise ValueError(f"分片数不一致: {first['shard']} 与 {payload['shard']}")
+        for key in ("test_data_limit", "seed"):
+            if payload[key] != first[key]:
+                raise ValueError(f"分片 {shard} 的 {key} 不一致: {payload[key]} vs {first[key]}")
+        if list(payload["results"]) != list(first["results"]):
+            raise ValueError(f"分片 {shard} 的扰动类型不一致: {list(payload['results'])}")
+        if shard.index in seen:
+            raise ValueError(f"分片 {shard} 重复")
+        seen.add(shard.index)
+
+        for key in ("total_samples", "correct", "vulnerable_samples"):
+            merged[key] += payload[key]
+        for ptype, counts in payload["results"].items():
+            for key, value in counts.items():
+                merged["results"][ptype][key] += value
+
+    missing = [index for index in range(count) if index not in seen]
+    if missing:
+        raise ValueError(f"缺少分片: {', '.join(f'{index}/{count}' for index in missing)}")
+    merged["shards"] = count
+    return merged
@@ -0,0 +1,204 @@
+# shared_corpus.py
+import os
+import mmap
+import struct
+from array import array
+from multiprocessing import shared_memory
+from typing import Dict, Iterable, Iterator, List
+
+# 头部：魔数、版本、记录数、文本总字节数
+_HEADER = struct.Struct('<4sIQQ')
+_MAGIC = b'FDCP'
+_VERSION = 1
+
+# 本进程中因反序列化而映射的语料，同一块内存在每个工作进程只映射一次
+_attached = {}
+
+def _reattach(kind: str, location: str) -> 'SharedCorpus':
+    corpus = _attached.get((kind, location))
+    if corpus is None or corpus.closed:
+        corpus = SharedCorpus.attach(location) if kind == "shm" else SharedCorpus.open(location)
+        _attached[(kind, location)] = corpus
+    return corpus
+
+class CorpusBuilder:
+    """逐条追加记录，最后生成紧凑语料的二进制布局
+
+    布局：头部 | 偏移数组(n+1个uint64) | 标签(n个int8) | 全部文本的UTF-8字节
+    第i条文本为 data[offsets[i]:offsets[i+1]]。
+    """
+
+    def __init__(self):
+        self.offsets = array('Q', [0])
+        self.labels = array('b')
+        self.data = bytearray()
+
+    def add(self, text: str, label: int):
+        self.data += text.encode('utf-8')
+        self.offsets.append(len(self.data))
+        self.labels.append(label)
+
+    def extend(self, records: Iterable[Dict]) -> 'CorpusBuilder':
+        for record in records:
+            self.add(record['text'], record['label'])
+        return self
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    @property
+    def nbytes(self) -> int:
+        return (_HEADER.size + self.offsets.itemsize * len(self.offsets) +
+                len(self.labels) + len(self.data))
+
+    def write_into(self, buffer) -> int:
+        """写入可写缓冲区（共享内存、mmap或bytearray），返回写入的字节数"""
+        view = memoryview(buffer)
+        position = _HEADER.size
+        view[:position] = _HEADER.pack(_MAGIC, _VERSION, len(self.labels), len(self.data))
+        for part in (self.offsets.tobytes(), self.labels.tobytes(), self.data):
+            view[position:position + len(part)] = part
+            position += len(part)
+        view.release()
+        return position
+
+class SharedCorpus:
+    """只读的紧凑语料：文本按下标惰性解码，不为每条记录保留dict和str对象
+
+    数据放在共享内存（create/attach）或mmap文件（save/open）中，
+    各进程直接映射同一块内存，不需要复制或逐条pickle文本；
+    本对象pickle时只传递共享内存名或文件路径，子进程据此重新映射。
+    """
+
+    def __init__(self, buffer, owner=None, source=None):
+        self._owner = owner  # SharedMemory或mmap对象，负责生命周期
+        self._source = source  # ("shm", 名称) 或 ("file", 路径)
+        self._view = memoryview(buffer)
+        magic, version, count, data_size = _HEADER.unpack_from(self._view)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"不是有效的语料缓冲区: magic={magic!r}, version={version}")
+        offsets_end = _HEADER.size + 8 * (count + 1)
+        labels_end = offsets_end + count
+        self._count = count
+        self.offsets = self._view[_HEADER.size:offsets_end].cast('Q')
+        self.labels = self._view[offsets_end:labels_end].cast('b')
+        self._data = self._view[labels_end:labels_end + data_size]
+
+    # ---- 创建与连接 ----
+
+    @classmethod
+    def create(cls, records: Iterable[Dict], name: str = None) -> 'SharedCorpus':
+        """把记录写入新的共享内存块，调用方负责最后unlink()"""
+        builder = records if isinstance(records, CorpusBuilder) else CorpusBuilder().extend(records)
+        memory = shared_memory.SharedMemory(name=name, create=True, size=builder.nbytes)
+        builder.write_into(memory.buf)
+        return cls(memory.buf, memory, ("shm", memory.name))
+
+    @classmethod
+    def attach(cls, name: str) -> 'SharedCorpus':
+        """按名称连接已有的共享内存块（不复制）"""
+        try:
+            memory = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # Python 3.13之前没有track参数
+            memory = shared_memory.SharedMemory(name=name)
+        return cls(memory.buf, memory, ("shm", name))
+
+    @classmethod
+    def save(cls, records: Iterable[Dict], path: str) -> str:
+        """把记录写成语料文件，之后用open()映射"""
+        builder = records if isinstance(records, CorpusBuilder) else CorpusBuilder().extend(records)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        buffer = bytearray(builder.nbytes)
+        builder.write_into(buffer)
+        with open(path, 'wb') as f:
+            f.write(buffer)
+        return path
+
+    @classmethod
+    def open(cls, path: str) -> 'SharedCorpus':
+        """只读mmap语料文件，多个进程共享操作系统的页缓存"""
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapped, mapped, ("file", path))
+
+    def __reduce__(self):
+        if self._source is None:
+            raise TypeError("基于普通缓冲区的语料不能跨进程传递")
+        return _reattach, self._source
+
+    @property
+    def name(self) -> str:
+        """共享内存名（文件语料为路径），传给工作进程用于attach/open"""
+        return self._source[1] if self._source else None
+
+    # ---- 访问 ----
+
+    def __len__(self) -> int:
+        return self._count
+
+    def text(self, index: int) -> str:
+        """解码第index条文本（直接从缓冲区解码，不经过中间bytes）"""
+        if not 0 <= index < self._count:
+            raise IndexError(f"语料下标越界: {index}")
+        return str(self._data[self.offsets[index]:self.offsets[index + 1]], 'utf-8')
+
+    def label(self, index: int) -> int:
+        return self.labels[index]
+
+    def __getitem__(self, index: int) -> Dict:
+        """与加载器的记录格式相同"""
+        return {'text': self.text(index), 'label': self.labels[index]}
+
+    def __iter__(self) -> Iterator[Dict]:
+        for index in range(self._count):
+            yield self[index]
+
+    def texts(self, ids: Iterable[int]) -> List[str]:
+        return [self.text(index) for index in ids]
+
+    def iter_batches(self, batch_size: int, start: int = 0, stop: int = None):
+        """按批产生 (texts, labels)，可指定下标区间以便各工作进程分段处理"""
+        stop = self._count if stop is None else min(stop, self._count)
+        for begin in range(start, stop, batch_size):
+            end = min(begin + batch_size, stop)
+            yield self.texts(range(begin, end)), self.labels[begin:end].tolist()
+
+    @property
+    def nbytes(self) -> int:
+        return self._view.nbytes
+
+    # ---- 生命周期 ----
+
+    @property
+    def closed(self) -> bool:
+        return self._owner is None
+
+    def close(self):
+        """释放本进程的映射（先释放所有视图，否则底层缓冲区无法关闭）"""
+        if self._owner is None:
+            return
+        for view in (self.offsets, self.labels, self._data, self._view):
+            view.release()
+        self._owner.close()
+        self._owner = None
+
+    def unlink(self):
+        """删除共享内存块（只应由创建者在所有进程用完后调用）"""
+        if self._source and self._source[0] == "shm":
+            memory = self._owner
+            self.close()
+            (memory or shared_memory.SharedMemory(name=self._source[1])).unlink()
+
+    def __del__(self):
+        # 先于SharedMemory/mmap释放本对象持有的视图，否则它们在回收时无法关闭
+        if getattr(self, '_owner', None) is not None:
+            self.close()
+
+    def __enter__(self) -> 'SharedCorpus':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
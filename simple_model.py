@@ -1,26 +1,38 @@
 # simple_model.py
-import re
+import os
 import random
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Any
 from config import Config
+from instrumentation import timed
+from text_features import annotate, register_patterns
+from canonicalize import Canonicalizer
+from feature_matrix import (FeatureMatrix, feature_value, COLUMN_KEYWORD, COLUMN_PATTERN,
+                            COLUMN_LONG_TEXT, COLUMN_EXCLAMATION)
 
 class SimpleFraudDetector:
     """简单的欺诈对话检测器（基于规则）"""
     
-    def __init__(self, threshold=0.4):  # 降低阈值使其更容易改变
-        self.fraud_keywords = [
+    # 可通过weights参数覆盖的权重属性
+    WEIGHT_NAMES = ("keyword_weight", "pattern_weight", "normal_weight", "bias",
+                    "long_text_length", "long_text_weight", "exclamation_weight", "noise")
+    
+    def __init__(self, threshold=0.4,  # 降低阈值使其更容易改变
+                 fraud_keywords: List[str] = None, normal_keywords: List[str] = None,
+                 fraud_patterns: List[str] = None, weights: Dict[str, float] = None,
+                 canonicalize: bool = None):
+        self.fraud_keywords = list(fraud_keywords) if fraud_keywords is not None else [
             "中奖", "点击链接", "密码", "验证码", "银行卡", "账户安全",
             "退款", "公安局", "洗钱", "配合调查", "安全软件", "修改密码",
             "领取奖品", "提供信息", "银行客服", "异常登录"
         ]
         
-        self.normal_keywords = [
+        self.normal_keywords = list(normal_keywords) if normal_keywords is not None else [
             "快递", "发货", "订单", "查询", "咨询", "感谢", "帮助",
             "客服", "物流", "配送", "地址", "电话", "工作时间", "服务"
         ]
         
         # 欺诈特征模式
-        self.fraud_patterns = [
+        self.fraud_patterns = list(fraud_patterns) if fraud_patterns is not None else [
             r'点击.*链接',
             r'提供.*密码',
             r'银行.*账户.*异常',
@@ -30,68 +42,89 @@ class SimpleFraudDetector:
         ]
         
         self.threshold = threshold  # 使用传入的阈值
+        
+        # 线性打分权重（原公式展开：各项得分 × 组合系数）
+        self.keyword_weight = 0.2 * 0.2  # 欺诈关键词：每个0.2分（从0.5降低），系数0.2
+        self.pattern_weight = 0.15 * 0.2  # 欺诈模式：每个0.15分（从0.3降低），系数0.2
+        self.normal_weight = -0.4 * 0.35  # 正常关键词：每个扣0.4分（从0.3增加），系数0.35
+        self.bias = 0.6 * 0.15  # 短文本的长度得分0.6，系数0.15
+        self.long_text_length = 50
+        self.long_text_weight = (0.2 - 0.6) * 0.15  # 长文本的长度得分降为0.2
+        self.exclamation_weight = 0.2 * 0.1  # 感叹号：0.2分，系数0.1
+        self.noise = 0.2  # 随机扰动幅度（增强不稳定性）
+        
+        for name, value in (weights or {}).items():
+            if name not in self.WEIGHT_NAMES:
+                raise ValueError(f"未知的权重参数: {name}")
+            setattr(self, name, value)
+        
+        register_patterns(self.fraud_patterns)
+        
+        # 可选的输入规范化：打分前还原字符级扰动
+        if canonicalize is None:
+            canonicalize = Config.USE_CANONICALIZATION
+        self.canonicalizer = (Canonicalizer(self.fraud_keywords + self.normal_keywords, self.fraud_patterns)
+                              if canonicalize else None)
+    
+    def feature_columns(self) -> List[Tuple[str, Any]]:
+        """特征列：欺诈关键词、欺诈模式、正常关键词、长文本、感叹号"""
+        return ([(COLUMN_KEYWORD, keyword) for keyword in self.fraud_keywords] +
+                [(COLUMN_PATTERN, pattern) for pattern in self.fraud_patterns] +
+                [(COLUMN_KEYWORD, keyword) for keyword in self.normal_keywords] +
+                [(COLUMN_LONG_TEXT, self.long_text_length), (COLUMN_EXCLAMATION, None)])
+    
+    def weight_vector(self) -> List[float]:
+        """与feature_columns一一对应的权重向量"""
+        return ([self.keyword_weight] * len(self.fraud_keywords) +
+                [self.pattern_weight] * len(self.fraud_patterns) +
+                [self.normal_weight] * len(self.normal_keywords) +
+                [self.long_text_weight, self.exclamation_weight])
+    
+    def base_score(self, text: str) -> float:
+        """不含随机扰动、未归一化的线性得分"""
+        if self.canonicalizer is not None:
+            text = self.canonicalizer(text)
+        features = annotate(text)
+        score = self.bias
+        for column, weight in zip(self.feature_columns(), self.weight_vector()):
+            if feature_value(features, column):
+                score += weight
+        return score
+    
+    def _finalize(self, base_score: float) -> float:
+        """加入随机扰动并归一化到[0, 1]"""
+        random_factor = random.uniform(-self.noise, self.noise)
+        return min(max(base_score + random_factor, 0), 1)
+    
+    def expected_score(self, base_score: float) -> float:
+        """不含随机扰动的归一化得分"""
+        return min(max(base_score, 0), 1)
     
+    @timed("score.fraud_score")
     def _calculate_fraud_score(self, text: str) -> float:
         """计算欺诈得分 - 增强不稳定性"""
-        text_lower = text
-        
-        # 1. 关键词匹配（降低权重）
-        keyword_score = 0
-        for keyword in self.fraud_keywords:
-            if keyword in text_lower:
-                keyword_score += 0.2  # 从0.5降低到0.2
-        
-        # 2. 模式匹配（降低权重）
-        pattern_score = 0
-        for pattern in self.fraud_patterns:
-            if re.search(pattern, text_lower):
-                pattern_score += 0.15  # 从0.3降低到0.15
-        
-        # 3. 正常关键词扣分（增加权重）
-        normal_score = 0
-        for keyword in self.normal_keywords:
-            if keyword in text_lower:
-                normal_score += 0.4  # 从0.3增加到0.4
-        
-        # 4. 长度特征
-        length_score = 0.2 if len(text) > 50 else 0.6
-        
-        # 5. 标点符号特征
-        exclamation_score = 0.2 if '!' in text or '！' in text else 0
-        
-        # 6. 添加显著随机性（关键！）
-        random_factor = random.uniform(-0.2, 0.2)
-        
-        # 计算总分
-        total_score = (keyword_score * 0.2 + pattern_score * 0.2 + 
-                    length_score * 0.15 + exclamation_score * 0.1 - 
-                    normal_score * 0.35 + random_factor)
-        
-        # 归一化
-        normalized = min(max(total_score, 0), 1)
-        
-        return normalized
+        return self._finalize(self.base_score(text))
     
+    @timed("score.batch")
+    def score_batch(self, texts: List[str]) -> List[float]:
+        """批量计算欺诈得分：构建特征矩阵后一次矩阵-向量乘法
+        
+        结果与逐条调用_calculate_fraud_score相同（见feature_matrix.py中的说明）。
+        """
+        if self.canonicalizer is not None:
+            texts = [self.canonicalizer(text) for text in texts]
+        matrix = FeatureMatrix.build(texts, self.feature_columns())
+        return [self._finalize(score) for score in matrix.dot(self.weight_vector(), self.bias)]
+    
+    @timed("score.predict")
     def predict(self, texts: List[str]) -> List[int]:
         """预测文本标签"""
-        predictions = []
-        
-        for text in texts:
-            fraud_score = self._calculate_fraud_score(text)
-            predictions.append(1 if fraud_score > self.threshold else 0)
-        
-        return predictions
+        return [1 if fraud_score > self.threshold else 0 for fraud_score in self.score_batch(texts)]
 
+    @timed("score.predict_proba")
     def predict_proba(self, texts: List[str]) -> List[Tuple[float, float]]:
         """预测概率"""
-        probabilities = []
-        
-        for text in texts:
-            fraud_score = self._calculate_fraud_score(text)
-            normal_score = 1 - fraud_score
-            probabilities.append((normal_score, fraud_score))
-        
-        return probabilities
+        return [(1 - fraud_score, fraud_score) for fraud_score in self.score_batch(texts)]
     
     def evaluate(self, texts: List[str], labels: List[int]) -> Dict:
         """评估模型性能"""
@@ -112,14 +145,97 @@ class SimpleFraudDetector:
         }
 
 class ModelManager:
-    """模型管理器"""
+    """模型管理器：可同时托管多个检测器变体，共享一次特征提取批量打分"""
     
     def __init__(self):
         self.models = {}
     
-    def get_model(self, model_name: str = "simple") -> SimpleFraudDetector:
-        """获取模型"""
+    def get_model(self, model_name: str = "simple"):
+        """获取模型（"hashed"为字符n-gram哈希检测器，其余名称为规则检测器）"""
         if model_name not in self.models:
-            self.models[model_name] = SimpleFraudDetector(threshold=Config.MODEL_THRESHOLD)
+            if model_name == "hashed":
+                self.models[model_name] = self._load_hashed_model()
+            else:
+                self.models[model_name] = SimpleFraudDetector(threshold=Config.MODEL_THRESHOLD)
         
-        return self.models[model_name]
\ No newline at end of file
+        return self.models[model_name]
+    
+    def _load_hashed_model(self):
+        """加载已训练的哈希检测器，权重文件不存在时返回未训练的模型"""
+        from hashed_model import HashedNgramDetector
+        if os.path.exists(Config.HASHED_MODEL_PATH):
+            return HashedNgramDetector.load(Config.HASHED_MODEL_PATH)
+        print(f"哈希检测器权重不存在: {Config.HASHED_MODEL_PATH}，使用未训练的模型")
+        return HashedNgramDetector()
+    
+    def register_variant(self, model_name: str, threshold: float = None, **params) -> SimpleFraudDetector:
+        """注册一个检测器变体（可指定关键词列表、模式、权重和阈值）"""
+        threshold = threshold if threshold is not None else Config.MODEL_THRESHOLD
+        self.models[model_name] = SimpleFraudDetector(threshold=threshold, **params)
+        return self.models[model_name]
+    
+    def add_model(self, model_name: str, model):
+        """托管一个已创建的模型"""
+        self.models[model_name] = model
+        return model
+    
+    def score_variants(self, texts: List[str], model_names: List[str] = None) -> Dict[str, List[float]]:
+        """所有变体对同一批文本打分
+        
+        各变体的特征列合并为一个特征矩阵，只做一次特征提取，
+        再对每个变体的权重做矩阵-向量乘法；结果与各自score_batch一致（浮点舍入误差内）。
+        """
+        model_names = list(model_names) if model_names is not None else list(self.models)
+        
+        # 非线性特征模型（如哈希检测器）和带输入规范化的检测器单独批量打分
+        scores = {}
+        linear_names = []
+        for name in model_names:
+            model = self.models[name]
+            if hasattr(model, "feature_columns") and getattr(model, "canonicalizer", None) is None:
+                linear_names.append(name)
+            else:
+                scores[name] = [fraud for _, fraud in self.models[name].predict_proba(texts)]
+        
+        # 合并各变体的特征列
+        union_columns = []
+        column_index = {}
+        projections = {}
+        for name in linear_names:
+            model = self.models[name]
+            weights = {}
+            for column, weight in zip(model.feature_columns(), model.weight_vector()):
+                if column not in column_index:
+                    column_index[column] = len(union_columns)
+                    union_columns.append(column)
+                j = column_index[column]
+                weights[j] = weights.get(j, 0.0) + weight
+            projections[name] = weights
+        
+        matrix = FeatureMatrix.build(texts, union_columns)
+        
+        for name in linear_names:
+            model = self.models[name]
+            weight_vector = [0.0] * len(union_columns)
+            for j, weight in projections[name].items():
+                weight_vector[j] = weight
+            scores[name] = [model._finalize(score) for score in matrix.dot(weight_vector, model.bias)]
+        return {name: scores[name] for name in model_names}
+    
+    def predict_variants(self, texts: List[str], model_names: List[str] = None) -> Dict[str, List[int]]:
+        """所有变体对同一批文本的预测"""
+        scores = self.score_variants(texts, model_names)
+        return {name: [1 if score > self.models[name].threshold else 0 for score in variant_scores]
+                for name, variant_scores in scores.items()}
+    
+    def evaluate_variants(self, texts: List[str], labels: List[int], model_names: List[str] = None) -> Dict[str, Dict]:
+        """一次性评估所有变体"""
+        results = {}
+        for name, predictions in self.predict_variants(texts, model_names).items():
+            correct = sum(1 for pred, true in zip(predictions, labels) if pred == true)
+            results[name] = {
+                "accuracy": correct / len(labels) if labels else 0,
+                "correct_count": correct,
+                "total_count": len(labels)
+            }
+        return results
@@ -0,0 +1,125 @@
+# streaming_eval.py
+import bisect
+import argparse
+from typing import List, Dict, Iterable
+from config import Config
+from instrumentation import timed
+
+class ConfusionCounts:
+    """混淆矩阵计数，可相加合并"""
+
+    __slots__ = ('tp', 'fp', 'tn', 'fn')
+
+    def __init__(self, tp: int = 0, fp: int = 0, tn: int = 0, fn: int = 0):
+        self.tp = tp
+        self.fp = fp
+        self.tn = tn
+        self.fn = fn
+
+    def __add__(self, other: 'ConfusionCounts') -> 'ConfusionCounts':
+        return ConfusionCounts(self.tp + other.tp, self.fp + other.fp, self.tn + other.tn, self.fn + other.fn)
+
+    @property
+    def total(self) -> int:
+        return self.tp + self.fp + self.tn + self.fn
+
+    def metrics(self) -> Dict:
+        precision = self.tp / (self.tp + self.fp) if self.tp + self.fp else 0.0
+        recall = self.tp / (self.tp + self.fn) if self.tp + self.fn else 0.0
+        return {
+            "tp": self.tp, "fp": self.fp, "tn": self.tn, "fn": self.fn,
+            "accuracy": (self.tp + self.tn) / self.total if self.total else 0.0,
+            "precision": precision,
+            "recall": recall,
+            "f1": 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+            "fpr": self.fp / (self.fp + self.tn) if self.fp + self.tn else 0.0
+        }
+
+class StreamingEvaluator:
+    """流式分块评估：逐块批量打分，只累积计数，不保留逐条预测
+
+    多个阈值共享一次打分：每条样本按得分落入阈值之间的桶（二分查找），
+    阈值t下的预测为 得分 > t，于是各阈值的混淆矩阵由桶计数的后缀和得到。
+    内存只与阈值个数有关；不同分块/进程的评估器可直接合并。
+    """
+
+    def __init__(self, model, thresholds: List[float] = None):
+        self.model = model
+        self.thresholds = sorted(thresholds if thresholds else [model.threshold])
+        # 第k个桶：得分大于前k个阈值、不大于其余阈值
+        self.positive_buckets = [0] * (len(self.thresholds) + 1)
+        self.negative_buckets = [0] * (len(self.thresholds) + 1)
+
+    @timed("eval.update")
+    def update(self, texts: List[str], labels: List[int]):
+        """批量打分一块样本并累加计数"""
+        if not texts:
+            return
+        thresholds = self.thresholds
+        for (_, score), label in zip(self.model.predict_proba(texts), labels):
+            bucket = bisect.bisect_left(thresholds, score)
+            if label == 1:
+                self.positive_buckets[bucket] += 1
+            else:
+                self.negative_buckets[bucket] += 1
+
+    def merge(self, other: 'StreamingEvaluator') -> 'StreamingEvaluator':
+        """合并另一个评估器（阈值必须相同）"""
+        if other.thresholds != self.thresholds:
+            raise ValueError(f"阈值不一致，无法合并: {self.thresholds} vs {other.thresholds}")
+        for k in range(len(self.positive_buckets)):
+            self.positive_buckets[k] += other.positive_buckets[k]
+            self.negative_buckets[k] += other.negative_buckets[k]
+        return self
+
+    def counts(self) -> Dict[float, ConfusionCounts]:
+        """各阈值的混淆矩阵"""
+        positives = sum(self.positive_buckets)
+        negatives = sum(self.negative_buckets)
+        result = {}
+        # 阈值从大到小，逐步累加得分超过该阈值的桶
+        tp = fp = 0
+        for j in range(len(self.thresholds) - 1, -1, -1):
+            tp += self.positive_buckets[j + 1]
+            fp += self.negative_buckets[j + 1]
+            result[self.thresholds[j]] = ConfusionCounts(tp=tp, fp=fp, tn=negatives - fp, fn=positives - tp)
+        return dict(sorted(result.items()))
+
+    def report(self) -> Dict[float, Dict]:
+        return {threshold: counts.metrics() for threshold, counts in self.counts().items()}
+
+    def evaluate_chunks(self, chunks: Iterable) -> Dict[float, Dict]:
+        """消费 (texts, labels) 分块"""
+        for texts, labels in chunks:
+            self.update(texts, labels)
+        return self.report()
+
+    def evaluate_stream(self, data_loader, batch_size: int = None, data_path: str = None) -> Dict[float, Dict]:
+        """直接从加载器流式读取并评估"""
+        batch_size = batch_size or Config.EVAL_BATCH_SIZE
+        return self.evaluate_chunks(data_loader.iter_batches(batch_size, data_path))
+
+def format_confusion_report(report: Dict[float, Dict]) -> str:
+    """格式化各阈值的评估指标"""
+    lines = [f"{'阈值':<8} {'准确率':>8} {'精确率':>8} {'召回率':>8} {'F1':>8} {'误报率':>8} "
+             f"{'TP':>8} {'FP':>8} {'TN':>8} {'FN':>8}"]
+    for threshold, metrics in report.items():
+        lines.append(f"{threshold:<8.3f} {metrics['accuracy']:>8.4f} {metrics['precision']:>8.4f} "
+                     f"{metrics['recall']:>8.4f} {metrics['f1']:>8.4f} {metrics['fpr']:>8.4f} "
+                     f"{metrics['tp']:>8} {metrics['fp']:>8} {metrics['tn']:>8} {metrics['fn']:>8}")
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    from data_loader import FraudDialogDataLoader
+    from simple_model import ModelManager
+
+    parser = argparse.ArgumentParser(description="流式分块评估检测器")
+    parser.add_argument("--data", default=None, help="数据文件路径（默认使用加载器的默认路径）")
+    parser.add_argument("--model", default="simple", help="模型名称（simple或hashed）")
+    parser.add_argument("--thresholds", type=float, nargs="*", default=None, help="评估阈值（默认使用模型阈值）")
+    parser.add_argument("--batch-size", type=int, default=None)
+    args = parser.parse_args()
+
+    evaluator = StreamingEvaluator(ModelManager().get_model(args.model), args.thresholds)
+    report = evaluator.evaluate_stream(FraudDialogDataLoader(args.data), args.batch_size)
+    print(format_confusion_report(report))
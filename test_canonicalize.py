@@ -0,0 +1,31 @@
+# test_canonicalize.py
+import pytest
+from simple_model import SimpleFraudDetector
+
+@pytest.fixture(scope="module")
+def detectors():
+    return SimpleFraudDetector(canonicalize=False), SimpleFraudDetector(canonicalize=True)
+
+@pytest.mark.parametrize("text", [
+    "请点击设置按钮后重新连接网络",
+    "连接网络",
+    "他点出了问题所在",
+    "蜜马",
+    "请核对帐单和帐目",
+])
+def test_benign_text_unchanged(detectors, text):
+    plain, hardened = detectors
+    assert hardened.canonicalizer(text) == text
+    assert hardened.base_score(text) == plain.base_score(text)
+
+@pytest.mark.parametrize("text, expected", [
+    ("点 击 链 接", "点击链接"),
+    ("占出连按", "点击链接"),
+    ("请提供蜜 马", "请提供密码"),
+    ("您的帐卢安全", "您的账户安全"),
+    ("银 行卡", "银行卡"),
+    ("ｗｗｗ​", "www"),
+])
+def test_perturbations_restored(detectors, text, expected):
+    _, hardened = detectors
+    assert hardened.canonicalizer(text) == expected
@@ -0,0 +1,61 @@
+# test_dialog_session.py
+import random
+from array import array
+import pytest
+from simple_model import SimpleFraudDetector
+from trainable_model import TrainableFraudDetector
+from dialog_session import DialogSession
+from conftest import random_text
+
+def random_dialog(detector, rng: random.Random):
+    """随机全文再随机切成若干轮（切点可落在关键词或片段内部）"""
+    text = random_text(detector, rng, 1, 40)
+    cuts = sorted(rng.sample(range(1, len(text)), min(rng.randint(0, 8), len(text) - 1))) if len(text) > 1 else []
+    return [text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)])]
+
+def session_scores(session: DialogSession, turns):
+    session.reset()
+    return [session.add_turn(turn) for turn in turns]
+
+@pytest.mark.parametrize("separator", [" ", "", "\n", "，"])
+def test_matches_full_text_score(separator):
+    detector = SimpleFraudDetector(canonicalize=False)
+    session = DialogSession(detector, separator)
+    rng = random.Random(separator)
+    for _ in range(300):
+        turns = random_dialog(detector, rng)
+        scores = session_scores(session, turns)
+        # 每一轮后的得分都与对已有轮次全文打分的结果逐位相同
+        for k, score in enumerate(scores, 1):
+            assert score == detector.expected_score(detector.base_score(separator.join(turns[:k]))), turns[:k]
+
+def test_keyword_and_pattern_across_turns():
+    detector = SimpleFraudDetector(canonicalize=False)
+    session = DialogSession(detector, "")
+    session_scores(session, ["请点", "击这个", "链", "接"])
+    assert "点击.*链接" in session.matched_features()
+    assert "点击链接" not in session.matched_features()
+
+def test_newline_breaks_pattern():
+    detector = SimpleFraudDetector(canonicalize=False)
+    session = DialogSession(detector, "\n")
+    turns = ["请点击", "这个链接"]
+    session_scores(session, turns)
+    assert "点击.*链接" not in session.matched_features()
+    assert session.base_score() == detector.base_score("\n".join(turns))
+
+def test_trainable_detector():
+    detector = TrainableFraudDetector()
+    rng = random.Random(3)
+    detector.weights = array('d', [rng.uniform(-1, 1) for _ in detector.columns])
+    detector.bias = 0.1
+    simple = SimpleFraudDetector(canonicalize=False)
+    session = DialogSession(detector)
+    for _ in range(100):
+        turns = random_dialog(simple, rng)
+        # 可训练模型没有base_score，与整段文本的批量打分比较
+        assert session_scores(session, turns)[-1] == detector.score_batch([" ".join(turns)])[0]
+
+def test_rejects_canonicalizing_detector():
+    with pytest.raises(ValueError):
+        DialogSession(SimpleFraudDetector(canonicalize=True))
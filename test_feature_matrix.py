@@ -0,0 +1,34 @@
+# test_feature_matrix.py
+import random
+from simple_model import SimpleFraudDetector
+from feature_matrix import FeatureMatrix
+from conftest import random_text
+
+def random_texts(detector: SimpleFraudDetector, count: int, seed: int = 0):
+    rng = random.Random(seed)
+    return [random_text(detector, rng) for _ in range(count)]
+
+def test_dot_matches_base_score():
+    detector = SimpleFraudDetector(canonicalize=False)
+    texts = random_texts(detector, 500)
+    matrix = FeatureMatrix.build(texts, detector.feature_columns())
+    scores = matrix.dot(detector.weight_vector(), detector.bias)
+    # 加法顺序相同，要求逐位相等
+    assert scores == [detector.base_score(text) for text in texts]
+
+def test_score_batch_matches_per_text_scores():
+    detector = SimpleFraudDetector(canonicalize=False)
+    texts = random_texts(detector, 200, seed=1)
+    random.seed(7)
+    batch = detector.score_batch(texts)
+    random.seed(7)
+    single = [detector._calculate_fraud_score(text) for text in texts]
+    assert batch == single
+
+def test_take_copies_rows():
+    detector = SimpleFraudDetector(canonicalize=False)
+    texts = random_texts(detector, 50, seed=2)
+    matrix = FeatureMatrix.build(texts, detector.feature_columns())
+    rows = [3, 0, 49, 3]
+    sub = matrix.take(rows)
+    assert sub.to_dense() == [matrix.to_dense()[i] for i in rows]
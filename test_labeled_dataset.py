@@ -0,0 +1,43 @@
+# test_labeled_dataset.py
+import csv
+import pytest
+from labeled_dataset import LabeledDataset
+from data_loader import FraudDialogDataLoader
+
+def make_dataset(fraud: int, normal: int) -> LabeledDataset:
+    return LabeledDataset.from_texts([f"欺诈{i}" for i in range(fraud)] + [f"正常{i}" for i in range(normal)],
+                                     [1] * fraud + [0] * normal)
+
+def test_stratified_sample_follows_ratio():
+    dataset = make_dataset(30, 70)
+    chosen = dataset.stratified_sample(20, {1: 0.5, 0: 0.5})
+    assert len(set(chosen)) == 20
+    assert sum(dataset.labels[i] for i in chosen) == 10
+    # 未指定比例时沿用数据集本身的分布
+    chosen = dataset.stratified_sample(10)
+    assert sum(dataset.labels[i] for i in chosen) == 3
+
+def test_stratified_sample_shortfall():
+    dataset = make_dataset(4, 70)
+    assert dataset.shortfall(20, {1: 0.5, 0: 0.5}) == {1: 6, 0: 0}
+    with pytest.raises(ValueError):
+        dataset.stratified_sample(20, {1: 0.5, 0: 0.5})
+    chosen = dataset.stratified_sample(20, {1: 0.5, 0: 0.5}, allow_shortfall=True)
+    assert len(chosen) == 14
+    assert sum(dataset.labels[i] for i in chosen) == 4
+
+def test_extended_dataset_pads_only_missing_label(tmp_path):
+    path = tmp_path / "data.csv"
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "text", "label"])
+        for i in range(20):
+            label = 1 if i < 4 else 0
+            writer.writerow([f"r{i}", f"{'请点击链接修改密码' if label else '您的快递已发货'}（{i}）", label])
+
+    data = FraudDialogDataLoader(str(path)).load_extended_dataset(20, fraud_ratio=0.5)
+    assert len(data) == 20
+    assert sum(item['label'] for item in data) == 10
+    synthetic = [item for item in data if 'type' in item]
+    assert len(synthetic) == 6
+    assert all(item['label'] == 1 for item in synthetic)
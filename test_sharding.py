@@ -0,0 +1,67 @@
+# test_sharding.py
+import csv
+import json
+import pytest
+import run_optimized
+from config import Config
+from data_loader import FraudDialogDataLoader
+from sharding import ShardSpec, shard_results_path, merge_shard_results
+from merge_shards import merge_shards
+
+def write_dataset(path, count: int):
+    fraud = ["您的账户安全异常，请点击链接修改密码", "恭喜中奖，请提供信息领取奖品！", "公安局通知您配合调查"]
+    normal = ["您的快递已发货，请注意查收", "感谢咨询，客服工作时间为九点", "订单查询请拨打电话"]
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "text", "label"])
+        for i in range(count):
+            label = i % 2
+            text = (fraud if label else normal)[i % 3]
+            writer.writerow([f"r{i}", f"{text}（{i}）", label])
+
+@pytest.fixture
+def experiment(tmp_path, monkeypatch):
+    """在临时目录中用合成数据运行实验，返回按分片运行的函数"""
+    data_path = tmp_path / "data.csv"
+    write_dataset(data_path, 40)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(Config, "SHARD_RESULTS_DIR", str(tmp_path / "shards"))
+    monkeypatch.setattr(Config, "USE_RESULT_CACHE", False)
+
+    class Loader(FraudDialogDataLoader):
+        def __init__(self, data_path=None):
+            super().__init__(str(tmp_path / "data.csv"))
+
+    monkeypatch.setattr(run_optimized, "FraudDialogDataLoader", Loader)
+
+    def run(spec: str = None, limit: int = 30):
+        """运行一次实验；不分片时返回报告内容，分片时返回分片结果"""
+        if spec is None:
+            run_optimized.run_optimized_experiment(limit)
+            with open(f"optimized_results_{limit}samples.txt", encoding='utf-8') as f:
+                return f.read()
+        shard = ShardSpec.parse(spec)
+        run_optimized.run_optimized_experiment(limit, shard=shard)
+        with open(shard_results_path(shard, limit), encoding='utf-8') as f:
+            return json.load(f)
+    return run
+
+def test_shard_filter_partitions_records():
+    records = [{'id': f"r{i}", 'text': str(i)} for i in range(200)]
+    shards = [list(ShardSpec(i, 4).filter(records)) for i in range(4)]
+    assert sum(len(part) for part in shards) == len(records)
+    assert sorted(r['id'] for part in shards for r in part) == sorted(r['id'] for r in records)
+
+@pytest.mark.parametrize("count", [1, 3])
+def test_merged_report_equals_unsharded_run(experiment, tmp_path, count):
+    unsharded = experiment()
+    for i in range(count):
+        experiment(f"{i}/{count}")
+    merged_file = str(tmp_path / "merged.txt")
+    merge_shards(30, Config.SHARD_RESULTS_DIR, merged_file)
+    with open(merged_file, encoding='utf-8') as f:
+        assert f.read() == unsharded
+
+def test_merge_rejects_missing_shard(experiment):
+    with pytest.raises(ValueError):
+        merge_shard_results([experiment("0/2")])
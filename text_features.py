@@ -0,0 +1,75 @@
+# text_features.py
+import re
+from functools import lru_cache
+from typing import Iterable, Dict
+from config import Config
+from instrumentation import timed
+
+# 预编译的正则模式：检测器在初始化时登记各自使用的模式
+_registered_patterns = {}
+
+def register_patterns(patterns: Iterable[str]):
+    """登记正则模式（预先编译）"""
+    for pattern in patterns:
+        if pattern not in _registered_patterns:
+            _registered_patterns[pattern] = re.compile(pattern)
+
+def _compile(pattern: str):
+    compiled = _registered_patterns.get(pattern)
+    if compiled is None:
+        compiled = _registered_patterns[pattern] = re.compile(pattern)
+    return compiled
+
+class AnnotatedText:
+    """带特征标注的文本：关键词与模式命中在首次查询时计算并缓存，所有使用方共享
+
+    只计算调用方实际查询过的关键词和模式，不会为某个使用方扫描其他使用方的词表。
+    """
+
+    __slots__ = ('text', 'length', 'has_exclamation', '_keyword_hits', '_pattern_hits')
+
+    def __init__(self, text: str):
+        self.text = text
+        self.length = len(text)
+        self.has_exclamation = '!' in text or '！' in text
+        self._keyword_hits = {}
+        self._pattern_hits = {}
+
+    def has(self, keyword: str) -> bool:
+        """文本是否包含关键词"""
+        hit = self._keyword_hits.get(keyword)
+        if hit is None:
+            hit = self._keyword_hits[keyword] = keyword in self.text
+        return hit
+
+    def count(self, keywords: Iterable[str]) -> int:
+        """命中的关键词个数"""
+        return sum(1 for keyword in keywords if self.has(keyword))
+
+    def any_of(self, keywords: Iterable[str]) -> bool:
+        """是否命中任一关键词"""
+        return any(self.has(keyword) for keyword in keywords)
+
+    def matches(self, pattern: str) -> bool:
+        """文本是否匹配正则模式"""
+        hit = self._pattern_hits.get(pattern)
+        if hit is None:
+            hit = self._pattern_hits[pattern] = _compile(pattern).search(self.text) is not None
+        return hit
+
+    def keyword_vector(self, keywords: Iterable[str]) -> Dict[str, bool]:
+        """关键词命中向量"""
+        return {keyword: self.has(keyword) for keyword in keywords}
+
+@lru_cache(maxsize=Config.FEATURE_CACHE_SIZE)
+def annotate(text: str) -> AnnotatedText:
+    """获取文本的特征标注（按文本缓存，同一文本只扫描一次）"""
+    return _build(text)
+
+@timed("features.annotate")
+def _build(text: str) -> AnnotatedText:
+    return AnnotatedText(text)
+
+def clear_cache():
+    """清空特征缓存"""
+    annotate.cache_clear()
@@ -0,0 +1,193 @@
+# trainable_model.py
+import os
+import sys
+import math
+import json
+import struct
+import random
+from array import array
+from typing import List, Dict, Tuple, Any
+from config import Config
+from instrumentation import timed
+from feature_matrix import FeatureMatrix
+from labeled_dataset import LabeledDataset
+from simple_model import SimpleFraudDetector
+
+# 权重文件格式：魔数 + 头部长度(uint32) + JSON头部(特征列、偏置、阈值) + float64权重数组（均为小端序）
+WEIGHTS_MAGIC = b"TFD1"
+
+def sigmoid(z: float) -> float:
+    if z >= 0:
+        return 1.0 / (1.0 + math.exp(-z))
+    exp_z = math.exp(z)
+    return exp_z / (1.0 + exp_z)
+
+class OnlineDetectorMixin:
+    """可在线训练的检测器的公共部分：预测、评估与（流式）训练循环
+
+    子类只需实现 score_batch、partial_fit 以及 save/load。
+    """
+
+    def predict(self, texts: List[str]) -> List[int]:
+        """预测文本标签"""
+        return [1 if score > self.threshold else 0 for score in self.score_batch(texts)]
+
+    def predict_proba(self, texts: List[str]) -> List[Tuple[float, float]]:
+        """预测概率"""
+        return [(1 - score, score) for score in self.score_batch(texts)]
+
+    def evaluate(self, texts: List[str], labels: List[int]) -> Dict:
+        """评估模型性能"""
+        predictions = self.predict(texts)
+        correct = sum(1 for pred, true in zip(predictions, labels) if pred == true)
+        return {
+            "accuracy": correct / len(labels) if labels else 0,
+            "predictions": predictions,
+            "correct_count": correct,
+            "total_count": len(labels)
+        }
+
+    def fit(self, texts: List[str], labels: List[int], epochs: int = None, batch_size: int = None,
+            balanced: bool = False) -> List[float]:
+        """在内存数据上训练，返回每轮平均损失
+
+        balanced为True时每个小批量中各标签等量（LabeledDataset.balanced_batches，少数类循环使用）。
+        """
+        epochs = epochs or Config.TRAIN_EPOCHS
+        batch_size = batch_size or Config.TRAIN_BATCH_SIZE
+        order = list(range(len(texts)))
+        dataset = LabeledDataset.from_texts(texts, labels) if balanced else None
+        rng = random.Random(Config.SEED)
+        history = []
+        for epoch in range(epochs):
+            if dataset is not None:
+                losses = [self.partial_fit(batch_texts, batch_labels)
+                          for batch_texts, batch_labels in dataset.balanced_batches(batch_size, rng=rng)]
+            else:
+                random.shuffle(order)
+                batches = [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+                losses = [self.partial_fit([texts[k] for k in batch], [labels[k] for k in batch]) for batch in batches]
+            history.append(sum(losses) / len(losses) if losses else 0.0)
+        return history
+
+    def fit_stream(self, data_loader, epochs: int = None, batch_size: int = None,
+                   data_path: str = None) -> List[float]:
+        """从FraudDialogDataLoader流式训练，内存占用只与批大小有关"""
+        epochs = epochs or Config.TRAIN_EPOCHS
+        batch_size = batch_size or Config.TRAIN_BATCH_SIZE
+        history = []
+        for epoch in range(epochs):
+            total_loss, batches = 0.0, 0
+            for texts, labels in data_loader.iter_batches(batch_size, data_path):
+                total_loss += self.partial_fit(texts, labels)
+                batches += 1
+            history.append(total_loss / batches if batches else 0.0)
+            print(f"训练轮次 {epoch + 1}/{epochs}: 平均损失 {history[-1]:.4f}")
+        return history
+
+class TrainableFraudDetector(OnlineDetectorMixin):
+    """可训练的线性欺诈检测器：在关键词/模式/长度特征上做小批量逻辑回归"""
+
+    def __init__(self, columns: List[Tuple[str, Any]] = None, threshold: float = 0.5,
+                 learning_rate: float = None, l2: float = None):
+        # 默认使用与SimpleFraudDetector相同的特征列
+        self.columns = list(columns) if columns is not None else SimpleFraudDetector().feature_columns()
+        self.weights = array('d', [0.0] * len(self.columns))
+        self.bias = 0.0
+        self.threshold = threshold
+        self.learning_rate = learning_rate if learning_rate is not None else Config.TRAIN_LEARNING_RATE
+        self.l2 = l2 if l2 is not None else Config.TRAIN_L2
+        self.samples_seen = 0
+
+    # 与SimpleFraudDetector一致的线性模型接口，可被ModelManager.score_variants批量打分
+    def feature_columns(self) -> List[Tuple[str, Any]]:
+        return list(self.columns)
+
+    def weight_vector(self) -> List[float]:
+        return list(self.weights)
+
+    def _finalize(self, base_score: float) -> float:
+        """线性得分经sigmoid转为欺诈概率"""
+        return sigmoid(base_score)
+
+    def expected_score(self, base_score: float) -> float:
+        """线性得分对应的欺诈概率（本模型无随机扰动）"""
+        return sigmoid(base_score)
+
+    def score_batch(self, texts: List[str]) -> List[float]:
+        """批量计算欺诈概率"""
+        matrix = FeatureMatrix.build(texts, self.columns)
+        return [sigmoid(z) for z in matrix.dot(self.weights, self.bias)]
+
+    @timed("train.partial_fit")
+    def partial_fit(self, texts: List[str], labels: List[int]) -> float:
+        """在一个小批量上做一步梯度下降，返回该批的平均对数损失"""
+        if not texts:
+            return 0.0
+        return self.partial_fit_matrix(FeatureMatrix.build(texts, self.columns), labels)
+
+    def partial_fit_matrix(self, matrix: FeatureMatrix, labels: List[int]) -> float:
+        """在已构建好的特征矩阵上做一步梯度下降（特征可缓存复用）"""
+        n = len(matrix)
+        if n == 0:
+            return 0.0
+        logits = matrix.dot(self.weights, self.bias)
+
+        # 稀疏梯度：只累加命中特征的列
+        gradient = [0.0] * len(self.columns)
+        bias_gradient = 0.0
+        loss = 0.0
+        for i, (z, label) in enumerate(zip(logits, labels)):
+            p = sigmoid(z)
+            error = p - label
+            bias_gradient += error
+            for j in matrix.row(i):
+                gradient[j] += error
+            loss -= math.log(max(p if label == 1 else 1 - p, 1e-12))
+
+        lr = self.learning_rate
+        for j in range(len(self.columns)):
+            self.weights[j] -= lr * (gradient[j] / n + self.l2 * self.weights[j])
+        self.bias -= lr * bias_gradient / n
+        self.samples_seen += n
+        return loss / n
+
+    def save(self, path: str = None):
+        """保存权重为紧凑的二进制格式"""
+        path = path or Config.TRAINABLE_MODEL_PATH
+        header = json.dumps({
+            "columns": [list(column) for column in self.columns],
+            "bias": self.bias,
+            "threshold": self.threshold,
+            "samples_seen": self.samples_seen
+        }, ensure_ascii=False).encode('utf-8')
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(WEIGHTS_MAGIC)
+            f.write(struct.pack('<I', len(header)))
+            f.write(header)
+            weights = array('d', self.weights)
+            if sys.byteorder == 'big':
+                weights.byteswap()
+            weights.tofile(f)
+
+    @classmethod
+    def load(cls, path: str = None) -> 'TrainableFraudDetector':
+        """加载save保存的权重"""
+        path = path or Config.TRAINABLE_MODEL_PATH
+        with open(path, 'rb') as f:
+            if f.read(4) != WEIGHTS_MAGIC:
+                raise ValueError(f"不是有效的权重文件: {path}")
+            header_len, = struct.unpack('<I', f.read(4))
+            header = json.loads(f.read(header_len).decode('utf-8'))
+            model = cls(columns=[tuple(column) for column in header["columns"]], threshold=header["threshold"])
+            weights = array('d')
+            weights.fromfile(f, len(model.columns))
+            if sys.byteorder == 'big':
+                weights.byteswap()
+        model.weights = weights
+        model.bias = header["bias"]
+        model.samples_seen = header.get("samples_seen", 0)
+        return model
@@ -0,0 +1,59 @@
+# transferability.py
+from typing import List, Dict
+from prompt_attack import AttackResult
+from simple_model import ModelManager
+
+def transferability_matrix(results_by_source: Dict[str, Dict[str, List[AttackResult]]],
+                           manager: ModelManager, target_names: List[str] = None,
+                           successful_only: bool = True) -> Dict[str, Dict[str, Dict[str, Dict]]]:
+    """计算对抗样本在不同检测器间的迁移性
+
+    Args:
+        results_by_source: {源模型名: run_batch_attack的结果}，只使用已保存的对抗文本，不重新生成扰动
+        manager: 托管目标检测器的ModelManager
+        target_names: 目标模型名，默认为manager中的全部模型
+        successful_only: 只统计在源模型上攻击成功的样本
+
+    Returns:
+        {扰动类型: {源模型: {目标模型: {"flip_rate", "flipped", "total"}}}}
+    """
+    target_names = list(target_names) if target_names is not None else list(manager.models)
+
+    # 收集所有需要打分的文本（去重），所有目标模型一次批量打分
+    unique_texts = {}
+    for source_results in results_by_source.values():
+        for result_list in source_results.values():
+            for result in result_list:
+                unique_texts.setdefault(result.original_text, len(unique_texts))
+                unique_texts.setdefault(result.adversarial_text, len(unique_texts))
+    predictions = manager.predict_variants(list(unique_texts), target_names)
+
+    matrix = {}
+    for source, source_results in results_by_source.items():
+        for ptype, result_list in source_results.items():
+            selected = [r for r in result_list if r.success or not successful_only]
+            row = matrix.setdefault(ptype, {}).setdefault(source, {})
+            for target in target_names:
+                target_predictions = predictions[target]
+                flipped = sum(1 for r in selected
+                              if target_predictions[unique_texts[r.original_text]] !=
+                              target_predictions[unique_texts[r.adversarial_text]])
+                row[target] = {
+                    "flip_rate": flipped / len(selected) if selected else 0.0,
+                    "flipped": flipped,
+                    "total": len(selected)
+                }
+    return matrix
+
+def format_transferability_matrix(matrix: Dict[str, Dict[str, Dict[str, Dict]]]) -> str:
+    """格式化迁移矩阵（行=源模型，列=目标模型，值=预测翻转率）"""
+    lines = []
+    for ptype, rows in matrix.items():
+        targets = list(next(iter(rows.values())).keys()) if rows else []
+        lines.append(f"扰动类型: {ptype}")
+        header = "源模型 \\ 目标模型"
+        lines.append(f"{header:<20}" + "".join(f"{target:>12}" for target in targets))
+        for source, row in rows.items():
+            lines.append(f"{source:<20}" + "".join(f"{row[target]['flip_rate']:>12.4f}" for target in targets))
+        lines.append("")
+    return "\n".join(lines)
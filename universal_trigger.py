@@ -0,0 +1,208 @@
+# universal_trigger.py
+import re
+from typing import List, Dict
+from config import Config
+from instrumentation import timed
+from feature_matrix import (FeatureMatrix, COLUMN_KEYWORD, COLUMN_PATTERN,
+                            COLUMN_LONG_TEXT, COLUMN_EXCLAMATION)
+from prompt_attack import SimplePromptAttack, PerturbationGenerator
+
+class UniversalTriggerSearch:
+    """通用触发词搜索：寻找加在任意文本前/后都能翻转预测的短字符串
+
+    语料的特征行和线性得分只计算一次。给文本加上触发词只会新增特征命中（不会使已命中的特征失效），
+    因此每个候选只需对每条文本增量计算新命中的列：
+      - 关键词：触发词本身包含，或跨越拼接处（只检查拼接处两侧各 最长关键词长度-1 个字符）
+      - 模式：只对尚未命中的模式在拼接后的文本上重新搜索
+      - 长文本、感叹号：由长度之和与触发词本身决定
+    相似度代价按词集合近似：拼接后的词集合 ≈ 原文词集合 ∪ 触发词词集合，
+    Jaccard = |原文词| / (|原文词| + |触发词中原文没有的词|)。
+    """
+
+    def __init__(self, model, data_loader, atoms: List[str] = None):
+        if not hasattr(model, "feature_columns"):
+            raise ValueError("通用触发词搜索需要线性特征模型（feature_columns/weight_vector）")
+        if getattr(model, "canonicalizer", None) is not None:
+            raise ValueError("通用触发词搜索的增量打分不支持带输入规范化的检测器")
+        self.model = model
+        self.data_loader = data_loader
+        self.columns = model.feature_columns()
+        self.weights = model.weight_vector()
+        self.atoms = atoms if atoms is not None else self.default_atoms()
+
+        # 只有非零权重的列会改变得分
+        self._keyword_columns = []
+        self._pattern_columns = []
+        self._other_columns = []
+        for j, (column, weight) in enumerate(zip(self.columns, self.weights)):
+            if weight == 0:
+                continue
+            kind, key = column
+            if kind == COLUMN_KEYWORD:
+                self._keyword_columns.append(j)
+            elif kind == COLUMN_PATTERN:
+                self._pattern_columns.append((j, re.compile(key)))
+            else:
+                self._other_columns.append(j)
+        keyword_lengths = [len(self.columns[j][1]) for j in self._keyword_columns]
+        self._window = max(keyword_lengths) - 1 if keyword_lengths else 0
+
+        self._texts = []
+        self._labels = []
+        self._hits = []
+        self._base = []
+        self._predictions = []
+        self._tokens = []
+        self._targets = []
+
+        # 统计
+        self.evaluated = 0
+
+    def default_atoms(self) -> List[str]:
+        """候选片段：攻击中手工挑选的前缀/后缀/填充，以及检测器的关键词"""
+        generator = PerturbationGenerator(self.data_loader)
+        atoms = (generator.prefixes + generator.suffixes +
+                 [SimplePromptAttack.NORMAL_PADDING, SimplePromptAttack.LENGTH_FILLER] +
+                 [key for kind, key in self.columns if kind == COLUMN_KEYWORD])
+        return list(dict.fromkeys(atoms))
+
+    def prepare(self, texts: List[str], labels: List[int]):
+        """对语料做一次特征提取和打分；只有当前预测正确的样本才是攻击目标"""
+        matrix = FeatureMatrix.build(texts, self.columns)
+        self._texts = list(texts)
+        self._labels = list(labels)
+        self._hits = [set(matrix.row(i)) for i in range(len(matrix))]
+        self._base = matrix.dot(self.weights, self.model.bias)
+        self._predictions = [self._predict(score) for score in self._base]
+        self._tokens = [set(self.data_loader.simple_tokenize(text)) for text in texts]
+        self._targets = [i for i, (pred, label) in enumerate(zip(self._predictions, self._labels))
+                         if pred == label]
+
+    def _predict(self, base_score: float) -> int:
+        """不含随机扰动的预测，避免噪声影响触发词的比较"""
+        return 1 if self.model.expected_score(base_score) > self.model.threshold else 0
+
+    def _delta(self, i: int, trigger: str, trigger_keywords: set, trigger_exclamation: bool,
+               position: str) -> float:
+        """第i条文本加上触发词后得分的增量"""
+        text = self._texts[i]
+        hits = self._hits[i]
+        window = self._window
+        if position == "prefix":
+            junction = trigger[-window:] + text[:window] if window else ""
+        else:
+            junction = text[-window:] + trigger[:window] if window else ""
+
+        delta = 0.0
+        for j in self._keyword_columns:
+            if j not in hits and (j in trigger_keywords or self.columns[j][1] in junction):
+                delta += self.weights[j]
+
+        new_text = None
+        for j, compiled in self._pattern_columns:
+            if j in hits:
+                continue
+            if new_text is None:
+                new_text = trigger + text if position == "prefix" else text + trigger
+            if compiled.search(new_text) is not None:
+                delta += self.weights[j]
+
+        for j in self._other_columns:
+            if j in hits:
+                continue
+            kind, key = self.columns[j]
+            if kind == COLUMN_LONG_TEXT and len(text) + len(trigger) > key:
+                delta += self.weights[j]
+            elif kind == COLUMN_EXCLAMATION and trigger_exclamation:
+                delta += self.weights[j]
+        return delta
+
+    def score_trigger(self, trigger: str, position: str = "suffix") -> Dict:
+        """在整个语料上评估一个触发词：翻转率与平均相似度代价"""
+        self.evaluated += 1
+        trigger_keywords = {j for j in self._keyword_columns if self.columns[j][1] in trigger}
+        trigger_exclamation = '!' in trigger or '！' in trigger
+        trigger_tokens = set(self.data_loader.simple_tokenize(trigger))
+
+        flips = 0
+        flips_by_label = {0: 0, 1: 0}
+        total_cost = 0.0
+        total_gain = 0.0
+        for i in self._targets:
+            tokens = self._tokens[i]
+            extra = len(trigger_tokens - tokens)
+            similarity = len(tokens) / (len(tokens) + extra) if tokens else 0.0
+            total_cost += 1 - similarity
+            if similarity < Config.MIN_SIMILARITY:
+                continue
+            delta = self._delta(i, trigger, trigger_keywords, trigger_exclamation, position)
+            # 得分朝翻转方向移动的量（未翻转时用于区分候选的优劣）
+            total_gain += -delta if self._predictions[i] == 1 else delta
+            if delta and self._predict(self._base[i] + delta) != self._predictions[i]:
+                flips += 1
+                flips_by_label[self._labels[i]] += 1
+
+        targets = len(self._targets)
+        return {
+            "trigger": trigger,
+            "position": position,
+            "flips": flips,
+            "flip_rate": flips / targets if targets else 0.0,
+            "flips_by_label": flips_by_label,
+            "avg_margin_gain": total_gain / targets if targets else 0.0,
+            "avg_similarity_cost": total_cost / targets if targets else 0.0
+        }
+
+    @timed("attack.trigger_search")
+    def search(self, texts: List[str], labels: List[int], position: str = "suffix",
+               max_words: int = None, beam_width: int = None, top_k: int = None) -> List[Dict]:
+        """束搜索：从单个片段出发，每轮把最有希望的候选再拼接一个片段
+
+        结果按翻转率从高到低排序，翻转率相同时按得分朝翻转方向的平均移动量、相似度代价排序，返回前top_k个。
+        """
+        if position not in ("prefix", "suffix"):
+            raise ValueError(f"未知的触发词位置: {position}")
+        max_words = max_words or Config.TRIGGER_MAX_WORDS
+        beam_width = beam_width or Config.TRIGGER_BEAM_WIDTH
+        top_k = top_k or Config.TRIGGER_TOP_K
+
+        self.prepare(texts, labels)
+
+        def rank_key(item):
+            return (-item["flip_rate"], -item["avg_margin_gain"], item["avg_similarity_cost"])
+
+        def beam_key(item):
+            # 翻转数很稀疏，束内按得分朝翻转方向的平均移动量选择，保留尚未翻转但有潜力的候选
+            return (-item["avg_margin_gain"], -item["flip_rate"], item["avg_similarity_cost"])
+
+        scored = []
+        seen = set()  # 已评估的片段组合（只调换顺序的候选不再重复评估）
+        beam = [()]
+        for _ in range(max_words):
+            level = []
+            for parts in beam:
+                for atom in self.atoms:
+                    if atom in parts:
+                        continue
+                    candidate = (atom,) + parts if position == "prefix" else parts + (atom,)
+                    signature = frozenset(candidate)
+                    if signature in seen:
+                        continue
+                    seen.add(signature)
+                    item = self.score_trigger("".join(candidate), position)
+                    scored.append(item)
+                    level.append((item, candidate))
+            if not level:
+                break
+            level.sort(key=lambda entry: beam_key(entry[0]))
+            beam = [candidate for _, candidate in level[:beam_width]]
+
+        return sorted(scored, key=rank_key)[:top_k]
+
+def format_trigger_report(triggers: List[Dict]) -> str:
+    """格式化触发词报告"""
+    lines = [f"{'位置':<8} {'翻转率':<10} {'翻转数':<8} {'相似度代价':<12} 触发词"]
+    for item in triggers:
+        lines.append(f"{item['position']:<8} {item['flip_rate']:<10.4f} {item['flips']:<8} "
+                     f"{item['avg_similarity_cost']:<12.4f} {item['trigger']}")
+    return "\n".join(lines)
@@ -0,0 +1,89 @@
+# word_importance.py
+from collections import OrderedDict
+from typing import List, Tuple
+from config import Config
+from instrumentation import timed
+from feature_matrix import FeatureMatrix
+
+class WordImportanceRanker:
+    """留一法词重要性排序：删去每个词后批量打分，按得分变化排序
+
+    每条被打分的文本都算一次模型查询：指定attack时计入attack.query_count，
+    使"每次成功翻转的查询数"包含排序本身的开销。
+    """
+
+    def __init__(self, model, data_loader, cache_size: int = 4096, attack=None):
+        self.model = model
+        self.data_loader = data_loader
+        self.cache_size = cache_size
+        self.attack = attack
+        self._cache = OrderedDict()  # 文本 -> 排序结果（同一文本的多种扰动共享）
+
+        # 查询统计
+        self.batch_calls = 0
+        self.texts_scored = 0
+
+    def _scores(self, texts: List[str]) -> List[float]:
+        """一次批量打分；线性模型使用不含随机扰动的得分，避免噪声掩盖词的影响"""
+        self.batch_calls += 1
+        self.texts_scored += len(texts)
+        if self.attack is not None:
+            self.attack.query_count += len(texts)
+        if hasattr(self.model, "feature_columns"):
+            if getattr(self.model, "canonicalizer", None) is not None:
+                texts = [self.model.canonicalizer(text) for text in texts]
+            matrix = FeatureMatrix.build(texts, self.model.feature_columns())
+            return matrix.dot(self.model.weight_vector(), self.model.bias)
+        return [fraud for _, fraud in self.model.predict_proba(texts)]
+
+    @timed("attack.word_importance")
+    def rank(self, text: str) -> List[Tuple[str, float]]:
+        """返回 (词, 重要性) 列表，重要性越大，删去该词越有助于翻转当前预测"""
+        cached = self._cache.get(text)
+        if cached is not None:
+            self._cache.move_to_end(text)
+            return cached
+
+        tokens = self.data_loader.simple_tokenize(text)
+        positions = [i for i, token in enumerate(tokens) if token.strip()]
+        variants = [''.join(tokens[:i] + tokens[i + 1:]) for i in positions]
+        scores = self._scores([text] + variants)
+        base = scores[0]
+
+        # 当前判为欺诈：删去后得分下降越多越重要；判为正常：删去后得分上升越多越重要
+        threshold = getattr(self.model, "threshold", 0.5)
+        if hasattr(self.model, "expected_score"):
+            predicted_fraud = self.model.expected_score(base) > threshold
+        else:
+            predicted_fraud = base > threshold
+        sign = 1.0 if predicted_fraud else -1.0
+
+        importance = {}
+        for i, score in zip(positions, scores[1:]):
+            token = tokens[i]
+            value = sign * (base - score)
+            if value > importance.get(token, float('-inf')):
+                importance[token] = value
+
+        ranking = sorted(importance.items(), key=lambda item: -item[1])
+        self._cache[text] = ranking
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return ranking
+
+    def clear_cache(self):
+        """清空排序缓存（对比两轮攻击的查询数时，每轮都从空缓存开始）"""
+        self._cache.clear()
+
+    def top_tokens(self, text: str, k: int = None) -> List[str]:
+        """对翻转预测贡献最大的前k个词（只保留重要性为正的词）"""
+        k = k or Config.IMPORTANCE_TOP_K
+        return [token for token, value in self.rank(text)[:k] if value > 0]
+
+    def importance_of(self, text: str, phrase: str) -> float:
+        """短语的重要性：取其包含的词中重要性最大者"""
+        best = float('-inf')
+        for token, value in self.rank(text):
+            if token in phrase and value > best:
+                best = value
+        return best